@@ -0,0 +1,398 @@
+"""
+Asynchronous VQE Driver
+
+The Variational notebook runs compile -> simulate -> count synchronously for
+every parameter vector. This module drives batch-oriented optimizers (SPSA,
+CMA-ES) through an asyncio pipeline: each iteration's candidate batch is
+split into chunks, and the compilation of chunk i+1 runs concurrently with
+the simulation of chunk i on a worker pool. Per-iteration compile, simulate
+and wall-clock times are recorded.
+
+Stages are pluggable callables:
+    compile_fn(params_chunk) -> compiled   (e.g. build and lower Bloqade kernels)
+    simulate_fn(compiled) -> energies       (e.g. run PyQrack and evaluate <H>)
+`StateVectorStages` and `BloqadeStages` provide ready-made pairs for the
+hardware-efficient ansatz.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from PauliHamiltonian import PauliHamiltonian, PauliOp
+from U3Decomposition import u3_params
+from VariationalSimulator import HardwareEfficientAnsatz, rotation_matrices
+from VQEGradients import BASIS_CHANGE, ShotEnergyEstimator, measurement_groups
+
+
+# --- Batch optimizers (ask / tell interface) ---
+
+class SPSA:
+    """
+    Simultaneous perturbation stochastic approximation.
+
+    Each iteration evaluates 2 x `resamplings` candidates theta +- c_k Delta
+    with random +-1 directions Delta and averages the resulting gradient
+    estimates.
+    """
+
+    def __init__(self, x0: np.ndarray, a: float = 0.2, c: float = 0.1, A: float = 10.0,
+                 alpha: float = 0.602, gamma: float = 0.101, resamplings: int = 1,
+                 seed: Optional[int] = None):
+        """
+        Initialize SPSA.
+
+        Args:
+            x0: Initial parameters (flattened)
+            a, c, A, alpha, gamma: Standard gain sequence constants,
+                a_k = a / (k + 1 + A)^alpha and c_k = c / (k + 1)^gamma
+            resamplings: Number of perturbation directions per iteration
+            seed: Seed of the random generator
+        """
+        self.x = np.asarray(x0, dtype=float).ravel().copy()
+        self.a, self.c, self.A = a, c, A
+        self.alpha, self.gamma = alpha, gamma
+        self.resamplings = resamplings
+        self.rng = np.random.default_rng(seed)
+        self.k = 0
+        self.best_x, self.best_energy = self.x.copy(), np.inf
+        self._deltas = None
+
+    def ask(self) -> np.ndarray:
+        c_k = self.c / (self.k + 1) ** self.gamma
+        self._deltas = self.rng.choice([-1.0, 1.0], size=(self.resamplings, len(self.x)))
+        return np.concatenate([self.x + c_k * self._deltas, self.x - c_k * self._deltas])
+
+    def tell(self, candidates: np.ndarray, energies: np.ndarray):
+        a_k = self.a / (self.k + 1 + self.A) ** self.alpha
+        c_k = self.c / (self.k + 1) ** self.gamma
+        plus, minus = energies[:self.resamplings], energies[self.resamplings:]
+        gradient = np.mean(((plus - minus) / (2 * c_k))[:, None] * self._deltas, axis=0)
+
+        best = int(np.argmin(energies))
+        if energies[best] < self.best_energy:
+            self.best_x, self.best_energy = candidates[best].copy(), float(energies[best])
+
+        self.x = self.x - a_k * gradient
+        self.k += 1
+
+
+class CMAES:
+    """
+    (mu/mu_w, lambda) covariance matrix adaptation evolution strategy with
+    cumulative step-size adaptation and rank-one / rank-mu covariance updates.
+    """
+
+    def __init__(self, x0: np.ndarray, sigma0: float = 0.5, population_size: Optional[int] = None,
+                 seed: Optional[int] = None):
+        """
+        Initialize CMA-ES.
+
+        Args:
+            x0: Initial mean (flattened)
+            sigma0: Initial step size
+            population_size: Candidates per iteration (default 4 + 3 ln(dim))
+            seed: Seed of the random generator
+        """
+        self.mean = np.asarray(x0, dtype=float).ravel().copy()
+        n = len(self.mean)
+        self.sigma = sigma0
+        self.rng = np.random.default_rng(seed)
+
+        self.lam = population_size or 4 + int(3 * np.log(n))
+        self.mu = self.lam // 2
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1 / np.sum(self.weights ** 2)
+
+        self.c_sigma = (self.mu_eff + 2) / (n + self.mu_eff + 5)
+        self.d_sigma = 1 + 2 * max(0, np.sqrt((self.mu_eff - 1) / (n + 1)) - 1) + self.c_sigma
+        self.c_c = (4 + self.mu_eff / n) / (n + 4 + 2 * self.mu_eff / n)
+        self.c_1 = 2 / ((n + 1.3) ** 2 + self.mu_eff)
+        self.c_mu = min(1 - self.c_1,
+                        2 * (self.mu_eff - 2 + 1 / self.mu_eff) / ((n + 2) ** 2 + self.mu_eff))
+        self.chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.p_sigma = np.zeros(n)
+        self.p_c = np.zeros(n)
+        self.C = np.eye(n)
+        self.k = 0
+        self.best_x, self.best_energy = self.mean.copy(), np.inf
+
+    def _decompose(self):
+        eigenvalues, B = np.linalg.eigh(self.C)
+        return B, np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+    def ask(self) -> np.ndarray:
+        B, D = self._decompose()
+        z = self.rng.standard_normal((self.lam, len(self.mean)))
+        return self.mean + self.sigma * (z * D) @ B.T
+
+    def tell(self, candidates: np.ndarray, energies: np.ndarray):
+        n = len(self.mean)
+        order = np.argsort(energies)
+        if energies[order[0]] < self.best_energy:
+            self.best_x, self.best_energy = candidates[order[0]].copy(), float(energies[order[0]])
+
+        selected = (candidates[order[:self.mu]] - self.mean) / self.sigma
+        step = self.weights @ selected
+        self.mean = self.mean + self.sigma * step
+
+        B, D = self._decompose()
+        inverse_sqrt_C = B @ np.diag(1 / D) @ B.T
+        self.p_sigma = ((1 - self.c_sigma) * self.p_sigma
+                        + np.sqrt(self.c_sigma * (2 - self.c_sigma) * self.mu_eff) * inverse_sqrt_C @ step)
+        norm_p_sigma = np.linalg.norm(self.p_sigma)
+        h_sigma = (norm_p_sigma / np.sqrt(1 - (1 - self.c_sigma) ** (2 * (self.k + 1)))
+                   < (1.4 + 2 / (n + 1)) * self.chi_n)
+        self.p_c = ((1 - self.c_c) * self.p_c
+                    + h_sigma * np.sqrt(self.c_c * (2 - self.c_c) * self.mu_eff) * step)
+
+        rank_mu = (selected.T * self.weights) @ selected
+        self.C = ((1 - self.c_1 - self.c_mu) * self.C
+                  + self.c_1 * (np.outer(self.p_c, self.p_c)
+                                + (1 - h_sigma) * self.c_c * (2 - self.c_c) * self.C)
+                  + self.c_mu * rank_mu)
+        self.C = (self.C + self.C.T) / 2
+        self.sigma *= np.exp((self.c_sigma / self.d_sigma) * (norm_p_sigma / self.chi_n - 1))
+        self.k += 1
+
+
+# --- Stages ---
+
+class StateVectorStages:
+    """
+    Stages backed by the batched NumPy ansatz simulator.
+
+    Compilation reshapes the parameters and spawns a child seed for the
+    chunk; simulation estimates energies from shots with a generator of that
+    seed (or returns exact energies when shots is None). Chunks are compiled
+    one after the other, so every chunk gets the same seed from run to run,
+    whichever pool thread simulates it.
+    """
+
+    def __init__(self, ansatz: HardwareEfficientAnsatz, hamiltonian: PauliHamiltonian,
+                 shots: Optional[int] = 1000, seed: Optional[int] = None):
+        self.ansatz = ansatz
+        self.hamiltonian = hamiltonian
+        self.estimator = ShotEnergyEstimator(ansatz, hamiltonian, shots) if shots else None
+        self.seed_sequence = np.random.SeedSequence(seed)
+
+    def compile(self, params: np.ndarray) -> tuple:
+        return self.ansatz.batch_params(params), self.seed_sequence.spawn(1)[0]
+
+    def simulate(self, compiled: tuple) -> np.ndarray:
+        params, seed = compiled
+        if self.estimator is None:
+            return self.ansatz.energies(params, self.hamiltonian)
+        return self.estimator(params, np.random.default_rng(seed))
+
+
+class BloqadeStages:
+    """
+    Stages that build Bloqade kernels of the notebook's ansatz and sample them
+    with PyQrack.
+
+    One kernel is compiled per candidate and measurement group. The rx, ry, rz
+    rotations of each qubit and layer are fused into a single U gate, and the
+    basis change of the group's qubit-wise commuting terms is folded into the
+    final rotation layer.
+    """
+
+    def __init__(self, n_qubits: int, reps: int, hamiltonian: PauliHamiltonian, shots: int = 300):
+        self.n_qubits = n_qubits
+        self.reps = reps
+        self.shots = shots
+        self.groups = measurement_groups(hamiltonian)
+
+    def _kernel(self, params: np.ndarray, basis: Dict[int, PauliOp]):
+        from bloqade import qasm2
+
+        n_qubits, reps = self.n_qubits, self.reps
+        matrices = rotation_matrices(params)
+        for q, op in basis.items():
+            if op in BASIS_CHANGE:
+                matrices[-1, q] = BASIS_CHANGE[op] @ matrices[-1, q]
+        # u3_params returns None for the identity
+        angles = tuple(u3_params(matrices[r, i]) or (0.0, 0.0, 0.0)
+                       for r in range(reps + 1) for i in range(n_qubits))
+
+        @qasm2.extended
+        def ansatz():
+            qreg = qasm2.qreg(n_qubits)
+            creg = qasm2.creg(n_qubits)
+            for r in range(reps + 1):
+                for i in range(n_qubits):
+                    qasm2.u(qreg[i], angles[r * n_qubits + i][0],
+                            angles[r * n_qubits + i][1], angles[r * n_qubits + i][2])
+                if r < reps:
+                    for j in range(n_qubits):
+                        for k in range(j + 1, n_qubits):
+                            qasm2.cx(qreg[j], qreg[k])
+                            qasm2.cz(qreg[j], qreg[k])
+            for i in range(n_qubits):
+                qasm2.measure(qreg[i], creg[i])
+            return creg
+
+        return ansatz
+
+    def compile(self, params: np.ndarray) -> list:
+        params = np.asarray(params).reshape(-1, self.reps + 1, self.n_qubits, 3)
+        return [[self._kernel(p, basis) for basis, _ in self.groups] for p in params]
+
+    def simulate(self, compiled: list) -> np.ndarray:
+        from bloqade.pyqrack import PyQrack
+
+        device = PyQrack(dynamic_qubits=True, pyqrack_options={"isBinaryDecisionTree": False})
+        energies = np.zeros(len(compiled))
+        for c, kernels in enumerate(compiled):
+            for kernel, (_, terms) in zip(kernels, self.groups):
+                bits = np.array([[int(b) for b in shot] for shot in device.multi_run(kernel, _shots=self.shots)])
+                for term in terms:
+                    qubits = [q for q, op in term.operators.items() if op != PauliOp.I]
+                    parity = 1 - 2 * (bits[:, qubits].sum(axis=1) % 2) if qubits else np.ones(len(bits))
+                    energies[c] += np.real(term.coefficient) * parity.mean()
+        return energies
+
+
+# --- Driver ---
+
+class AsyncVQEDriver:
+    """
+    Pipelined VQE loop: compile chunk i+1 while chunk i is being simulated.
+
+    Compilation runs on a single-threaded executor (Kirin kernels cannot be
+    pickled and are cheap to keep in-process); simulation runs on
+    `simulate_executor`, a thread pool by default.
+    """
+
+    def __init__(self, compile_fn: Callable[[np.ndarray], object],
+                 simulate_fn: Callable[[object], np.ndarray],
+                 chunk_size: int = 4, simulate_executor: Optional[Executor] = None,
+                 max_workers: int = 2):
+        """
+        Initialize the driver.
+
+        Args:
+            compile_fn: Maps a chunk of parameter vectors to compiled circuits
+            simulate_fn: Maps compiled circuits to energies, shape (chunk,)
+            chunk_size: Number of candidates per pipeline chunk
+            simulate_executor: Executor running simulate_fn
+            max_workers: Size of the default simulation thread pool
+        """
+        self.compile_fn = compile_fn
+        self.simulate_fn = simulate_fn
+        self.chunk_size = chunk_size
+        self.compile_executor = ThreadPoolExecutor(max_workers=1)
+        self.simulate_executor = simulate_executor or ThreadPoolExecutor(max_workers=max_workers)
+        self.timings: List[Dict[str, float]] = []
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, time.perf_counter() - start
+
+    async def evaluate(self, candidates: np.ndarray) -> tuple:
+        """
+        Energies of a batch of candidates through the compile/simulate pipeline.
+
+        Returns:
+            (energies, total compile time, total simulate time)
+        """
+        loop = asyncio.get_running_loop()
+        chunks = [candidates[i:i + self.chunk_size] for i in range(0, len(candidates), self.chunk_size)]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        compile_time = 0.0
+
+        async def producer():
+            nonlocal compile_time
+            for index, chunk in enumerate(chunks):
+                compiled, elapsed = await loop.run_in_executor(
+                    self.compile_executor, self._timed, self.compile_fn, chunk)
+                compile_time += elapsed
+                await queue.put((index, compiled))
+
+        async def consumer():
+            pending = []
+            for _ in chunks:
+                index, compiled = await queue.get()
+                future = loop.run_in_executor(self.simulate_executor, self._timed, self.simulate_fn, compiled)
+                pending.append((index, future))
+            return [(index, await future) for index, future in pending]
+
+        _, results = await asyncio.gather(producer(), consumer())
+
+        energies = [None] * len(chunks)
+        simulate_time = 0.0
+        for index, (chunk_energies, elapsed) in results:
+            energies[index] = np.asarray(chunk_energies, dtype=float)
+            simulate_time += elapsed
+        return np.concatenate(energies), compile_time, simulate_time
+
+    async def run(self, optimizer, iterations: int, verbose: bool = False):
+        """
+        Run `iterations` ask/evaluate/tell rounds of a batch optimizer.
+
+        Args:
+            optimizer: Object with ask() -> candidates and tell(candidates, energies)
+            iterations: Number of iterations
+            verbose: Print one line per iteration
+
+        Returns:
+            The optimizer, after the last tell
+        """
+        for iteration in range(iterations):
+            start = time.perf_counter()
+            candidates = optimizer.ask()
+            energies, compile_time, simulate_time = await self.evaluate(candidates)
+            optimizer.tell(candidates, energies)
+            wall_time = time.perf_counter() - start
+
+            self.timings.append({'iteration': iteration, 'candidates': len(candidates),
+                                 'compile': compile_time, 'simulate': simulate_time,
+                                 'wall': wall_time, 'best_energy': float(np.min(energies))})
+            if verbose:
+                print(f"step {iteration + 1:>4}: min <H> = {np.min(energies):>7.3f}  "
+                      f"compile {compile_time:.2f}s  simulate {simulate_time:.2f}s  wall {wall_time:.2f}s")
+        return optimizer
+
+    def shutdown(self):
+        self.compile_executor.shutdown()
+        self.simulate_executor.shutdown()
+
+
+def run_vqe(compile_fn, simulate_fn, optimizer, iterations: int, chunk_size: int = 4,
+            verbose: bool = False):
+    """
+    Synchronous convenience wrapper around AsyncVQEDriver.run.
+
+    Returns:
+        (optimizer, per-iteration timings)
+    """
+    driver = AsyncVQEDriver(compile_fn, simulate_fn, chunk_size=chunk_size)
+    try:
+        asyncio.run(driver.run(optimizer, iterations, verbose))
+    finally:
+        driver.shutdown()
+    return optimizer, driver.timings
+
+
+if __name__ == "__main__":
+    from PauliHamiltonian import create_heisenberg_xyz_model
+
+    n_qubits, reps = 4, 1
+    hamiltonian = create_heisenberg_xyz_model(n_qubits, 1.0, 0.5, 0.25)
+    ansatz = HardwareEfficientAnsatz(n_qubits, reps)
+    stages = StateVectorStages(ansatz, hamiltonian, shots=2000, seed=0)
+    x0 = np.random.default_rng(42).random(ansatz.param_shape).ravel() * 2 * np.pi
+
+    for optimizer in (SPSA(x0, seed=0, resamplings=2), CMAES(x0, sigma0=0.5, seed=0)):
+        optimizer, timings = run_vqe(stages.compile, stages.simulate, optimizer, 100)
+        best = ansatz.energies(optimizer.best_x, hamiltonian)[0]
+        print(f"{type(optimizer).__name__}: best <H> = {best:.4f}, "
+              f"mean wall time per iteration {np.mean([t['wall'] for t in timings]) * 1e3:.1f} ms")
+    print(f"Ground state energy: {np.linalg.eigvalsh(hamiltonian.to_matrix(n_qubits)).min():.4f}")
@@ -0,0 +1,457 @@
+"""
+Monte Carlo Pauli-Trajectory Noise Simulation
+
+`save_simulation.get_noise_model` and `run_simulation.py` describe hardware
+runs as a `schema.NoiseModel`: a list of GateEvents, each pairing an operation
+(LocalW / GlobalW / LocalRz / GlobalRz / CZ / Measurement) with its error
+(SingleQubitError or CZError, holding PauliErrorModels and survival
+probabilities). This module simulates such programs under that noise.
+
+Every trajectory is one noisy run of the circuit: before each operation the
+Pauli errors and atom losses are sampled, and the affected trajectories get
+the corresponding X / Y / Z flips applied to their state vector. The states
+of a whole batch of trajectories are stored as one (batch, 2**n_qubits)
+array, so gates are applied to all trajectories at once and errors only touch
+the rows that drew them. Each trajectory ends with one measurement shot.
+
+Besides NoiseModels, QASM2 programs (including Bloqade's `noise.PAULI1`
+statements) are accepted, and `with_depolarizing_noise` adds a uniform gate
+noise model to noiseless circuits such as the TFIM Trotter circuits.
+
+NoiseModels are read through their `op_type` / `error_type` fields, so the
+module does not import `bloqade.qbraid.schema` itself.
+"""
+
+import math
+from collections import Counter
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from StateVectorSimulator import SINGLE_QUBIT_GATES, QasmCircuit, StateVectorSimulator, u3_matrix
+
+
+# --- Conversion of noise models ---
+
+NOISE_OPERATIONS = ('noise', 'loss', 'cz_noise')
+
+
+def _pauli_errors(error_model, qubit_index: Dict[int, int]) -> list:
+    """('noise', qubit, px, py, pz) operations of a PauliErrorModel."""
+    return [('noise', qubit_index[q], *probs) for q, probs in error_model.errors if any(probs)]
+
+
+def circuit_from_noise_model(noise_model) -> QasmCircuit:
+    """
+    Convert a `schema.NoiseModel` into a QasmCircuit with explicit noise operations.
+
+    Besides the operations documented on QasmCircuit, the result contains
+        ('loss', qubit, p_loss)
+        ('cz_noise', a, b, paired_a, paired_b, unpaired_a, unpaired_b)
+    where the last one holds the (px, py, pz) of the entangled (both atoms
+    present) and single (only one atom present) CZ errors. The gates follow
+    the lowering of `bloqade.qbraid.lowering`: angles are in full turns and
+    W(theta, phi) = U(2 pi theta, 2 pi (phi + 1/2), -2 pi (phi + 1/2)).
+
+    Args:
+        noise_model: The NoiseModel
+
+    Returns:
+        The circuit, with one qubit and one classical bit per entry of
+        `noise_model.all_qubits`
+    """
+    qubits = tuple(noise_model.all_qubits)
+    index = {q: i for i, q in enumerate(qubits)}
+
+    circuit = QasmCircuit()
+    circuit.n_qubits = circuit.n_clbits = len(qubits)
+    circuit.qregs['q'] = (0, len(qubits))
+    circuit.cregs['c'] = (0, len(qubits))
+    ops = circuit.operations
+
+    for event in noise_model.gate_events:
+        error, operation = event.error, event.operation
+
+        for qubit, survival in zip(qubits, error.survival_prob):
+            if survival < 1:
+                ops.append(('loss', index[qubit], 1 - survival))
+
+        if operation.op_type == 'CZ':
+            ops.extend(_pauli_errors(error.storage_error, index))
+            single = dict(error.single_error.errors)
+            entangled = dict(error.entangled_error.errors)
+            pairs = []
+            for participant in operation.participants:
+                if len(participant) == 1:
+                    ops.append(('noise', index[participant[0]], *single[participant[0]]))
+                else:
+                    a, b = participant
+                    ops.append(('cz_noise', index[a], index[b], entangled[a], entangled[b], single[a], single[b]))
+                    pairs.append((index[a], index[b]))
+            ops.extend(('cz', a, b) for a, b in pairs)
+            continue
+
+        ops.extend(_pauli_errors(error.operator_error, index))
+        participants = [index[q] for q in getattr(operation, 'participants', qubits)]
+        if operation.op_type in ('LocalW', 'GlobalW'):
+            turn = 2 * math.pi
+            matrix = u3_matrix(turn * operation.theta, turn * (operation.phi + 0.5), -turn * (operation.phi + 0.5))
+            ops.extend(('1q', q, matrix) for q in participants)
+        elif operation.op_type in ('LocalRz', 'GlobalRz'):
+            matrix = SINGLE_QUBIT_GATES['rz'](2 * math.pi * operation.phi)
+            ops.extend(('1q', q, matrix) for q in participants)
+        elif operation.op_type == 'Measurement':
+            ops.extend(('measure', q, q) for q in participants)
+        else:
+            raise ValueError(f"Unsupported operation '{operation.op_type}'")
+
+    return circuit
+
+
+def with_depolarizing_noise(program: Union[str, QasmCircuit], p1: float, p2: float = 0.0,
+                            p_measure: float = 0.0) -> QasmCircuit:
+    """
+    Copy of a circuit with a uniform Pauli noise model inserted.
+
+    Every single-qubit gate is followed by a depolarizing channel of strength
+    p1 (X, Y and Z with probability p1 / 3 each), every two-qubit gate by
+    independent depolarizing channels of strength p2 on both qubits, and
+    every measurement is preceded by a bit flip with probability p_measure.
+
+    Args:
+        program: QASM2 text or parsed circuit
+        p1: Single-qubit gate error probability
+        p2: Two-qubit gate error probability (per qubit)
+        p_measure: Readout error probability
+
+    Returns:
+        The noisy circuit
+    """
+    source = QasmCircuit.from_qasm(program) if isinstance(program, str) else program
+    circuit = QasmCircuit()
+    circuit.qregs, circuit.cregs = dict(source.qregs), dict(source.cregs)
+    circuit.n_qubits, circuit.n_clbits = source.n_qubits, source.n_clbits
+
+    for op in source.operations:
+        kind = op[0]
+        if kind == 'measure' and p_measure > 0:
+            circuit.operations.append(('noise', op[1], p_measure, 0.0, 0.0))
+        circuit.operations.append(op)
+        if kind == '1q' and p1 > 0:
+            circuit.operations.append(('noise', op[1], p1 / 3, p1 / 3, p1 / 3))
+        elif kind in ('cz', 'cx', 'swap', '2q') and p2 > 0:
+            circuit.operations.extend(('noise', q, p2 / 3, p2 / 3, p2 / 3) for q in op[1:3])
+    return circuit
+
+
+# --- Simulation ---
+
+class PauliTrajectorySimulator:
+    """
+    Batched Monte Carlo simulator of circuits with Pauli noise and atom loss.
+
+    States are arrays of shape (batch, 2**n_qubits) with qubit 0 as the most
+    significant bit, as in StateVectorSimulator. A lost atom is measured out
+    (sampled from its reduced state, which leaves the other qubits in the
+    correct conditional state) and parked in |0>; later gates and errors skip
+    it, two-qubit gates with it act as the identity, and it reads out as 0.
+    """
+
+    def __init__(self, seed: Optional[int] = None, max_amplitudes: int = 2**22):
+        """
+        Initialize the simulator.
+
+        Args:
+            seed: Seed of the error and shot sampling random generator
+            max_amplitudes: Upper bound on batch * 2**n_qubits, which sets the
+                number of trajectories simulated together
+        """
+        self.rng = np.random.default_rng(seed)
+        self.max_amplitudes = max_amplitudes
+
+    @staticmethod
+    def _circuit(program) -> QasmCircuit:
+        if isinstance(program, str):
+            return QasmCircuit.from_qasm(program)
+        if isinstance(program, QasmCircuit):
+            return program
+        return circuit_from_noise_model(program)
+
+    @staticmethod
+    def _noiseless(circuit: QasmCircuit) -> QasmCircuit:
+        """Copy of a circuit without its noise, loss and cz_noise operations."""
+        ideal = QasmCircuit()
+        ideal.qregs, ideal.cregs = dict(circuit.qregs), dict(circuit.cregs)
+        ideal.n_qubits, ideal.n_clbits = circuit.n_qubits, circuit.n_clbits
+        ideal.operations = [op for op in circuit.operations if op[0] not in NOISE_OPERATIONS]
+        return ideal
+
+    # Batched kernels; `view` helpers expose the qubit axes behind the batch axis
+
+    @staticmethod
+    def _qubit_view(states: np.ndarray, n_qubits: int, qubit: int) -> np.ndarray:
+        return states.reshape(states.shape[0], 2**qubit, 2, 2**(n_qubits - qubit - 1))
+
+    @staticmethod
+    def _pair_view(states: np.ndarray, n_qubits: int, a: int, b: int) -> Tuple[np.ndarray, bool]:
+        low, high = min(a, b), max(a, b)
+        view = states.reshape(states.shape[0], 2**low, 2, 2**(high - low - 1), 2, 2**(n_qubits - high - 1))
+        return view, a > b
+
+    def apply_1q(self, states, n_qubits, qubit, matrix, active=None):
+        """Apply `matrix` to `qubit` in every trajectory where `active` (default all)."""
+        view = self._qubit_view(states, n_qubits, qubit)
+        if active is None or active.all():
+            return np.einsum('ij,bajc->baic', matrix, view).reshape(states.shape)
+        matrices = np.where(active[:, None, None], matrix, np.eye(2))
+        return np.einsum('bij,bajc->baic', matrices, view).reshape(states.shape)
+
+    def apply_cz(self, states, n_qubits, a, b):
+        view, _ = self._pair_view(states, n_qubits, a, b)
+        view[:, :, 1, :, 1, :] *= -1
+        return states
+
+    def apply_cx(self, states, n_qubits, control, target):
+        view, swapped = self._pair_view(states, n_qubits, control, target)
+        if swapped:
+            view[:, :, [0, 1], :, 1, :] = view[:, :, [1, 0], :, 1, :]
+        else:
+            view[:, :, 1, :, [0, 1], :] = view[:, :, 1, :, [1, 0], :]
+        return states
+
+    def apply_swap(self, states, n_qubits, a, b):
+        view, _ = self._pair_view(states, n_qubits, a, b)
+        view[:, :, 0, :, 1, :], view[:, :, 1, :, 0, :] = view[:, :, 1, :, 0, :].copy(), view[:, :, 0, :, 1, :].copy()
+        return states
+
+    def apply_2q(self, states, n_qubits, a, b, matrix):
+        view, swapped = self._pair_view(states, n_qubits, a, b)
+        gate = matrix.reshape(2, 2, 2, 2)
+        if swapped:
+            gate = gate.transpose(1, 0, 3, 2)
+        return np.einsum('ijkl,zakblc->zaibjc', gate, view).reshape(states.shape)
+
+    def apply_pauli_channel(self, states, n_qubits, qubit, px, py, pz, active=None):
+        """Sample X / Y / Z errors on `qubit` independently for every (active) trajectory."""
+        u = self.rng.random(states.shape[0])
+        x = u < px
+        y = (u >= px) & (u < px + py)
+        z = (u >= px + py) & (u < px + py + pz)
+        if active is not None:
+            x, y, z = x & active, y & active, z & active
+
+        # Y = i X Z; the global phase of a trajectory is irrelevant
+        view = self._qubit_view(states, n_qubits, qubit)
+        flip = np.flatnonzero(x | y)
+        if len(flip):
+            view[flip] = view[flip][:, :, ::-1, :]
+        phase = np.flatnonzero(z | y)
+        if len(phase):
+            view[phase, :, 1, :] *= -1
+        return states
+
+    def apply_loss(self, states, n_qubits, qubit, p_loss, lost):
+        """Lose the atom on `qubit` with probability p_loss in every trajectory where it is present."""
+        rows = np.flatnonzero((self.rng.random(states.shape[0]) < p_loss) & ~lost[:, qubit])
+        if not len(rows):
+            return states
+        view = self._qubit_view(states, n_qubits, qubit)
+        p_one = np.sum(np.abs(view[rows, :, 1, :]) ** 2, axis=(1, 2))
+        one = self.rng.random(len(rows)) < p_one
+
+        # Collapse to the sampled value, then move the atom's slot to |0>
+        collapsed = np.where(one[:, None, None], view[rows, :, 1, :], view[rows, :, 0, :])
+        norm = np.sqrt(np.where(one, p_one, 1 - p_one))
+        view[rows, :, 0, :] = collapsed / np.maximum(norm, 1e-300)[:, None, None]
+        view[rows, :, 1, :] = 0
+        lost[rows, qubit] = True
+        return states
+
+    @staticmethod
+    def _apply_present(states, lost, gate, n_qubits, a, b, *args):
+        """Apply a two-qubit gate only in the trajectories where both atoms are present."""
+        present = ~lost[:, a] & ~lost[:, b]
+        if present.all():
+            return gate(states, n_qubits, a, b, *args)
+        rows = np.flatnonzero(present)
+        if len(rows):
+            states[rows] = gate(states[rows], n_qubits, a, b, *args)
+        return states
+
+    def _run_batch(self, circuit: QasmCircuit, batch: int) -> Tuple[np.ndarray, np.ndarray, Dict[int, int]]:
+        """Evolve `batch` trajectories, returning their states, the loss mask and the measurement map."""
+        n = circuit.n_qubits
+        states = np.zeros((batch, 2**n), dtype=complex)
+        states[:, 0] = 1
+        lost = np.zeros((batch, n), dtype=bool)
+        pending: Dict[int, np.ndarray] = {}
+        measured: Dict[int, int] = {}
+
+        def flush(qubits):
+            nonlocal states
+            for q in qubits:
+                if q in pending:
+                    states = self.apply_1q(states, n, q, pending.pop(q), ~lost[:, q])
+
+        for op in circuit.operations:
+            kind = op[0]
+            if kind == 'measure':
+                measured[op[1]] = op[2]
+                continue
+
+            qubits = op[1:2] if kind in ('1q', 'noise', 'loss') else op[1:3]
+            if any(q in measured for q in qubits):
+                if kind in ('noise', 'loss', 'cz_noise'):
+                    # Errors after the readout do not change the recorded bits
+                    continue
+                raise ValueError("Gates after measurement are not supported by the trajectory simulator")
+
+            if kind == '1q':
+                # Fuse consecutive single-qubit gates on the same qubit
+                pending[op[1]] = op[2] @ pending[op[1]] if op[1] in pending else op[2]
+                continue
+
+            flush(qubits)
+            if kind == 'noise':
+                states = self.apply_pauli_channel(states, n, op[1], *op[2:], active=~lost[:, op[1]])
+            elif kind == 'loss':
+                states = self.apply_loss(states, n, op[1], op[2], lost)
+            elif kind == 'cz_noise':
+                a, b = op[1], op[2]
+                paired = ~lost[:, a] & ~lost[:, b]
+                unpaired = lost[:, a] ^ lost[:, b]
+                states = self.apply_pauli_channel(states, n, a, *op[3], active=paired)
+                states = self.apply_pauli_channel(states, n, b, *op[4], active=paired)
+                states = self.apply_pauli_channel(states, n, a, *op[5], active=unpaired & ~lost[:, a])
+                states = self.apply_pauli_channel(states, n, b, *op[6], active=unpaired & ~lost[:, b])
+            elif kind == 'cz':
+                states = self._apply_present(states, lost, self.apply_cz, n, op[1], op[2])
+            elif kind == 'cx':
+                states = self._apply_present(states, lost, self.apply_cx, n, op[1], op[2])
+            elif kind == 'swap':
+                states = self._apply_present(states, lost, self.apply_swap, n, op[1], op[2])
+            else:
+                states = self._apply_present(states, lost, self.apply_2q, n, op[1], op[2], op[3])
+
+        flush(list(pending))
+        return states, lost, measured
+
+    def _batches(self, circuit: QasmCircuit, trajectories: int):
+        size = max(1, min(trajectories, self.max_amplitudes // 2**circuit.n_qubits))
+        for start in range(0, trajectories, size):
+            yield min(size, trajectories - start)
+
+    def run(self, program, trajectories: int, measure_all: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample one measurement shot from each of `trajectories` noisy runs.
+
+        Args:
+            program: QASM2 text, parsed circuit or `schema.NoiseModel`
+            trajectories: Number of trajectories (= shots)
+            measure_all: Return the bits of every qubit instead of the classical
+                registers written by `measure` statements
+
+        Returns:
+            (bits, lost): uint8 array of shape (trajectories, n_clbits), or
+            (trajectories, n_qubits) if `measure_all`, and the boolean atom
+            loss mask of shape (trajectories, n_qubits)
+        """
+        circuit = self._circuit(program)
+        n = circuit.n_qubits
+        bits, losses = [], []
+
+        for batch in self._batches(circuit, trajectories):
+            states, lost, measured = self._run_batch(circuit, batch)
+
+            # One shot per trajectory by inverse transform sampling
+            cdf = np.cumsum(np.abs(states) ** 2, axis=1)
+            u = self.rng.random(batch) * cdf[:, -1]
+            outcomes = np.minimum((cdf < u[:, None]).sum(axis=1), 2**n - 1)
+            qubit_bits = ((outcomes[:, None] >> np.arange(n - 1, -1, -1)) & 1).astype(np.uint8)
+
+            if measure_all:
+                bits.append(qubit_bits)
+            else:
+                clbits = np.zeros((batch, circuit.n_clbits), dtype=np.uint8)
+                for qubit, clbit in measured.items():
+                    clbits[:, clbit] = qubit_bits[:, qubit]
+                bits.append(clbits)
+            losses.append(lost)
+
+        return np.concatenate(bits), np.concatenate(losses)
+
+    def counts(self, program, shots: int) -> Counter:
+        """Noisy measurement counts as bit strings, classical bit 0 first."""
+        bits, _ = self.run(program, shots)
+        return Counter(''.join(map(str, row)) for row in bits)
+
+    def fidelity(self, program, trajectories: int) -> Tuple[float, float]:
+        """
+        Estimate the fidelity <psi|rho|psi> of the noisy final state rho with
+        the ideal state psi (the same circuit with all noise removed).
+
+        Args:
+            program: QASM2 text, parsed circuit or `schema.NoiseModel`
+            trajectories: Number of trajectories
+
+        Returns:
+            (fidelity, standard error)
+        """
+        circuit = self._circuit(program)
+        ideal = StateVectorSimulator().statevector(self._noiseless(circuit))
+
+        overlaps = []
+        for batch in self._batches(circuit, trajectories):
+            states, _, _ = self._run_batch(circuit, batch)
+            overlaps.append(np.abs(states @ np.conj(ideal)) ** 2)
+        overlaps = np.concatenate(overlaps)
+
+        stderr = overlaps.std(ddof=1) / np.sqrt(len(overlaps)) if len(overlaps) > 1 else 0.0
+        return float(overlaps.mean()), float(stderr)
+
+
+def total_variation_distance(counts: Counter, reference: Counter) -> float:
+    """Total variation distance between two empirical distributions of bit strings."""
+    n, m = sum(counts.values()), sum(reference.values())
+    keys = set(counts) | set(reference)
+    return 0.5 * sum(abs(counts.get(k, 0) / n - reference.get(k, 0) / m) for k in keys)
+
+
+if __name__ == "__main__":
+    # Lie-Trotter TFIM evolution of 6 qubits with a uniform gate noise model
+    n_qubits, steps, dt, J, h = 6, 5, 0.2, 0.2, 1.2
+    lines = ['OPENQASM 2.0;', 'include "qelib1.inc";', f'qreg q[{n_qubits}];', f'creg c[{n_qubits}];']
+    for _ in range(steps):
+        for i in range(n_qubits):
+            j = (i + 1) % n_qubits
+            lines += [f'cx q[{i}], q[{j}];', f'rz({2 * J * dt}) q[{j}];', f'cx q[{i}], q[{j}];']
+        lines += [f'rx({2 * h * dt}) q[{i}];' for i in range(n_qubits)]
+    lines.append('measure q -> c;')
+    tfim = '\n'.join(lines)
+
+    simulator = PauliTrajectorySimulator(seed=0)
+    ideal_counts = StateVectorSimulator(seed=1).counts(tfim, 4000)
+    for p in (0.0, 0.001, 0.005, 0.02):
+        noisy = with_depolarizing_noise(tfim, p / 10, p, p)
+        fidelity, stderr = simulator.fidelity(noisy, 2000)
+        tvd = total_variation_distance(simulator.counts(noisy, 4000), ideal_counts)
+        print(f"p2 = {p:.3f}: fidelity {fidelity:.3f} ± {stderr:.3f}, TVD of counts {tvd:.3f}")
+
+    # A Bell pair as NoiseModel (W, CZ, W, measurement) with atom loss and CZ errors;
+    # the namespaces carry the schema.NoiseModel fields read by circuit_from_noise_model
+    from types import SimpleNamespace as Schema
+    qubits = (0, 1)
+    pauli = Schema(errors=[(q, (1e-3, 1e-3, 1e-3)) for q in qubits])
+    gate_error = Schema(survival_prob=(0.999, 0.999), operator_error=pauli)
+    cz_error = Schema(survival_prob=(0.995, 0.995), storage_error=pauli,
+                      single_error=Schema(errors=[(q, (2e-3, 2e-3, 2e-3)) for q in qubits]),
+                      entangled_error=Schema(errors=[(q, (5e-3, 5e-3, 5e-3)) for q in qubits]))
+    events = [
+        (Schema(op_type='GlobalW', participants=qubits, theta=0.25, phi=0.25), gate_error),
+        (Schema(op_type='CZ', participants=[qubits]), cz_error),
+        (Schema(op_type='LocalW', participants=(1,), theta=0.25, phi=-0.25), gate_error),
+        (Schema(op_type='Measurement', participants=qubits), gate_error),
+    ]
+    bell = Schema(all_qubits=qubits, gate_events=[Schema(operation=o, error=e) for o, e in events])
+    fidelity, stderr = simulator.fidelity(bell, 2000)
+    print(f"Bell pair NoiseModel: fidelity {fidelity:.3f} ± {stderr:.3f}, counts {dict(simulator.counts(bell, 1000))}")
@@ -0,0 +1,211 @@
+'''
+Logical error rate benchmarks of the surface code.
+
+For every (distance, physical error rate) point, errors are sampled in bulk
+as a (shots, 2n) Bernoulli matrix in the layout of surfaceCode.syndromes, the
+syndromes are computed with one sparse GF(2) product, the X and Z halves are
+decoded separately (see decoder.py), and a shot counts as a logical failure
+if the residual error flips any logical operator.
+
+Points are split into chunks of shots that are run in a process pool. Every
+finished chunk is recorded in a JSON checkpoint, so an interrupted sweep
+resumes where it stopped; chunk seeds are derived from (seed, distance,
+error rate index, chunk index), so resumed and uninterrupted sweeps give the
+same numbers.
+'''
+
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from decoder import DECODERS, MatchingGraph
+from surfacecode import surfaceCode
+
+
+# Code and decoders per (distance, decoder name), built lazily in every process
+_SETUPS: Dict[Tuple[int, str], tuple] = {}
+
+
+def _get_setup(distance: int, decoder: str) -> tuple:
+    key = (distance, decoder)
+    if key not in _SETUPS:
+        code = surfaceCode(distance)
+        x_graph, z_rows = MatchingGraph.from_surface_code(code, 'X')
+        z_graph, x_rows = MatchingGraph.from_surface_code(code, 'Z')
+        _SETUPS[key] = (code, DECODERS[decoder](x_graph), z_rows, DECODERS[decoder](z_graph), x_rows)
+    return _SETUPS[key]
+
+
+def sample_errors(n_qubits: int, p: float, shots: int, rng: np.random.Generator,
+                  error_model: str = 'depolarizing') -> np.ndarray:
+    '''
+    Sample independent Pauli errors on n data qubits.
+
+    Args:
+        n_qubits: Number of data qubits
+        p: Physical error rate
+        shots: Number of samples
+        rng: Random generator
+        error_model: 'depolarizing' (X, Y, Z with probability p/3 each),
+            'bitflip' (X with probability p) or 'phaseflip' (Z with probability p)
+
+    Returns:
+        uint8 array of shape (shots, 2 * n_qubits): X error bits then Z error bits
+    '''
+    u = rng.random((shots, n_qubits))
+    if error_model == 'depolarizing':
+        x = u < 2 * p / 3
+        z = (u >= p / 3) & (u < p)
+    elif error_model == 'bitflip':
+        x, z = u < p, np.zeros_like(u, dtype=bool)
+    elif error_model == 'phaseflip':
+        x, z = np.zeros_like(u, dtype=bool), u < p
+    else:
+        raise ValueError(f"Unknown error model '{error_model}'")
+    return np.hstack([x, z]).astype(np.uint8)
+
+
+def count_logical_failures(distance: int, p: float, shots: int, seed=None,
+                           decoder: str = 'mwpm', error_model: str = 'depolarizing') -> Tuple[int, float]:
+    '''
+    Sample, decode and count logical failures at one point.
+
+    Returns:
+        (failures, seconds spent decoding)
+    '''
+    code, x_decoder, z_rows, z_decoder, x_rows = _get_setup(distance, decoder)
+    n = distance ** 2
+    rng = np.random.default_rng(seed)
+
+    errors = sample_errors(n, p, shots, rng, error_model)
+    syndromes = code.syndromes(errors)
+
+    start = time.perf_counter()
+    residual = errors.copy()
+    residual[:, :n] ^= x_decoder.decode_batch(syndromes[:, z_rows])
+    residual[:, n:] ^= z_decoder.decode_batch(syndromes[:, x_rows])
+    seconds = time.perf_counter() - start
+
+    flips = (residual.astype(np.int64) @ code.get_logical_operators().T) & 1
+    return int(flips.any(axis=1).sum()), seconds
+
+
+def wilson_interval(failures: int, shots: int, z: float = 1.96) -> Tuple[float, float]:
+    '''Wilson score confidence interval of a binomial proportion (95% for z=1.96).'''
+    if shots == 0:
+        return 0.0, 1.0
+    rate = failures / shots
+    denominator = 1 + z**2 / shots
+    center = (rate + z**2 / (2 * shots)) / denominator
+    half = z * np.sqrt(rate * (1 - rate) / shots + z**2 / (4 * shots**2)) / denominator
+    return float(max(0.0, center - half)), float(min(1.0, center + half))
+
+
+def _point_key(distance: int, p: float) -> str:
+    return f"{distance}:{p!r}"
+
+
+def _load_checkpoint(path: Optional[str], config: dict) -> dict:
+    if path is None or not os.path.exists(path):
+        return {'config': config, 'points': {}}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('config') != config:
+        raise ValueError(f"Checkpoint {path} was written by a sweep with different settings")
+    return checkpoint
+
+
+def _save_checkpoint(path: Optional[str], checkpoint: dict):
+    if path is None:
+        return
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def logical_error_sweep(distances: Sequence[int], error_rates: Sequence[float], shots: int,
+                        decoder: str = 'mwpm', error_model: str = 'depolarizing',
+                        chunk_shots: int = 10000, seed: int = 0, max_workers: Optional[int] = None,
+                        checkpoint: Optional[str] = None, verbose: bool = False) -> List[dict]:
+    '''
+    Logical error rates for every combination of distance and error rate.
+
+    Args:
+        distances: Code distances
+        error_rates: Physical error rates
+        shots: Shots per point
+        decoder: 'mwpm' or 'uf'
+        error_model: See sample_errors
+        chunk_shots: Shots per task sent to the process pool
+        seed: Base seed of the sampling
+        max_workers: Number of worker processes (os.cpu_count() if None, no
+            pool if 1)
+        checkpoint: JSON file recording finished chunks; an existing file
+            from the same sweep is resumed
+        verbose: Print every finished chunk
+
+    Returns:
+        One dict per point with distance, p, shots, failures, rate, ci_low,
+        ci_high and decode_seconds
+    '''
+    config = {'distances': list(distances), 'error_rates': list(error_rates), 'shots': shots,
+              'decoder': decoder, 'error_model': error_model, 'chunk_shots': chunk_shots, 'seed': seed}
+    state = _load_checkpoint(checkpoint, config)
+
+    tasks = []
+    for distance in distances:
+        for index, p in enumerate(error_rates):
+            done = state['points'].setdefault(_point_key(distance, p),
+                                              {'chunks': [], 'shots': 0, 'failures': 0, 'decode_seconds': 0.0})
+            for chunk, start in enumerate(range(0, shots, chunk_shots)):
+                if chunk not in done['chunks']:
+                    chunk_seed = np.random.SeedSequence([seed, distance, index, chunk])
+                    tasks.append((distance, p, chunk, min(chunk_shots, shots - start), chunk_seed))
+
+    def record(task, result):
+        distance, p, chunk, chunk_size, _ = task
+        done = state['points'][_point_key(distance, p)]
+        done['chunks'].append(chunk)
+        done['shots'] += chunk_size
+        done['failures'] += result[0]
+        done['decode_seconds'] += result[1]
+        _save_checkpoint(checkpoint, state)
+        if verbose:
+            print(f"d={distance} p={p}: chunk {chunk}, {result[0]} failures in {chunk_size} shots")
+
+    if max_workers == 1:
+        for task in tasks:
+            record(task, count_logical_failures(task[0], task[1], task[3], task[4], decoder, error_model))
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(count_logical_failures, task[0], task[1], task[3], task[4],
+                                   decoder, error_model): task for task in tasks}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    results = []
+    for distance in distances:
+        for p in error_rates:
+            done = state['points'][_point_key(distance, p)]
+            low, high = wilson_interval(done['failures'], done['shots'])
+            results.append({
+                'distance': distance, 'p': p, 'shots': done['shots'], 'failures': done['failures'],
+                'rate': done['failures'] / max(done['shots'], 1), 'ci_low': low, 'ci_high': high,
+                'decode_seconds': done['decode_seconds'],
+            })
+    return results
+
+
+if __name__ == '__main__':
+    checkpoint = os.path.join(tempfile.gettempdir(), 'logical_error_sweep.json')
+    results = logical_error_sweep([3, 5, 7], [0.05, 0.1, 0.15, 0.2], shots=20000,
+                                  decoder='uf', checkpoint=checkpoint)
+    for row in results:
+        print(f"d={row['distance']} p={row['p']:.2f}: {row['rate']:.4f} "
+              f"[{row['ci_low']:.4f}, {row['ci_high']:.4f}] ({row['decode_seconds']:.1f}s decoding)")
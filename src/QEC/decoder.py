@@ -0,0 +1,353 @@
+'''
+Decoders for the surface code (and other codes with a graph-like check matrix).
+
+The repetition code is decoded by a hard-coded lookup (repetitioncode.py). For
+the surface code we build the matching graph from the check matrix instead:
+one node per check plus a virtual boundary node, and one edge per data qubit
+connecting the (one or two) checks that detect an error on it. An error on a
+set of qubits lights up the checks at the ends of its chains, so decoding means
+pairing up the lit checks (defects) by paths of small weight.
+
+    MWPMDecoder        Minimum-weight perfect matching on the defects, using
+                       precomputed shortest-path distances and the blossom
+                       algorithm of networkx.
+    UnionFindDecoder   Delfosse-Nickerson union-find decoder: grow clusters
+                       around the defects until every cluster is neutral, then
+                       peel a spanning forest. Almost-linear time.
+
+Both decoders take batches of syndromes (shots, n_checks) and return
+corrections (shots, n_qubits). Identical syndromes in a batch are decoded
+once; the timing of every batch is appended to decoder.timings.
+
+For the surface code, css_check_matrices splits surfaceCode.get_check_matrix()
+into the Z-check matrix (detecting X errors) and the X-check matrix (detecting
+Z errors), see MatchingGraph.from_surface_code.
+'''
+
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.csgraph import dijkstra
+
+
+def css_check_matrices(check_matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Split a CSS check matrix [Z part | X part] (the layout of
+    surfaceCode.get_check_matrix) into its two halves.
+
+    Returns:
+        (hz, z_rows, hx, x_rows): hz holds the Z-type checks on the n qubit
+        columns (they detect X errors) and z_rows their row indices in the
+        full matrix; likewise hx and x_rows for the X-type checks
+    '''
+    check_matrix = check_matrix.toarray() if sparse.issparse(check_matrix) else np.asarray(check_matrix)
+    n = check_matrix.shape[1] // 2
+    z_rows = np.flatnonzero(check_matrix[:, :n].any(axis=1))
+    x_rows = np.flatnonzero(check_matrix[:, n:].any(axis=1))
+    if len(np.intersect1d(z_rows, x_rows)):
+        raise ValueError("Check matrix is not CSS: some checks have both X and Z parts")
+    return check_matrix[z_rows, :n], z_rows, check_matrix[x_rows, n:], x_rows
+
+
+class MatchingGraph:
+    '''
+    Matching graph of a binary check matrix H (checks x qubits) in which every
+    column has one or two ones.
+
+    Nodes 0..n_checks-1 are the checks and node n_checks is the boundary.
+    Edge e joins edge_u[e] and edge_v[e] and corresponds to qubit edge_qubit[e].
+    '''
+
+    def __init__(self, check_matrix, weights: Optional[np.ndarray] = None):
+        '''
+        Build the graph.
+
+        Args:
+            check_matrix: Dense or sparse (n_checks, n_qubits) binary matrix
+            weights: Edge weight per qubit, e.g. log((1-p)/p) for error
+                probabilities p; all ones if None
+        '''
+        H = sparse.csc_matrix(check_matrix)
+        H.eliminate_zeros()
+        self.n_checks, self.n_qubits = H.shape
+        self.boundary = self.n_checks
+        self.weights = np.ones(self.n_qubits) if weights is None else np.asarray(weights, dtype=float)
+
+        degrees = np.diff(H.indptr)
+        if degrees.max(initial=0) > 2:
+            raise ValueError("Check matrix is not graph-like: a qubit is in more than two checks")
+        qubits = np.flatnonzero(degrees > 0)
+        first = H.indices[H.indptr[qubits]]
+        second = np.where(degrees[qubits] == 2, H.indices[np.minimum(H.indptr[qubits] + 1, len(H.indices) - 1)],
+                          self.boundary)
+        self.edge_u, self.edge_v, self.edge_qubit = first, second, qubits
+
+        # For every pair of nodes keep the lightest edge between them
+        edge_weights = self.weights[qubits]
+        self._pair_edge: Dict[Tuple[int, int], int] = {}
+        for e in np.argsort(-edge_weights):
+            self._pair_edge[(first[e], second[e])] = e
+            self._pair_edge[(second[e], first[e])] = e
+        pairs = np.array(list(self._pair_edge), dtype=int).reshape(-1, 2)
+        n_nodes = self.n_checks + 1
+        self.graph = sparse.csr_matrix((edge_weights[list(self._pair_edge.values())], (pairs[:, 0], pairs[:, 1])),
+                                       shape=(n_nodes, n_nodes))
+
+        self.adjacency: List[List[int]] = [[] for _ in range(n_nodes)]
+        for e, (a, b) in enumerate(zip(first, second)):
+            self.adjacency[a].append(e)
+            self.adjacency[b].append(e)
+
+    @classmethod
+    def from_surface_code(cls, code, error_type: str = 'X', weights: Optional[np.ndarray] = None):
+        '''
+        Matching graph of a surfaceCode for X or Z errors.
+
+        Returns:
+            (graph, rows): the graph and the indices of its checks in the
+            code's syndrome (rows of get_check_matrix)
+        '''
+        hz, z_rows, hx, x_rows = css_check_matrices(code.get_check_matrix())
+        if error_type == 'X':
+            return cls(hz, weights), z_rows
+        if error_type == 'Z':
+            return cls(hx, weights), x_rows
+        raise ValueError("error_type must be 'X' or 'Z'")
+
+    def path_edges(self, source: int, target: int, predecessors: np.ndarray) -> List[int]:
+        '''Edges of the shortest path from `source` to `target` given a predecessor row of `source`.'''
+        edges = []
+        node = target
+        while node != source:
+            previous = predecessors[node]
+            edges.append(self._pair_edge[(previous, node)])
+            node = previous
+        return edges
+
+
+class Decoder:
+    '''
+    Base class: batched decoding with deduplication and timing statistics.
+    Subclasses implement decode(defects) -> list of edge indices.
+    '''
+
+    def __init__(self, graph: MatchingGraph):
+        self.graph = graph
+        self.timings: List[dict] = []
+
+    def decode_defects(self, defects: np.ndarray) -> List[int]:
+        raise NotImplementedError
+
+    def decode(self, syndrome: np.ndarray) -> np.ndarray:
+        '''
+        Correction for one syndrome.
+
+        Args:
+            syndrome: 0/1 array of length n_checks
+
+        Returns:
+            uint8 array of length n_qubits marking the qubits to flip
+        '''
+        correction = np.zeros(self.graph.n_qubits, dtype=np.uint8)
+        defects = np.flatnonzero(syndrome)
+        if len(defects):
+            for e in self.decode_defects(defects):
+                correction[self.graph.edge_qubit[e]] ^= 1
+        return correction
+
+    def decode_batch(self, syndromes: np.ndarray) -> np.ndarray:
+        '''
+        Corrections for a batch of syndromes.
+
+        Args:
+            syndromes: 0/1 array of shape (shots, n_checks)
+
+        Returns:
+            uint8 array of shape (shots, n_qubits)
+        '''
+        start = time.perf_counter()
+        syndromes = np.asarray(syndromes, dtype=np.uint8)
+        unique, inverse = np.unique(syndromes, axis=0, return_inverse=True)
+        corrections = np.array([self.decode(s) for s in unique], dtype=np.uint8).reshape(len(unique), -1)
+        elapsed = time.perf_counter() - start
+
+        shots = len(syndromes)
+        self.timings.append({
+            'shots': shots,
+            'unique': len(unique),
+            'seconds': elapsed,
+            'us_per_shot': 1e6 * elapsed / max(shots, 1),
+        })
+        return corrections[inverse.reshape(-1)]
+
+
+class MWPMDecoder(Decoder):
+    '''
+    Minimum-weight perfect matching decoder.
+
+    Every defect is either matched with another defect, at the cost of their
+    shortest-path distance, or with its own copy of the boundary, at the cost
+    of its distance to the boundary; boundary copies match each other for free.
+    Pairs that are cheaper to match through the boundary are left out of the
+    matching problem.
+    '''
+
+    def __init__(self, graph: MatchingGraph):
+        super().__init__(graph)
+        self.distances, self.predecessors = dijkstra(graph.graph, directed=False, return_predecessors=True)
+
+    def decode_defects(self, defects: np.ndarray) -> List[int]:
+        boundary = self.graph.boundary
+        distances = self.distances
+        to_boundary = distances[defects, boundary]
+
+        matching_graph = nx.Graph()
+        for i, a in enumerate(defects):
+            matching_graph.add_edge(('d', i), ('b', i), weight=-to_boundary[i])
+            for j in range(i + 1, len(defects)):
+                weight = distances[a, defects[j]]
+                if weight < to_boundary[i] + to_boundary[j]:
+                    matching_graph.add_edge(('d', i), ('d', j), weight=-weight)
+                matching_graph.add_edge(('b', i), ('b', j), weight=0.0)
+
+        edges = []
+        for u, v in nx.max_weight_matching(matching_graph, maxcardinality=True):
+            if u[0] == 'b' and v[0] == 'b':
+                continue
+            if u[0] == 'b':
+                u, v = v, u
+            source = defects[u[1]]
+            target = boundary if v[0] == 'b' else defects[v[1]]
+            edges.extend(self.graph.path_edges(source, target, self.predecessors[source]))
+        return edges
+
+
+class UnionFindDecoder(Decoder):
+    '''
+    Union-find decoder (Delfosse and Nickerson), unweighted.
+
+    Clusters start at the defects. In every round each odd cluster that does
+    not touch the boundary grows by half an edge in all directions, and
+    clusters joined by a fully grown edge are merged. Once all clusters are
+    even or touch the boundary, a spanning forest of the grown edges is peeled
+    from the leaves: a leaf that is a defect flips its tree edge, moving the
+    defect to its parent.
+    '''
+
+    def _find(self, parent: List[int], node: int) -> int:
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def decode_defects(self, defects: np.ndarray) -> List[int]:
+        graph = self.graph
+        n_nodes = graph.n_checks + 1
+        boundary = graph.boundary
+        edge_u, edge_v, adjacency = graph.edge_u, graph.edge_v, graph.adjacency
+
+        parent = list(range(n_nodes))
+        parity = [0] * n_nodes
+        touches_boundary = [False] * n_nodes
+        touches_boundary[boundary] = True
+        members = {node: [node] for node in range(n_nodes)}
+        for d in defects:
+            parity[d] = 1
+        support = np.zeros(len(edge_u), dtype=np.int8)
+
+        active = {int(d) for d in defects}
+        while active:
+            fused = []
+            for root in active:
+                for node in members[root]:
+                    for e in adjacency[node]:
+                        if support[e] < 2:
+                            support[e] += 1
+                            if support[e] == 2:
+                                fused.append(e)
+
+            for e in fused:
+                a, b = self._find(parent, edge_u[e]), self._find(parent, edge_v[e])
+                if a == b:
+                    continue
+                if len(members[a]) < len(members[b]):
+                    a, b = b, a
+                parent[b] = a
+                members[a].extend(members.pop(b))
+                parity[a] ^= parity[b]
+                touches_boundary[a] = touches_boundary[a] or touches_boundary[b]
+
+            active = {r for r in {self._find(parent, root) for root in active}
+                      if parity[r] and not touches_boundary[r]}
+
+        return self._peel(defects, support == 2)
+
+    def _peel(self, defects: np.ndarray, grown: np.ndarray) -> List[int]:
+        graph = self.graph
+        n_nodes = graph.n_checks + 1
+        flagged = np.zeros(n_nodes, dtype=bool)
+        flagged[defects] = True
+
+        # Spanning forest of the grown edges by BFS, rooted at the boundary where possible
+        visited = np.zeros(n_nodes, dtype=bool)
+        tree_edge = np.full(n_nodes, -1)
+        order = []
+        roots = [graph.boundary] + [int(d) for d in defects]
+        for root in roots:
+            if visited[root]:
+                continue
+            visited[root] = True
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                order.append(node)
+                for e in graph.adjacency[node]:
+                    if not grown[e]:
+                        continue
+                    other = graph.edge_v[e] if graph.edge_u[e] == node else graph.edge_u[e]
+                    if not visited[other]:
+                        visited[other] = True
+                        tree_edge[other] = e
+                        queue.append(other)
+
+        edges = []
+        for node in reversed(order):
+            e = tree_edge[node]
+            if e < 0 or not flagged[node]:
+                continue
+            edges.append(int(e))
+            flagged[node] = False
+            other = graph.edge_v[e] if graph.edge_u[e] == node else graph.edge_u[e]
+            flagged[other] ^= True
+        return edges
+
+
+DECODERS = {'mwpm': MWPMDecoder, 'uf': UnionFindDecoder}
+
+
+if __name__ == '__main__':
+    from surfacecode import surfaceCode
+
+    rng = np.random.default_rng(0)
+    shots, p = 20000, 0.03
+    for distance in (3, 5, 7, 9):
+        code = surfaceCode(distance)
+        n = distance ** 2
+        graph, rows = MatchingGraph.from_surface_code(code, 'X')
+        errors = np.zeros((shots, 2 * n), dtype=np.uint8)
+        errors[:, :n] = rng.random((shots, n)) < p
+        syndromes = code.syndromes(errors)[:, rows]
+
+        for decoder in (MWPMDecoder(graph), UnionFindDecoder(graph)):
+            corrections = decoder.decode_batch(syndromes)
+            residual = errors[:, :n] ^ corrections
+            assert not code.syndromes(np.hstack([residual, np.zeros_like(residual)]))[:, rows].any()
+            stats = decoder.timings[-1]
+            print(f"d={distance} {type(decoder).__name__}: {stats['unique']} unique syndromes, "
+                  f"{stats['us_per_shot']:.1f} us/shot")
@@ -0,0 +1,237 @@
+'''
+Linear algebra over GF(2) on bit-packed rows.
+
+A binary matrix with n columns is stored as rows of ceil(n/64) uint64 words,
+column j in bit j % 64 of word j // 64 (pack / unpack). Adding one row to
+many others is then a vectorized XOR of words, and the forward elimination
+works on all pivots at once (see rref), so sparse check matrices with 10^4
+columns are ranked in milliseconds instead of minutes of Python-level
+integer arithmetic.
+
+    rref(packed, n_cols)        reduced row echelon form and pivot columns
+    rank(matrix)                rank
+    nullspace(matrix)           basis of {v : matrix @ v = 0}
+    solve(matrix, b)            one solution of matrix @ x = b
+    inverse(matrix)             inverse of a square matrix
+    quotient_basis(base, rows)  basis of span(rows) modulo span(base)
+
+The functions taking `matrix` accept dense 0/1 arrays or scipy sparse
+matrices, e.g. surfaceCode.get_check_matrix().
+'''
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sparse
+
+
+def pack(matrix) -> np.ndarray:
+    '''Pack the rows of a 0/1 matrix into uint64 words (rows, ceil(cols/64)).'''
+    rows, cols = matrix.shape
+    words = max((cols + 63) // 64, 1)
+    if sparse.issparse(matrix):
+        # Set the bits of the nonzeros directly, without a dense copy
+        coo = sparse.coo_matrix(matrix)
+        odd = (coo.data.astype(np.int64) & 1).astype(bool)
+        keys = coo.row[odd].astype(np.int64) * words + coo.col[odd] // 64
+        bits = np.uint64(1) << (coo.col[odd] % 64).astype(np.uint64)
+        order = np.argsort(keys, kind='stable')
+        keys, bits = keys[order], bits[order]
+        unique, starts = np.unique(keys, return_index=True)
+        packed = np.zeros(rows * words, dtype=np.uint64)
+        if len(unique):
+            packed[unique] = np.bitwise_xor.reduceat(bits, starts)
+        return packed.reshape(rows, words)
+    matrix = np.asarray(matrix, dtype=np.uint8) & 1
+    padded = np.zeros((rows, words * 64), dtype=np.uint8)
+    padded[:, :cols] = matrix
+    return np.packbits(padded, axis=1, bitorder='little').view(np.uint64)
+
+
+def unpack(packed: np.ndarray, n_cols: int) -> np.ndarray:
+    '''Inverse of pack: uint8 matrix (rows, n_cols).'''
+    bits = np.unpackbits(np.ascontiguousarray(packed).view(np.uint8), axis=1, bitorder='little')
+    return bits[:, :n_cols]
+
+
+def _column(packed: np.ndarray, col: int) -> np.ndarray:
+    word, bit = divmod(col, 64)
+    return ((packed[:, word] >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+
+
+def _leading_columns(packed: np.ndarray) -> np.ndarray:
+    '''Column of the first one of every packed row (a huge value for zero rows).'''
+    nonzero = packed != 0
+    first_word = nonzero.argmax(axis=1)
+    words = packed[np.arange(len(packed)), first_word]
+    lowest_bit = words & (~words + np.uint64(1))
+    leading = first_word * 64 + np.bitwise_count(lowest_bit - np.uint64(1)).astype(np.int64)
+    return np.where(words != 0, leading, np.iinfo(np.int64).max)
+
+
+def rref(packed: np.ndarray, n_cols: int, reduced: bool = True,
+         pivot_cols: Optional[int] = None) -> Tuple[np.ndarray, List[int]]:
+    '''
+    Row echelon form of bit-packed rows.
+
+    The forward elimination is done for all pivots at once: rows are sorted
+    by their leading column, and in every group of rows sharing a leading
+    column the first row is XORed into the others, which moves their leading
+    column to the right. This repeats until the leading columns are distinct;
+    sparse check matrices need few rounds. The back substitution of the
+    reduced form works the same way on all rows at once.
+
+    Args:
+        packed: Packed rows; not modified
+        n_cols: Number of columns
+        reduced: Also clear the entries above the pivots (reduced form)
+        pivot_cols: Only count pivots in the first pivot_cols columns (all
+            if None); the other columns are carried along, as for an
+            augmented matrix
+
+    Returns:
+        (echelon rows, pivot columns); the first len(pivots) rows are the
+        pivot rows, row i with its leading one in column pivots[i], followed
+        by the remaining (zero, or for pivot_cols only right of pivot_cols)
+        rows
+    '''
+    rows = packed[(packed != 0).any(axis=1)]
+    leading = _leading_columns(rows)
+    zero = np.iinfo(np.int64).max
+    while True:
+        order = np.argsort(leading, kind='stable')
+        ordered = leading[order]
+        repeated = np.flatnonzero((ordered[1:] == ordered[:-1]) & (ordered[1:] != zero)) + 1
+        if not len(repeated):
+            break
+        # First row of the group of every repeated row; only the changed rows
+        # get their leading column recomputed
+        starts = np.ones(len(rows), dtype=bool)
+        starts[repeated] = False
+        first = np.maximum.accumulate(np.where(starts, np.arange(len(rows)), 0))
+        targets = order[repeated]
+        rows[targets] ^= rows[order[first[repeated]]]
+        leading[targets] = _leading_columns(rows[targets])
+
+    order = np.argsort(leading, kind='stable')
+    order = order[leading[order] != zero]
+    rows, leading = rows[order], leading[order]
+
+    limit = n_cols if pivot_cols is None else pivot_cols
+    pivots = [int(col) for col in leading if col < limit]
+
+    if reduced and len(pivots) > 1:
+        # Every row repeatedly takes in the pivot row of the first other pivot
+        # column where it has a one; that column is cleared and only columns to
+        # its right can be set, so the rows settle after a few rounds
+        mask = np.zeros(rows.shape[1], dtype=np.uint64)
+        columns = np.array(pivots)
+        np.bitwise_or.at(mask, columns // 64, np.uint64(1) << (columns % 64).astype(np.uint64))
+        row_of = np.zeros(rows.shape[1] * 64, dtype=np.int64)
+        row_of[columns] = np.arange(len(pivots))
+        active = np.arange(len(pivots))
+        while len(active):
+            other = rows[active] & mask
+            own_word, own_bit = np.divmod(columns[active], 64)
+            other[np.arange(len(active)), own_word] &= ~(np.uint64(1) << own_bit.astype(np.uint64))
+            first = _leading_columns(other)
+            active = active[first != zero]
+            if len(active):
+                rows[active] ^= rows[row_of[first[first != zero]]]
+
+    echelon = np.zeros_like(packed)
+    echelon[:len(rows)] = rows
+    return echelon, pivots
+
+
+def rank(matrix) -> int:
+    '''Rank over GF(2).'''
+    n_cols = matrix.shape[1]
+    return len(rref(pack(matrix), n_cols, reduced=False)[1])
+
+
+def nullspace(matrix) -> np.ndarray:
+    '''Basis (rows, uint8) of the nullspace {v : matrix @ v = 0 mod 2}.'''
+    n_cols = matrix.shape[1]
+    echelon, pivots = rref(pack(matrix), n_cols)
+    free = np.setdiff1d(np.arange(n_cols), pivots)
+    # Built transposed, so that the pivot rows are copied as whole rows
+    basis = np.zeros((n_cols, len(free)), dtype=np.uint8)
+    basis[free, np.arange(len(free))] = 1
+    if pivots:
+        basis[pivots] = unpack(echelon[:len(pivots)], n_cols)[:, free]
+    return basis.T
+
+
+def solve(matrix, b) -> Optional[np.ndarray]:
+    '''
+    One solution x of matrix @ x = b (mod 2), with zeros on the free variables.
+
+    Args:
+        matrix: (m, n) binary matrix
+        b: (m,) right-hand side, or (m, k) for k right-hand sides at once
+
+    Returns:
+        (n,) or (n, k) uint8 solution, or None if some system is inconsistent
+    '''
+    if sparse.issparse(matrix):
+        matrix = matrix.toarray()
+    b = np.asarray(b, dtype=np.uint8)
+    single = b.ndim == 1
+    b = b.reshape(len(b), -1)
+    n_cols = matrix.shape[1]
+    echelon, pivots = rref(pack(np.hstack([matrix, b])), n_cols + b.shape[1], pivot_cols=n_cols)
+    rhs = unpack(echelon, n_cols + b.shape[1])[:, n_cols:]
+    if rhs[len(pivots):].any():
+        return None
+    x = np.zeros((n_cols, b.shape[1]), dtype=np.uint8)
+    x[pivots] = rhs[:len(pivots)]
+    return x[:, 0] if single else x
+
+
+def inverse(matrix) -> np.ndarray:
+    '''Inverse of a square invertible GF(2) matrix.'''
+    size = len(matrix)
+    echelon, pivots = rref(pack(np.hstack([np.asarray(matrix, dtype=np.uint8), np.eye(size, dtype=np.uint8)])),
+                           2 * size, pivot_cols=size)
+    if len(pivots) != size:
+        raise ValueError("Matrix is singular")
+    return unpack(echelon, 2 * size)[:, size:]
+
+
+def quotient_basis(base, rows) -> np.ndarray:
+    '''
+    Basis of span(rows) modulo span(base), as rows reduced against the
+    echelon form of base (e.g. logical operators: normalizer modulo stabilizers).
+    '''
+    n_cols = rows.shape[1]
+    packed = pack(rows)
+    if base.shape[0]:
+        base_echelon, base_pivots = rref(pack(base), n_cols, reduced=False)
+        for i, col in enumerate(base_pivots):
+            hit = _column(packed, col)
+            packed[hit] ^= base_echelon[i]
+    echelon, pivots = rref(packed, n_cols)
+    return unpack(echelon[:len(pivots)], n_cols)
+
+
+if __name__ == '__main__':
+    import time
+
+    from surfacecode import surfaceCode
+
+    for distance in (11, 31, 71):
+        H = surfaceCode(distance).get_sparse_check_matrix()
+        start = time.perf_counter()
+        r = rank(H)
+        elapsed = time.perf_counter() - start
+        print(f"d={distance}: {H.shape[0]} x {H.shape[1]} check matrix, rank {r} "
+              f"({2 * distance ** 2 - r - distance ** 2} logical qubit), {1e3 * elapsed:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    A = (rng.random((200, 300)) < 0.05).astype(np.uint8)
+    x = (rng.random(300) < 0.5).astype(np.uint8)
+    solution = solve(A, A.astype(np.int64) @ x % 2)
+    assert ((A.astype(np.int64) @ solution) % 2 == (A.astype(np.int64) @ x) % 2).all()
+    assert not ((A.astype(np.int64) @ nullspace(A).T) % 2).any()
+    print("rank", rank(A), "nullity", len(nullspace(A)))
@@ -0,0 +1,320 @@
+'''
+Multi-round syndrome extraction and detector error models for the surface code.
+
+compile_syndrome_circuit measures every stabilizer once and assumes perfect
+measurements. A memory experiment instead repeats the stabilizer
+measurements for several rounds under circuit noise, including measurement
+errors, and compares consecutive rounds. For a memory in the Z basis (data
+prepared in |0>, measured in Z at the end), with R rounds:
+
+    detector (s, 0)      Z stabilizer s in round 0, whose value is known
+    detector (s, r)      Z stabilizer s in round r XOR round r-1
+    detector (s, R)      Z stabilizer s recomputed from the final data
+                         measurements XOR round R-1
+    observable           parity of the final data measurements on the
+                         logical Z (first row of data qubits)
+
+The X stabilizers are still measured every round, but are random in a Z
+memory and not needed to protect the logical Z, so they carry no detectors.
+An X memory is the same with the roles of X and Z exchanged.
+
+A detector error model (DEM) lists, for every independent fault of the noisy
+circuit, which detectors and observables it flips. It is derived by pushing
+all single faults through the circuit at once as bit-packed Pauli frames
+(one frame per fault) and merging faults with identical effects. The DEM is
+a check matrix over fault mechanisms, so the matching decoders of decoder.py
+decode it directly. Circuits, DEMs and decoders are cached per (distance,
+rounds, noise, basis).
+
+Qubits are 0-based: data qubit r*d+c as in surface_code_stabilizers, and the
+ancilla of stabilizer s is d**2+s.
+'''
+
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sparse
+
+from decoder import DECODERS, MatchingGraph
+from surfacecode import surface_code_stabilizers
+from syndromeschedule import SyndromeSchedule
+from tableausimulator import PauliFrameSimulator, propagate_frame
+
+
+def _csr_rows(rows: list, n_columns: int) -> sparse.csr_matrix:
+    '''Binary CSR matrix whose row i has ones at the column indices rows[i].'''
+    indptr = np.concatenate([[0], np.cumsum([len(r) for r in rows])])
+    indices = np.concatenate([np.asarray(r, dtype=np.int64) for r in rows]) if rows else np.zeros(0, dtype=np.int64)
+    return sparse.csr_matrix((np.ones(len(indices), dtype=np.uint8), indices, indptr), shape=(len(rows), n_columns))
+
+
+def _xor_rows(packed: np.ndarray, matrix: sparse.csr_matrix) -> np.ndarray:
+    '''XOR of the rows of `packed` selected by every row of a binary CSR matrix.'''
+    result = np.zeros((matrix.shape[0], packed.shape[1]), dtype=packed.dtype)
+    nonempty = np.flatnonzero(np.diff(matrix.indptr))
+    if len(nonempty):
+        result[nonempty] = np.bitwise_xor.reduceat(packed[matrix.indices], matrix.indptr[nonempty], axis=0)
+    return result
+
+
+class MemoryCircuit:
+    '''
+    Noisy multi-round syndrome extraction circuit of a d*d surface code, as
+    tableau operations (see tableausimulator.py).
+
+    Noise: a depolarizing channel of strength p_data on every data qubit at
+    the start of each round, a depolarizing channel of strength p_gate on both
+    qubits after every CX, and a bit flip with probability p_measure before
+    every measurement.
+
+    The stabilizers are measured either with the four-step hook-avoiding
+    schedule of syndromeschedule.py ('parallel') or one after the other as in
+    compile_syndrome_circuit ('sequential').
+    '''
+
+    def __init__(self, distance: int, rounds: int, p_data: float = 0.0, p_measure: float = 0.0,
+                 p_gate: float = 0.0, basis: str = 'Z', schedule: str = 'parallel'):
+        '''
+        Build the circuit.
+
+        Args:
+            distance: Code distance d
+            rounds: Number of syndrome extraction rounds R (>= 1)
+            p_data: Data qubit error rate per round
+            p_measure: Measurement error rate
+            p_gate: Error rate per CX
+            basis: 'Z' or 'X' memory
+            schedule: 'parallel' or 'sequential'
+        '''
+        if rounds < 1:
+            raise ValueError("At least one round is needed")
+        if basis not in ('X', 'Z'):
+            raise ValueError("basis must be 'X' or 'Z'")
+        if schedule not in ('parallel', 'sequential'):
+            raise ValueError("schedule must be 'parallel' or 'sequential'")
+        self.distance, self.rounds, self.basis = distance, rounds, basis
+
+        types, support = surface_code_stabilizers(distance)
+        n, m = distance ** 2, len(types)
+        stabilizers = [support.indices[support.indptr[s]:support.indptr[s + 1]] for s in range(m)]
+        self.n_qubits = n + m
+        self.n_clbits = rounds * m + n
+
+        ops = []
+        parallel_round = SyndromeSchedule(distance).operations() if schedule == 'parallel' else None
+
+        def depolarize(qubit, p):
+            if p > 0:
+                ops.append(('pauli', qubit, p / 3, p / 3, p / 3))
+
+        def measure(qubit, clbit):
+            if p_measure > 0:
+                ops.append(('pauli', qubit, p_measure, 0.0, 0.0))
+            ops.append(('measure', qubit, clbit))
+
+        if basis == 'X':
+            ops.extend(('h', q) for q in range(n))
+        for r in range(rounds):
+            for q in range(n):
+                depolarize(q, p_data)
+            if parallel_round is not None:
+                for operation in parallel_round:
+                    if operation[0] == 'measure':
+                        measure(operation[1], r * m + operation[2])
+                        continue
+                    ops.append(operation)
+                    if operation[0] == 'cx':
+                        depolarize(operation[1], p_gate)
+                        depolarize(operation[2], p_gate)
+                continue
+            for s in range(m):
+                ancilla = n + s
+                if types[s] == 'X':
+                    ops.append(('h', ancilla))
+                for q in stabilizers[s]:
+                    ops.append(('cx', ancilla, int(q)) if types[s] == 'X' else ('cx', int(q), ancilla))
+                    depolarize(int(q), p_gate)
+                    depolarize(ancilla, p_gate)
+                if types[s] == 'X':
+                    ops.append(('h', ancilla))
+                measure(ancilla, r * m + s)
+                ops.append(('reset', ancilla))
+        if basis == 'X':
+            ops.extend(('h', q) for q in range(n))
+        for q in range(n):
+            measure(q, rounds * m + q)
+        self.operations = ops
+
+        # Detectors of the stabilizers of the memory basis, round by round
+        checked = np.flatnonzero(types == basis)
+        final = rounds * m
+        rows, coordinates = [], []
+        for r in range(rounds + 1):
+            for s in checked:
+                if r == 0:
+                    rows.append([s])
+                elif r < rounds:
+                    rows.append([r * m + s, (r - 1) * m + s])
+                else:
+                    rows.append([(rounds - 1) * m + s] + list(final + stabilizers[s]))
+                coordinates.append((s, r))
+        self.detectors = _csr_rows(rows, self.n_clbits)
+        self.detector_coordinates = np.array(coordinates, dtype=int)
+
+        logical = np.arange(distance) if basis == 'Z' else np.arange(distance) * distance
+        self.observables = _csr_rows([final + logical], self.n_clbits)
+
+    def detection_events(self, records: np.ndarray) -> np.ndarray:
+        '''Detection events (shots, n_detectors) of measurement records (shots, n_clbits).'''
+        return ((self.detectors @ np.asarray(records, dtype=np.uint8).T).T & 1).astype(np.uint8)
+
+    def observable_flips(self, records: np.ndarray) -> np.ndarray:
+        '''Observable values (shots, n_observables) of measurement records.'''
+        return ((self.observables @ np.asarray(records, dtype=np.uint8).T).T & 1).astype(np.uint8)
+
+
+class DetectorErrorModel:
+    '''
+    Independent fault mechanisms of a noisy circuit.
+
+    check_matrix (n_detectors, n_mechanisms) and observables
+    (n_observables, n_mechanisms) are binary CSR matrices, and mechanism j
+    happens with probability probabilities[j].
+    '''
+
+    def __init__(self, check_matrix: sparse.csr_matrix, observables: sparse.csr_matrix,
+                 probabilities: np.ndarray):
+        self.check_matrix = check_matrix
+        self.observables = observables
+        self.probabilities = probabilities
+
+    @classmethod
+    def from_circuit(cls, circuit: MemoryCircuit) -> 'DetectorErrorModel':
+        '''
+        Derive the DEM of a circuit by propagating every single fault.
+
+        Every Pauli channel ('pauli', q, px, py, pz) contributes up to three
+        faults (X, Y or Z on q). Fault f is injected into frame f (bit f % 64
+        of word f // 64) at its location, all frames are propagated together,
+        and the measurement flips are mapped to detectors and observables.
+        '''
+        faults = []
+        for index, operation in enumerate(circuit.operations):
+            if operation[0] == 'pauli':
+                for x_bit, z_bit, p in ((1, 0, operation[2]), (1, 1, operation[3]), (0, 1, operation[4])):
+                    if p > 0:
+                        faults.append((index, operation[1], x_bit, z_bit, p))
+
+        words = (len(faults) + 63) // 64
+        x = np.zeros((circuit.n_qubits, words), dtype=np.uint64)
+        z = np.zeros((circuit.n_qubits, words), dtype=np.uint64)
+        record = np.zeros((circuit.n_clbits, words), dtype=np.uint64)
+
+        next_fault = 0
+        for index, operation in enumerate(circuit.operations):
+            if propagate_frame(operation, x, z):
+                continue
+            name, q = operation[0], operation[1]
+            if name == 'measure':
+                record[operation[2]] = x[q]
+            elif name == 'reset':
+                x[q] = 0
+                z[q] = 0
+            elif name == 'pauli':
+                while next_fault < len(faults) and faults[next_fault][0] == index:
+                    _, qubit, x_bit, z_bit, _ = faults[next_fault]
+                    word, mask = next_fault // 64, np.uint64(1) << np.uint64(next_fault % 64)
+                    if x_bit:
+                        x[qubit, word] |= mask
+                    if z_bit:
+                        z[qubit, word] |= mask
+                    next_fault += 1
+
+        def unpack(packed):
+            bits = np.unpackbits(packed.view(np.uint8), axis=1, bitorder='little')
+            return bits[:, :len(faults)].T
+
+        n_detectors = circuit.detectors.shape[0]
+        effects = np.hstack([unpack(_xor_rows(record, circuit.detectors)),
+                             unpack(_xor_rows(record, circuit.observables))])
+
+        # Merge faults with the same effect: 1 - 2p multiplies for XORed independent events
+        signatures, inverse = np.unique(effects, axis=0, return_inverse=True)
+        probabilities = np.array([f[4] for f in faults])
+        log_bias = np.bincount(inverse.reshape(-1), np.log1p(-2 * probabilities), minlength=len(signatures))
+        merged = (1 - np.exp(log_bias)) / 2
+
+        keep = signatures.any(axis=1)
+        signatures, merged = signatures[keep], merged[keep]
+        return cls(sparse.csr_matrix(signatures[:, :n_detectors].T),
+                   sparse.csr_matrix(signatures[:, n_detectors:].T), merged)
+
+    def matching_graph(self) -> MatchingGraph:
+        '''Matching graph over the detectors, weighted by log((1-p)/p).'''
+        return MatchingGraph(self.check_matrix, np.log((1 - self.probabilities) / self.probabilities))
+
+    def predict_observables(self, corrections: np.ndarray) -> np.ndarray:
+        '''Observable flips (shots, n_observables) implied by decoded mechanisms (shots, n_mechanisms).'''
+        return ((self.observables @ np.asarray(corrections, dtype=np.uint8).T).T & 1).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def memory_circuit(distance: int, rounds: int, p_data: float, p_measure: float, p_gate: float,
+                   basis: str = 'Z', schedule: str = 'parallel') -> MemoryCircuit:
+    return MemoryCircuit(distance, rounds, p_data, p_measure, p_gate, basis, schedule)
+
+
+@lru_cache(maxsize=None)
+def detector_error_model(distance: int, rounds: int, p_data: float, p_measure: float, p_gate: float,
+                         basis: str = 'Z', schedule: str = 'parallel') -> DetectorErrorModel:
+    return DetectorErrorModel.from_circuit(memory_circuit(distance, rounds, p_data, p_measure, p_gate, basis,
+                                                          schedule))
+
+
+@lru_cache(maxsize=None)
+def memory_decoder(distance: int, rounds: int, p_data: float, p_measure: float, p_gate: float,
+                   basis: str = 'Z', schedule: str = 'parallel', decoder: str = 'mwpm'):
+    dem = detector_error_model(distance, rounds, p_data, p_measure, p_gate, basis, schedule)
+    return DECODERS[decoder](dem.matching_graph())
+
+
+def memory_experiment(distance: int, rounds: int, p: float, shots: int, p_measure: Optional[float] = None,
+                      p_gate: Optional[float] = None, basis: str = 'Z', schedule: str = 'parallel',
+                      decoder: str = 'mwpm', seed: Optional[int] = None) -> Tuple[int, int]:
+    '''
+    Sample a memory experiment and count logical failures.
+
+    Args:
+        distance: Code distance
+        rounds: Number of syndrome extraction rounds
+        p: Data qubit error rate per round (also the default of the others)
+        shots: Number of shots
+        p_measure: Measurement error rate (p if None)
+        p_gate: Error rate per CX (p if None)
+        basis: 'Z' or 'X' memory
+        schedule: 'parallel' or 'sequential' (see MemoryCircuit)
+        decoder: 'mwpm' or 'uf'
+        seed: Seed of the sampling
+
+    Returns:
+        (failures, shots)
+    '''
+    noise = (p, p if p_measure is None else p_measure, p if p_gate is None else p_gate)
+    circuit = memory_circuit(distance, rounds, *noise, basis, schedule)
+    dem = detector_error_model(distance, rounds, *noise, basis, schedule)
+    matcher = memory_decoder(distance, rounds, *noise, basis, schedule, decoder)
+
+    records = PauliFrameSimulator(circuit.operations, circuit.n_qubits, circuit.n_clbits, seed=seed).sample(shots)
+    predicted = dem.predict_observables(matcher.decode_batch(circuit.detection_events(records)))
+    failures = np.any(predicted != circuit.observable_flips(records), axis=1)
+    return int(failures.sum()), shots
+
+
+if __name__ == '__main__':
+    p, shots = 0.002, 20000
+    for distance in (3, 5, 7):
+        failures, _ = memory_experiment(distance, distance, p, shots, decoder='uf', seed=0)
+        dem = detector_error_model(distance, distance, p, p, p)
+        print(f"d={distance}, {distance} rounds: {dem.check_matrix.shape[0]} detectors, "
+              f"{dem.check_matrix.shape[1]} fault mechanisms, logical error rate {failures / shots:.4f}")
@@ -11,11 +11,11 @@ from bloqade.qasm2.emit import QASM2 # the QASM2 target
 from bloqade.qasm2.parse import pprint # the QASM2 pretty printer
 
 
-from collections import Counter
+from shotresults import ShotResults
 
 
 def to_bitstrings(results):
-    return Counter(map(lambda result:"".join(map(str, result)), results))
+    return ShotResults.from_bits(results).counts()
 
 
 @qasm2.extended
@@ -0,0 +1,185 @@
+'''
+Measurement results of many shots, bit-packed.
+
+to_bitstrings (repetitioncode.py and the notebooks) turns every shot into a
+string and counts them in a Counter, and the post-processing then parses the
+keys again (str(key).count('1')). ShotResults keeps the shots as a packed
+uint8 array instead, one row of ceil(n_bits / 8) bytes per shot with
+classical bit j in bit j % 8 of byte j // 8, and works on all shots at once:
+
+    marginal(clbits)         results restricted to some classical bits
+    parity(clbits)           parity of every shot
+    hamming_weight(clbits)   number of ones of every shot
+    expectation(clbits)      mean of (-1)^parity, e.g. <Z0 Z1>
+    histogram()              distinct outcomes and their counts
+    weight_histogram()       number of shots per Hamming weight
+    counts()                 the Counter of to_bitstrings, with one string
+                             per distinct outcome rather than per shot
+
+Results come from 0/1 arrays or PyQrack's multi_run (from_bits), from the
+packed records of PauliFrameSimulator.sample_packed (from_packed_records) or
+from existing counts dictionaries (from_counts).
+'''
+
+from collections import Counter
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ShotResults:
+    '''
+    Packed measurement outcomes of `shots` shots of `n_bits` classical bits.
+    '''
+
+    def __init__(self, packed: np.ndarray, n_bits: int):
+        '''
+        Wrap packed outcomes.
+
+        Args:
+            packed: uint8 array (shots, ceil(n_bits / 8)), little-endian bits
+            n_bits: Number of classical bits
+        '''
+        self.packed = np.ascontiguousarray(packed, dtype=np.uint8)
+        self.n_bits = n_bits
+
+    @classmethod
+    def from_bits(cls, bits) -> 'ShotResults':
+        '''Results of a (shots, n_bits) 0/1 array or a list of registers (PyQrack multi_run).'''
+        bits = np.asarray(bits, dtype=np.uint8)
+        if bits.ndim != 2:
+            # A list of registers, or no shots at all
+            bits = bits.reshape(len(bits), -1) if bits.size else np.zeros((len(bits), 0), dtype=np.uint8)
+        return cls(np.packbits(bits, axis=1, bitorder='little'), bits.shape[1])
+
+    @classmethod
+    def from_packed_records(cls, records: np.ndarray, shots: int) -> 'ShotResults':
+        '''Results of PauliFrameSimulator.sample_packed: uint64 (n_bits, ceil(shots / 64)), packed over shots.'''
+        n_bits = len(records)
+        bits = np.unpackbits(np.ascontiguousarray(records).view(np.uint8), axis=1, bitorder='little')[:, :shots]
+        return cls(np.packbits(bits.T, axis=1, bitorder='little'), n_bits)
+
+    @classmethod
+    def from_counts(cls, counts: Dict[str, int], reverse: bool = False) -> 'ShotResults':
+        '''
+        Results of a counts dictionary, in the format of to_bitstrings
+        (classical bit 0 first), or of qiskit's get_counts if reverse.
+        '''
+        keys = [key.replace(' ', '') for key in counts]
+        if not keys:
+            return cls(np.zeros((0, 0), dtype=np.uint8), 0)
+        rows = np.frombuffer(''.join(keys).encode(), dtype=np.uint8).reshape(len(keys), -1) - ord('0')
+        if reverse:
+            rows = rows[:, ::-1]
+        repeats = np.array(list(counts.values()), dtype=np.int64)
+        return cls.from_bits(np.repeat(rows, repeats, axis=0))
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    @property
+    def shots(self) -> int:
+        return len(self.packed)
+
+    def bits(self) -> np.ndarray:
+        '''Outcomes as a uint8 array (shots, n_bits).'''
+        return np.unpackbits(self.packed, axis=1, bitorder='little', count=self.n_bits)
+
+    def _mask(self, clbits: Optional[Sequence[int]]) -> np.ndarray:
+        '''Byte mask of the classical bits clbits (all bits if None).'''
+        if clbits is None:
+            clbits = np.arange(self.n_bits)
+        mask = np.zeros(self.packed.shape[1], dtype=np.uint8)
+        clbits = np.asarray(clbits, dtype=np.int64)
+        np.bitwise_or.at(mask, clbits // 8, (np.uint8(1) << (clbits % 8).astype(np.uint8)))
+        return mask
+
+    def marginal(self, clbits: Sequence[int]) -> 'ShotResults':
+        '''Results of the classical bits clbits only, in that order.'''
+        clbits = np.asarray(clbits, dtype=np.int64)
+        bits = (self.packed[:, clbits // 8] >> (clbits % 8).astype(np.uint8)) & np.uint8(1)
+        return ShotResults(np.packbits(bits, axis=1, bitorder='little'), len(clbits))
+
+    def hamming_weight(self, clbits: Optional[Sequence[int]] = None) -> np.ndarray:
+        '''Number of ones of every shot among clbits (all bits if None), int64 (shots,).'''
+        return np.bitwise_count(self.packed & self._mask(clbits)).sum(axis=1, dtype=np.int64)
+
+    def parity(self, clbits: Optional[Sequence[int]] = None) -> np.ndarray:
+        '''Parity of every shot over clbits (all bits if None), uint8 (shots,).'''
+        masked = self.packed & self._mask(clbits)
+        return (np.bitwise_count(np.bitwise_xor.reduce(masked, axis=1)) & 1).astype(np.uint8)
+
+    def expectation(self, clbits: Optional[Sequence[int]] = None) -> float:
+        '''Mean of (-1)^parity over the shots, the expectation of Z on clbits.'''
+        return float(1 - 2 * self.parity(clbits).mean()) if self.shots else 0.0
+
+    def histogram(self) -> Tuple['ShotResults', np.ndarray]:
+        '''
+        Distinct outcomes and how often each occurs.
+
+        Returns:
+            (outcomes, counts): ShotResults of the distinct outcomes, sorted,
+            and their int64 counts
+        '''
+        if not self.shots:
+            return ShotResults(self.packed, self.n_bits), np.zeros(0, dtype=np.int64)
+        width = self.packed.shape[1]
+        if width <= 8:
+            # One integer per shot sorts much faster than rows
+            padded = np.zeros((self.shots, 8), dtype=np.uint8)
+            padded[:, :width] = self.packed
+            keys, counts = np.unique(padded.view('<u8').reshape(-1), return_counts=True)
+            outcomes = keys.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :width]
+        else:
+            outcomes, counts = np.unique(self.packed, axis=0, return_counts=True)
+        return ShotResults(outcomes, self.n_bits), counts.astype(np.int64)
+
+    def weight_histogram(self, clbits: Optional[Sequence[int]] = None) -> np.ndarray:
+        '''Number of shots with Hamming weight 0, 1, ..., len(clbits) among clbits.'''
+        n_bits = self.n_bits if clbits is None else len(clbits)
+        return np.bincount(self.hamming_weight(clbits), minlength=n_bits + 1)
+
+    def counts(self, reverse: bool = False) -> Counter:
+        '''
+        Counter of bit strings, classical bit 0 first as in to_bitstrings, or
+        last as in qiskit's get_counts if reverse.
+        '''
+        outcomes, counts = self.histogram()
+        rows = outcomes.bits()
+        if reverse:
+            rows = rows[:, ::-1]
+        if not self.n_bits:
+            return Counter({'': int(count) for count in counts})
+        keys = np.ascontiguousarray(rows + ord('0')).view(f'S{self.n_bits}').reshape(-1)
+        return Counter({key.decode(): int(count) for key, count in zip(keys, counts)})
+
+
+if __name__ == '__main__':
+    import time
+
+    from surfacecode import surfaceCode
+    from tableausimulator import PauliFrameSimulator, circuit_operations
+
+    # 10^6 shots of a d=5 surface code syndrome circuit with an injected error
+    code = surfaceCode(5)
+    code.inject_error({7: 'X'})
+    code.compile_syndrome_circuit()
+    circuit = code.get_circuit()
+    simulator = PauliFrameSimulator(circuit_operations(circuit), circuit.num_qubits, circuit.num_clbits, seed=0)
+    shots = 10 ** 6
+    records = simulator.sample_packed(shots)
+
+    start = time.perf_counter()
+    results = ShotResults.from_packed_records(records, shots)
+    weights = results.weight_histogram()
+    parity = results.parity([0, 1, 2, 3])
+    counts = results.counts()
+    print(f"{shots} shots of {results.n_bits} bits in {results.packed.nbytes / 2 ** 20:.1f} MB: "
+          f"Hamming weights, parities and counts in {time.perf_counter() - start:.2f} s")
+    print("shots per Hamming weight:", weights[weights > 0], "distinct outcomes:", len(counts))
+
+    # Same counts as the string-keyed to_bitstrings
+    bits = results.bits()[:10000]
+    strings = Counter(map(lambda result: "".join(map(str, result)), bits))
+    assert ShotResults.from_bits(bits).counts() == strings
+    assert ShotResults.from_counts(strings).counts() == strings
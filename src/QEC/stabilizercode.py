@@ -0,0 +1,355 @@
+'''
+Stabilizer codes defined by their check matrix.
+
+surfaceCode and repetitioncode.py each hard-code one family of codes. A
+StabilizerCode is built from any check matrix instead, in the layout of
+surfaceCode.get_check_matrix: one row per stabilizer, the Z part on the first
+n columns and the X part on the last n. From that matrix alone it derives
+
+    stabilizers()            stabalizer objects, as surfaceCode._stab
+    logical_operators()      k pairs of logical X and Z operators, found by
+                             Gaussian elimination over GF(2) (gf2.py)
+    syndromes(errors)        syndromes of (shots, 2n) errors, X bits first
+    syndrome_operations()    syndrome measurement circuit as tableau operations
+    syndrome_circuit()       the same circuit as a qiskit QuantumCircuit
+    decode_batch(syndromes)  corrections from the matching decoders of
+                             decoder.py (CSS codes with graph-like checks), or
+                             from a lookup table (lookupdecoder.py, any code
+                             with at most 24 checks)
+
+The module also builds the usual families: repetition codes, the unrotated
+and rotated surface codes, the triangular 6.6.6 color codes, hypergraph
+products of classical codes, and codes given by Pauli strings such as the
+five-qubit code.
+'''
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import scipy.sparse as sparse
+from qiskit import QuantumCircuit
+
+from decoder import DECODERS, MatchingGraph, css_check_matrices
+from gf2 import inverse, nullspace, quotient_basis, rank
+from lookupdecoder import LookupTableDecoder
+from surfacecode import stabalizer, surface_code_stabilizers
+
+
+def symplectic_product(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    '''Commutation matrix (1 = anticommute) of Pauli rows a and b in the [Z part | X part] layout.'''
+    n = a.shape[1] // 2
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    return ((a[:, :n] @ b[:, n:].T + a[:, n:] @ b[:, :n].T) & 1).astype(np.uint8)
+
+
+class StabilizerCode:
+    '''
+    [[n, k]] stabilizer code given by its check matrix.
+    '''
+
+    def __init__(self, check_matrix, name: str = ''):
+        '''
+        Build the code.
+
+        Args:
+            check_matrix: (m, 2n) binary matrix, Z part on the first n
+                columns and X part on the last n; rows may be dependent
+            name: Label used by __str__
+        '''
+        check_matrix = check_matrix.toarray() if sparse.issparse(check_matrix) else np.asarray(check_matrix)
+        self._Hmatrix = (check_matrix % 2).astype(np.uint8)
+        self.name = name
+        self.n = self._Hmatrix.shape[1] // 2
+        if symplectic_product(self._Hmatrix, self._Hmatrix).any():
+            raise ValueError("Stabilizers do not commute")
+        self.rank = rank(self._Hmatrix)
+        self.k = self.n - self.rank
+        self._logicals = None
+        self._decoders: Dict[str, tuple] = {}
+        self._lookup: Optional[LookupTableDecoder] = None
+
+    @classmethod
+    def from_css(cls, hx, hz, name: str = '') -> 'StabilizerCode':
+        '''CSS code with X-type checks hx and Z-type checks hz (both with n columns).'''
+        hx = np.atleast_2d(np.asarray(hx, dtype=np.uint8))
+        hz = np.atleast_2d(np.asarray(hz, dtype=np.uint8))
+        n = max(hx.shape[1], hz.shape[1])
+        hx, hz = hx.reshape(-1, n), hz.reshape(-1, n)
+        check_matrix = np.vstack([np.hstack([hz, np.zeros_like(hz)]), np.hstack([np.zeros_like(hx), hx])])
+        return cls(check_matrix, name)
+
+    @classmethod
+    def from_stabilizers(cls, stabilizers: Sequence[str], name: str = '') -> 'StabilizerCode':
+        '''Code generated by Pauli strings such as 'XZZXI' (qubit 0 first).'''
+        n = len(stabilizers[0])
+        check_matrix = np.zeros((len(stabilizers), 2 * n), dtype=np.uint8)
+        for row, pauli in enumerate(stabilizers):
+            for q, op in enumerate(pauli.upper()):
+                check_matrix[row, q] = op in 'ZY'
+                check_matrix[row, n + q] = op in 'XY'
+        return cls(check_matrix, name)
+
+    def __str__(self) -> str:
+        return f"{self.name or 'StabilizerCode'} [[{self.n}, {self.k}]]"
+
+    def get_check_matrix(self) -> np.ndarray:
+        return self._Hmatrix
+
+    def get_sparse_check_matrix(self) -> sparse.csr_matrix:
+        return sparse.csr_matrix(self._Hmatrix)
+
+    def is_css(self) -> bool:
+        z_part, x_part = self._Hmatrix[:, :self.n].any(axis=1), self._Hmatrix[:, self.n:].any(axis=1)
+        return not (z_part & x_part).any()
+
+    def stabilizers(self) -> List[stabalizer]:
+        '''The checks as stabalizer objects with 1-based qubits, as in surfaceCode._stab.'''
+        result = []
+        for row in self._Hmatrix:
+            z, x = row[:self.n], row[self.n:]
+            result.append(stabalizer([('Y' if x[q] and z[q] else 'X' if x[q] else 'Z', int(q) + 1)
+                                      for q in np.flatnonzero(x | z)]))
+        return result
+
+    def logical_operators(self) -> np.ndarray:
+        '''
+        Logical operators, in the layout of the check matrix.
+
+        Returns:
+            (2k, 2n) uint8 array: logical X_1..X_k then logical Z_1..Z_k, such
+            that X_i anticommutes with Z_i only. For a CSS code the logical X
+            (Z) operators are X-type (Z-type). An error e (X bits first, as in
+            syndromes) flips logical j if e @ L[j] is odd.
+        '''
+        if self._logicals is None:
+            self._logicals = self._css_logicals() if self.is_css() else self._symplectic_logicals()
+        return self._logicals
+
+    def _css_logicals(self) -> np.ndarray:
+        hz, _, hx, _ = css_check_matrices(self._Hmatrix)
+        n, k = self.n, self.k
+        # X logicals commute with the Z checks and are not products of X checks
+        lx = quotient_basis(hx, nullspace(hz))
+        lz = quotient_basis(hz, nullspace(hx))
+        # Pair them up: make lx @ lz.T the identity
+        pairing = (lx.astype(np.int64) @ lz.T.astype(np.int64)) & 1
+        lz = (inverse(pairing.astype(np.uint8)).T.astype(np.int64) @ lz) & 1
+        logicals = np.zeros((2 * k, 2 * n), dtype=np.uint8)
+        logicals[:k, n:] = lx
+        logicals[k:, :n] = lz
+        return logicals
+
+    def _symplectic_logicals(self) -> np.ndarray:
+        n = self.n
+        # Paulis commuting with every check: swap the halves of the nullspace of H
+        normalizer = np.roll(nullspace(self._Hmatrix), n, axis=1)
+        candidates = list(quotient_basis(self._Hmatrix, normalizer))
+        x_logicals, z_logicals = [], []
+        # Symplectic Gram-Schmidt
+        while candidates:
+            a = candidates.pop(0)
+            products = [symplectic_product(a[None], c[None])[0, 0] for c in candidates]
+            b = candidates.pop(products.index(1))
+            updated = []
+            for c in candidates:
+                with_b = symplectic_product(c[None], b[None])[0, 0]
+                with_a = symplectic_product(c[None], a[None])[0, 0]
+                updated.append(c ^ (with_b * a) ^ (with_a * b))
+            candidates = updated
+            x_logicals.append(a)
+            z_logicals.append(b)
+        return np.array(x_logicals + z_logicals, dtype=np.uint8).reshape(2 * self.k, 2 * n)
+
+    def syndromes(self, errors) -> np.ndarray:
+        '''
+        Syndromes of a batch of Pauli errors.
+
+        Args:
+            errors: (shots, 2n) or (2n,) 0/1 array, X error bits then Z error bits
+
+        Returns:
+            uint8 array of shape (shots, m), or (m,) for a single error
+        '''
+        errors = np.asarray(errors, dtype=np.int64)
+        return ((errors @ self._Hmatrix.T.astype(np.int64)) & 1).astype(np.uint8)
+
+    def logical_flips(self, errors) -> np.ndarray:
+        '''Which logical operators (columns, in the order of logical_operators) each error flips.'''
+        errors = np.asarray(errors, dtype=np.int64)
+        return ((errors @ self.logical_operators().T.astype(np.int64)) & 1).astype(np.uint8)
+
+    def syndrome_operations(self) -> List[tuple]:
+        '''
+        Syndrome measurement circuit as tableau operations (see
+        tableausimulator.py): the ancilla of check s is qubit n+s and is
+        measured into clbit s. Z-type checks use CX gates onto the ancilla,
+        the others an ancilla in |+> controlling CX (X), CZ (Z) and CY (Y,
+        as S^dagger CX S) gates.
+        '''
+        ops = []
+        n = self.n
+        for s, row in enumerate(self._Hmatrix):
+            ancilla = n + s
+            z, x = row[:n], row[n:]
+            qubits = np.flatnonzero(x | z)
+            if not x.any():
+                ops.extend(('cx', int(q), ancilla) for q in qubits)
+            else:
+                ops.append(('h', ancilla))
+                for q in map(int, qubits):
+                    if x[q] and z[q]:
+                        ops.extend([('sdg', q), ('cx', ancilla, q), ('s', q)])
+                    elif x[q]:
+                        ops.append(('cx', ancilla, q))
+                    else:
+                        ops.append(('cz', ancilla, q))
+                ops.append(('h', ancilla))
+            ops.append(('measure', ancilla, s))
+        return ops
+
+    def syndrome_circuit(self) -> QuantumCircuit:
+        '''The syndrome measurement circuit as a qiskit QuantumCircuit.'''
+        m = len(self._Hmatrix)
+        circuit = QuantumCircuit(self.n + m, m)
+        for op in self.syndrome_operations():
+            getattr(circuit, op[0])(*op[1:])
+        return circuit
+
+    def decoders(self, decoder: str = 'mwpm') -> tuple:
+        '''
+        Matching decoders of a CSS code whose checks are graph-like (every
+        qubit in at most two checks of each type), built once per decoder name.
+
+        Returns:
+            (x_decoder, z_rows, z_decoder, x_rows): x_decoder corrects X errors
+            from the syndrome bits z_rows (the Z checks), z_decoder corrects Z
+            errors from the bits x_rows
+        '''
+        if decoder not in self._decoders:
+            if not self.is_css():
+                raise ValueError("Matching decoders need a CSS code")
+            hz, z_rows, hx, x_rows = css_check_matrices(self._Hmatrix)
+            self._decoders[decoder] = (DECODERS[decoder](MatchingGraph(hz)), z_rows,
+                                       DECODERS[decoder](MatchingGraph(hx)), x_rows)
+        return self._decoders[decoder]
+
+    def lookup_decoder(self) -> LookupTableDecoder:
+        '''
+        Minimum-weight lookup-table decoder over the single-qubit X, Z and Y
+        errors, for any code with at most 24 checks; built once.
+        '''
+        if self._lookup is None:
+            n = self.n
+            identity, zeros = np.eye(n, dtype=np.uint8), np.zeros((n, n), dtype=np.uint8)
+            errors = np.vstack([np.hstack([identity, zeros]), np.hstack([zeros, identity]),
+                                np.hstack([identity, identity])])
+            self._lookup = LookupTableDecoder(self._Hmatrix, errors)
+        return self._lookup
+
+    def decode_batch(self, syndromes, decoder: str = 'mwpm') -> np.ndarray:
+        '''
+        Corrections (shots, 2n), X bits first, for a batch of syndromes (shots, m).
+        decoder is 'mwpm', 'uf' or 'lookup' (see lookup_decoder).
+        '''
+        syndromes = np.atleast_2d(np.asarray(syndromes, dtype=np.uint8))
+        if decoder == 'lookup':
+            return self.lookup_decoder().decode_batch(syndromes)
+        x_decoder, z_rows, z_decoder, x_rows = self.decoders(decoder)
+        corrections = np.zeros((len(syndromes), 2 * self.n), dtype=np.uint8)
+        corrections[:, :self.n] = x_decoder.decode_batch(syndromes[:, z_rows])
+        corrections[:, self.n:] = z_decoder.decode_batch(syndromes[:, x_rows])
+        return corrections
+
+
+def repetition_check_matrix(n: int) -> np.ndarray:
+    '''(n-1, n) parity checks of neighbouring bits.'''
+    return (np.eye(n - 1, n, dtype=np.uint8) + np.eye(n - 1, n, 1, dtype=np.uint8)).astype(np.uint8)
+
+
+def repetition_code(n: int) -> StabilizerCode:
+    '''Bit-flip repetition code with Z_i Z_{i+1} checks, as in repetitioncode.py for n=3.'''
+    return StabilizerCode.from_css(np.zeros((0, n), dtype=np.uint8), repetition_check_matrix(n),
+                                   f"repetition code n={n}")
+
+
+def hypergraph_product(h1: np.ndarray, h2: np.ndarray, name: str = '') -> StabilizerCode:
+    '''
+    Hypergraph product of two classical codes with check matrices h1 (r1, n1)
+    and h2 (r2, n2): n1*n2 + r1*r2 qubits, with
+        hx = [h1 x I(n2) | I(r1) x h2^T]
+        hz = [I(n1) x h2 | h1^T x I(r2)]
+    '''
+    h1, h2 = np.asarray(h1, dtype=np.uint8), np.asarray(h2, dtype=np.uint8)
+    (r1, n1), (r2, n2) = h1.shape, h2.shape
+    hx = np.hstack([np.kron(h1, np.eye(n2, dtype=np.uint8)), np.kron(np.eye(r1, dtype=np.uint8), h2.T)])
+    hz = np.hstack([np.kron(np.eye(n1, dtype=np.uint8), h2), np.kron(h1.T, np.eye(r2, dtype=np.uint8))])
+    return StabilizerCode.from_css(hx, hz, name or f"hypergraph product {h1.shape} x {h2.shape}")
+
+
+def surface_code(distance: int) -> StabilizerCode:
+    '''Unrotated planar surface code [[d^2+(d-1)^2, 1, d]], the hypergraph product of two repetition codes.'''
+    h = repetition_check_matrix(distance)
+    return hypergraph_product(h, h, f"surface code d={distance}")
+
+
+def rotated_surface_code(distance: int) -> StabilizerCode:
+    '''Rotated surface code [[d^2, 1, d]] with the checks of surfaceCode(d).'''
+    types, support = surface_code_stabilizers(distance)
+    support = support.toarray()
+    return StabilizerCode.from_css(support[types == 'X'], support[types == 'Z'],
+                                   f"rotated surface code d={distance}")
+
+
+def color_code(distance: int) -> StabilizerCode:
+    '''
+    Triangular 6.6.6 color code [[(3d^2+1)/4, 1, d]] for odd d; d=3 is the
+    Steane code.
+
+    The points (i, j), i+j <= 3(d-1)/2 of a triangular lattice are 3-colored
+    by (i-j) mod 3. Points with (i-j) mod 3 == 1 are the faces, the others
+    the qubits, and every face checks its (up to six) lattice neighbours, in
+    both the X and Z basis.
+    '''
+    if distance % 2 == 0:
+        raise ValueError("The triangular color code has odd distance")
+    size = 3 * (distance - 1) // 2
+    points = [(i, j) for i in range(size + 1) for j in range(size + 1 - i)]
+    qubits = {p: index for index, p in enumerate(p for p in points if (p[0] - p[1]) % 3 != 1)}
+    faces = [p for p in points if (p[0] - p[1]) % 3 == 1]
+    checks = np.zeros((len(faces), len(qubits)), dtype=np.uint8)
+    for row, (i, j) in enumerate(faces):
+        for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)):
+            if (i + di, j + dj) in qubits:
+                checks[row, qubits[(i + di, j + dj)]] = 1
+    return StabilizerCode.from_css(checks, checks, f"color code d={distance}")
+
+
+def five_qubit_code() -> StabilizerCode:
+    '''The [[5, 1, 3]] perfect code, a non-CSS code.'''
+    return StabilizerCode.from_stabilizers(['XZZXI', 'IXZZX', 'XIXZZ', 'ZXIXZ'], "five-qubit code")
+
+
+if __name__ == '__main__':
+    from tableausimulator import PauliFrameSimulator
+
+    rng = np.random.default_rng(0)
+    for code in (repetition_code(5), surface_code(3), rotated_surface_code(5), color_code(5),
+                 hypergraph_product(repetition_check_matrix(3), repetition_check_matrix(4)), five_qubit_code()):
+        print(code, f"{len(code.get_check_matrix())} checks, CSS: {code.is_css()}")
+        for op in code.stabilizers()[:2]:
+            print("   stabilizer", op)
+
+        # The syndrome circuit reproduces syndromes() for a random X error
+        error = np.zeros(2 * code.n, dtype=np.uint8)
+        error[:code.n] = rng.random(code.n) < 0.2
+        m = len(code.get_check_matrix())
+        prefix = [('x', int(q)) for q in np.flatnonzero(error[:code.n])]
+        z_rows = np.flatnonzero(~code.get_check_matrix()[:, code.n:].any(axis=1))
+        sample = PauliFrameSimulator(prefix + code.syndrome_operations(), code.n + m, m, seed=0).sample(1)[0]
+        assert (sample[z_rows] == code.syndromes(error)[z_rows]).all()
+
+    code = surface_code(5)
+    errors = np.zeros((10000, 2 * code.n), dtype=np.uint8)
+    errors[:, :code.n] = rng.random((10000, code.n)) < 0.05
+    residual = errors ^ code.decode_batch(code.syndromes(errors), 'uf')
+    print(code, "logical error rate at p=0.05:", code.logical_flips(residual).any(axis=1).mean())
@@ -1,8 +1,12 @@
+import math
+from functools import lru_cache
 from qiskit import QuantumCircuit
-from typing import List
+from typing import Any, List
 import numpy as np
+import scipy.sparse as sparse
 from qiskit_aer import AerSimulator
 from qiskit.visualization import plot_histogram
+from tableausimulator import PauliFrameSimulator, circuit_operations, counts_from_bits
 
 class stabalizer:
     
@@ -32,6 +36,38 @@ class stabalizer:
 
 
 
+'''
+Stabilizers of the d*d rotated surface code, generated as arrays.
+Plaquette (r,c) acts on data qubits (r,c),(r,c+1),(r+1,c),(r+1,c+1) (0-based
+index r*d+c); plaquettes with r+c even are X stabilizers and the others Z
+stabilizers, in a checkerboard. Weight-two X stabilizers sit on the top and
+bottom boundaries next to Z plaquettes, and weight-two Z stabilizers on the
+left and right boundaries next to X plaquettes.
+The order is: X plaquettes (row by row), top X, bottom X, Z plaquettes, left Z,
+right Z. Returns the array of stabilizer types ('X'/'Z') and a CSR matrix of
+shape (d**2-1, d**2) holding the 0-based supports.
+'''
+def surface_code_stabilizers(distance:int)->tuple:
+    d=distance
+    row,col=np.divmod(np.arange((d-1)**2),d-1)
+    plaquettes=(row*d+col)[:,None]+np.array([0,1,d,d+1])
+    isX=(row+col)%2==0
+
+    cols=np.arange(d-1)
+    top=cols[cols%2==1][:,None]+np.array([0,1])
+    bottom=d*(d-1)+cols[(d-2+cols)%2==1][:,None]+np.array([0,1])
+    left=d*cols[cols%2==0][:,None]+np.array([0,d])
+    right=d*cols[(cols+d-2)%2==0][:,None]+np.array([d-1,2*d-1])
+
+    groups=[plaquettes[isX],top,bottom,plaquettes[~isX],left,right]
+    types=np.repeat(np.array(['X','X','X','Z','Z','Z']),[len(g) for g in groups])
+    weights=np.concatenate([np.full(len(g),g.shape[1]) for g in groups])
+    indices=np.concatenate([g.reshape(-1) for g in groups])
+    indptr=np.concatenate([[0],np.cumsum(weights)])
+    support=sparse.csr_matrix((np.ones(len(indices),dtype=np.uint8),indices,indptr),shape=(len(types),d**2))
+    return types,support
+
+
 
 class surfaceCode:
     
@@ -68,7 +104,6 @@ class surfaceCode:
         self._stab=[]
         self._error={}
         self.calc_stab()
-        self._Hmatrix=np.zeros((self._nstab, 2*self._ndataqubits),dtype=int)
         self.calculate_H_matrix()
         
     def get_xy(self,qubit:int)->tuple:
@@ -102,75 +137,18 @@ class surfaceCode:
         
     '''
     Calculate the satbilizer
-    Each stabilizer is stored in a list.
+    The stabilizers are generated as arrays by surface_code_stabilizers and
+    also kept as stabalizer objects (1-based qubits) in self._stab.
     For example, S1=[1,2,5,6]
     '''    
     def calc_stab(self):
-        '''
-        Add X stabilizers in side the boundary
-                        Qa------Qa+1
-                        |       |
-                        |       |
-                        Qa+d----Qa+d+1
-        line 0: Q1-Q2-Q3-...-Qd
-        line 1: Qd+1-Q6-Q7-Q8-...-Q2d
-        ...
-        line k: Qkd+1-Qkd+2-...-Q(k+1)d
-                        
-        '''
-        d=self._distance
-        currentLine=0
-        lefttopIndex=1
-        while currentLine<d  and lefttopIndex+d+1<=d**2:
-            self._stab.append(stabalizer([('X',lefttopIndex),('X',lefttopIndex+1),('X',lefttopIndex+d),('X',lefttopIndex+d+1)]))
-            self._nXstab+=1
-            if lefttopIndex+2 < (currentLine+1)*d:
-                lefttopIndex=lefttopIndex+2
-            else:
-                currentLine=currentLine+1
-                lefttopIndex=lefttopIndex+3
-    
-        '''
-        Add X stabilizers that attached to the top and bottom boundary(Tough boundary)
-        '''        
-        leftindex=2
-        while leftindex+1<=d:
-            self._stab.append(stabalizer([('X',leftindex),('X',leftindex+1)]))
-            self._nXstab+=1
-            leftindex+=2
-        leftindex=d*(d-1)+2
-        while leftindex+1<=d**2:
-            self._stab.append(stabalizer([('X',leftindex),('X',leftindex+1)]))
-            self._nXstab+=1
-            leftindex+=2
-                            
-        '''
-        Add Z stabilizers inside the boundary
-        '''
-        currentLine=0
-        lefttopIndex=2
-        while currentLine<d  and lefttopIndex+d+1<=d**2:
-            self._stab.append(stabalizer([('Z',lefttopIndex),('Z',lefttopIndex+1),('Z',lefttopIndex+d),('Z',lefttopIndex+d+1)]))
-            self._nZstab+=1
-            if lefttopIndex+2 < (currentLine+1)*d:
-                lefttopIndex=lefttopIndex+2
-            else:
-                currentLine=currentLine+1
-                lefttopIndex=lefttopIndex+3       
-
-        '''
-        Add Z stabilizers that attached to the left and right boundary(Soft boundary)
-        '''          
-        topindex=1     
-        while topindex+d<=(d-1)*d+1:
-            self._stab.append(stabalizer([('Z',topindex),('Z',topindex+d)]))
-            self._nZstab+=1
-            topindex=topindex+2*d
-        topindex=d
-        while topindex+d<=d**2:
-            self._stab.append(stabalizer([('Z',topindex),('Z',topindex+d)]))
-            self._nZstab+=1
-            topindex=topindex+2*d
+        self._stabtypes,self._stabsupport=surface_code_stabilizers(self._distance)
+        self._nXstab=int(np.count_nonzero(self._stabtypes=='X'))
+        self._nZstab=self._nstab-self._nXstab
+        indptr,indices=self._stabsupport.indptr,self._stabsupport.indices
+        for index,stype in enumerate(self._stabtypes):
+            qubits=indices[indptr[index]:indptr[index+1]]
+            self._stab.append(stabalizer([(str(stype),int(qubit)+1) for qubit in qubits]))
 
 
     def get_stab_by_index(self,index:int)->stabalizer:
@@ -240,25 +218,89 @@ class surfaceCode:
     '''                     
     
     def calculate_H_matrix(self):
-        stabindex=0
-        for stab in self._stab:
-            tmpstab=stab.get_stab()
-            for (typestr,qubit) in tmpstab:
-                if typestr=='Z':
-                    self._Hmatrix[stabindex][qubit-1]=1
-                else:
-                    self._Hmatrix[stabindex][self._ndataqubits+qubit-1]=1
-            stabindex+=1
+        n=self._ndataqubits
+        support=self._stabsupport
+        # Z stabilizers fill the first n columns, X stabilizers the last n
+        offset=np.repeat(np.where(self._stabtypes=='X',n,0),np.diff(support.indptr))
+        self._Hsparse=sparse.csr_matrix((support.data,support.indices+offset,support.indptr),
+                                        shape=(self._nstab,2*n),dtype=np.uint8)
+        self._Hmatrix=self._Hsparse.toarray().astype(int)
     
     
         
     def get_check_matrix(self)->np.array:
         return self._Hmatrix
-    
 
-    def run_simulation(self,shots:int)->dict:
+
+    def get_sparse_check_matrix(self)->sparse.csr_matrix:
+        return self._Hsparse
+
+
+    '''
+    Logical operators in the column layout of the check matrix: row 0 is the
+    logical X (X on the first column of data qubits, Q1,Q(d+1),...) and row 1
+    the logical Z (Z on the first row, Q1..Qd). An error e (layout of
+    syndromes()) flips logical k if (e @ L[k]) is odd.
+    '''
+    def get_logical_operators(self)->np.ndarray:
+        n,d=self._ndataqubits,self._distance
+        logicals=np.zeros((2,2*n),dtype=np.uint8)
+        logicals[0,n+np.arange(d)*d]=1
+        logicals[1,np.arange(d)]=1
+        return logicals
+
+
+    '''
+    Check matrix with every row bit-packed into uint64 words: bit j%64 of
+    word j//64 is column j of H.
+    '''
+    def get_packed_check_matrix(self)->np.ndarray:
+        nwords=(2*self._ndataqubits+63)//64
+        bits=np.zeros((self._nstab,nwords*64),dtype=np.uint8)
+        bits[:,:2*self._ndataqubits]=self._Hmatrix
+        return np.packbits(bits,axis=1,bitorder='little').view(np.uint64)
+
+
+    '''
+    Syndromes of a batch of Pauli errors, with one sparse GF(2) product.
+    errors has shape (shots, 2n): column q (0-based) marks an X error on data
+    qubit q+1 and column n+q a Z error, so a Y error sets both. It can be a
+    dense 0/1 array or a scipy sparse matrix.
+    Returns a uint8 array of shape (shots, nstab), where entry s is 1 if the
+    error anticommutes with stabilizer s.
+    '''
+    def syndromes(self,errors)->np.ndarray:
+        if sparse.issparse(errors):
+            product=(errors@self._Hsparse.T).toarray()
+        else:
+            errors=np.asarray(errors,dtype=np.uint8)
+            product=(self._Hsparse@errors.T).T
+        return (product&1).astype(np.uint8)
+
+
+    '''
+    Syndromes of errors bit-packed over shots, as produced by the stabilizer
+    simulator: packed_errors has shape (2n, words) in the column layout of
+    syndromes(), and the result (nstab, words) is the XOR of the error rows in
+    each stabilizer's support.
+    '''
+    def syndromes_packed(self,packed_errors:np.ndarray)->np.ndarray:
+        return np.bitwise_xor.reduceat(packed_errors[self._Hsparse.indices],self._Hsparse.indptr[:-1],axis=0)
+
+
+    '''
+    Run the circuit and return the counts in qiskit's get_counts format.
+    method='tableau' uses the stabilizer simulator in tableausimulator.py, which
+    handles large distances and millions of shots; method='aer' keeps the
+    AerSimulator state-vector path, which is limited to d<=3.
+    '''
+    def run_simulation(self,shots:int,method:str='tableau',seed:int=None)->dict:
+        if method=='tableau':
+            simulator=PauliFrameSimulator(circuit_operations(self._circuit),self._circuit.num_qubits,
+                                          self._circuit.num_clbits,seed=seed)
+            return counts_from_bits(simulator.sample(shots))
         backend = AerSimulator()
-        job = backend.run(self._circuit, shots=shots)
+        job = backend.run(self._circuit, shots=shots, seed_simulator=seed)
         output = job.result().get_counts() 
         return output
     
@@ -295,22 +337,85 @@ def add_Z_syndrome_circuit(qreg: qasm2.QReg,creg:qasm2.CReg,ndataqubits:int,stab
 
 
 
+'''
+One round of syndrome measurement given as the parallel layers of
+SyndromeSchedule.native_layers(), driven by ilist data instead of one kernel
+per layer. The kernel is lowered once at import time; every distance only
+passes different lists, so the size of the kernel that calls it does not
+grow with d.
+kinds: 0 for a Hadamard layer on first[k] (one parallel.u), 1 for a CZ layer
+with controls first[k] and targets second[k] (one parallel.cz), 2 for the
+measurement of the qubits first[k] into the clbits second[k], each followed
+by a reset
+'''
+@qasm2.extended
+def add_native_layers(qreg: qasm2.QReg,creg:qasm2.CReg,kinds:ilist.IList[int,Any],
+                      first:ilist.IList[Any,Any],second:ilist.IList[Any,Any]):
+    def get_qubit(x:int):
+        return qreg[x]
+    for k in range(len(kinds)):
+        if kinds[k]==0:
+            qasm2.parallel.u(qargs=ilist.map(fn=get_qubit,collection=first[k]),theta=math.pi/2,phi=0.0,lam=math.pi)
+        elif kinds[k]==1:
+            qasm2.parallel.cz(ctrls=ilist.map(fn=get_qubit,collection=first[k]),
+                              qargs=ilist.map(fn=get_qubit,collection=second[k]))
+        else:
+            for i in range(len(first[k])):
+                qasm2.measure(qreg[first[k][i]],creg[second[k][i]])
+                qasm2.reset(qreg[first[k][i]])
+
+
+
+'''
+Generate the syndrome measurement kernel of a d*d surface code, for any d,
+from the parallel schedule of syndromeschedule.py: Hadamard layers as
+parallel.u and the four hook-avoiding CX steps as parallel.cz layers.
+Unlike surface_code_d2_circuit, the qubits are 0-based: data qubit Qk is
+qreg[k-1] and the ancilla of stabilizer s is qreg[d**2+s], measured into
+creg[s] and reset.
+The kernel is lowered without folding, so the layer loop of
+add_native_layers is not unrolled at compile time, and the compiled kernel
+is cached per distance.
+'''
+@lru_cache(maxsize=None)
+def surface_code_kernel(distance:int):
+    # syndromeschedule imports surface_code_stabilizers from this module
+    from syndromeschedule import SyndromeSchedule
+    schedule=SyndromeSchedule(distance)
+    codes={'h':0,'cz':1,'measure':2}
+    layers=schedule.native_layers()
+    kinds=ilist.IList([codes[layer[0]] for layer in layers])
+    first=ilist.IList([ilist.IList(list(layer[1])) for layer in layers])
+    second=ilist.IList([ilist.IList(list(layer[2]) if len(layer)>2 else []) for layer in layers])
+    nqubits,nstab=schedule.n_qubits,schedule.n_stab
+
+    @qasm2.extended(fold=False)
+    def surface_code_circuit():
+        qreg=qasm2.qreg(nqubits)
+        creg=qasm2.creg(nstab)
+        add_native_layers(qreg,creg,kinds,first,second)
+        return creg
+
+    return surface_code_circuit
+
+
+
 @qasm2.extended
 def surface_code_d2_circuit():
     qreg = qasm2.qreg(2*3**2-1)
     creg = qasm2.creg(3**2-1)
     add_X_syndrome_circuit(qreg,creg,9,0,(1,2,4,5))
-    add_X_syndrome_circuit(qreg,creg,9,1,(4,5,7,8))
+    add_X_syndrome_circuit(qreg,creg,9,1,(5,6,8,9))
     
     add_X_syndrome_circuit(qreg,creg,9,2,(2,3))    
-    add_X_syndrome_circuit(qreg,creg,9,3,(8,9))    
+    add_X_syndrome_circuit(qreg,creg,9,3,(7,8))    
     
     add_Z_syndrome_circuit(qreg,creg,9,4,(2,3,5,6))
-    add_Z_syndrome_circuit(qreg,creg,9,5,(5,6,8,9))
+    add_Z_syndrome_circuit(qreg,creg,9,5,(4,5,7,8))
     
     
     add_Z_syndrome_circuit(qreg,creg,9,6,(1,4))    
-    add_Z_syndrome_circuit(qreg,creg,9,7,(3,6))          
+    add_Z_syndrome_circuit(qreg,creg,9,7,(6,9))          
 
 
     
@@ -332,4 +437,7 @@ if __name__ == '__main__':
     
     target = QASM2()
     ast = target.emit(surface_code_d2_circuit)
+    pprint(ast)
+
+    ast = QASM2(allow_parallel=True).emit(surface_code_kernel(5))
     pprint(ast)
\ No newline at end of file
@@ -0,0 +1,352 @@
+'''
+Parallel schedule of the syndrome extraction circuit of the surface code.
+
+compile_syndrome_circuit measures the stabilizers one after the other, so
+the CX depth grows with the number of stabilizers. Here all stabilizers are
+measured at once, in four CX steps. Every stabilizer is seen as a plaquette
+with corners
+
+    TL  TR
+    BL  BR
+
+(the weight-two boundary stabilizers are plaquettes with two corners outside
+the lattice), and visits them in the hook-avoiding order of Tomita and Svore:
+
+    X stabilizers:  TL, TR, BL, BR   ("Z" shape)
+    Z stabilizers:  TL, BL, TR, BR   ("N" shape)
+
+In every step each data qubit is touched by at most one stabilizer. An
+ancilla fault after the second CX spreads to the last two data qubits of its
+stabilizer (a hook error); these pairs are horizontal for X stabilizers and
+vertical for Z stabilizers, perpendicular to the logical operators of the same
+type (logical X is column 0, logical Z row 0), so hooks never reduce the
+distance.
+
+Each CX step maps to one parallel CZ layer: CX(c, t) = H(t) CZ(c, t) H(t),
+and the Hadamards of consecutive steps on the same qubit cancel.
+
+When fewer ancillas are available than stabilizers, SyndromeSchedule measures
+the stabilizers in batches on a reused, reset pool of ancillas, and
+pareto_frontier lists the (qubits, depth) trade-offs of all pool sizes.
+
+Qubits are 0-based: data qubit r*d+c, and ancillas from d**2 on (ancilla
+d**2+s for stabilizer s of surface_code_stabilizers when there is no pool).
+'''
+
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from bloqade import qasm2
+from bloqade.qasm2.passes import QASM2Fold
+from kirin.dialects import ilist
+
+from surfacecode import surface_code_stabilizers
+
+
+# Corner (row, column) offsets in the order each stabilizer type visits them
+HOOK_ORDERS = {
+    'X': ((0, 0), (0, 1), (1, 0), (1, 1)),
+    'Z': ((0, 0), (1, 0), (0, 1), (1, 1)),
+}
+
+
+def _corners(distance: int, qubits: np.ndarray) -> Dict[Tuple[int, int], int]:
+    '''Map the corner offsets of a (possibly truncated) plaquette to its data qubits.'''
+    rows, cols = np.divmod(qubits, distance)
+    if len(qubits) == 4:
+        top, left = rows.min(), cols.min()
+    elif rows[0] == rows[1]:
+        # Horizontal boundary pair: the plaquette sticks out above row 0 or below row d-1
+        top, left = (-1 if rows[0] == 0 else rows[0]), cols.min()
+    else:
+        # Vertical boundary pair: the plaquette sticks out left of column 0 or right of column d-1
+        top, left = rows.min(), (-1 if cols[0] == 0 else cols[0])
+    return {(int(r - top), int(c - left)): int(q) for r, c, q in zip(rows, cols, qubits)}
+
+
+def _asap_depth(gates: List[Tuple[int, ...]]) -> int:
+    '''Depth of a gate sequence when every gate starts as soon as its qubits are free.'''
+    finished = {}
+    depth = 0
+    for qubits in gates:
+        layer = max((finished.get(q, 0) for q in qubits), default=0) + 1
+        for q in qubits:
+            finished[q] = layer
+        depth = max(depth, layer)
+    return depth
+
+
+class SyndromeSchedule:
+    '''
+    Four-step parallel CX schedule of one round of syndrome extraction.
+
+    With a pool of fewer ancillas than stabilizers, the stabilizers are
+    measured in batches of at most n_ancillas, one after the other, and the
+    ancillas are reset after every measurement and reused by the next batch.
+    Each batch keeps the four-step schedule restricted to its stabilizers, so
+    the round takes fewer qubits but more layers.
+    '''
+
+    def __init__(self, distance: int, n_ancillas: Optional[int] = None):
+        '''
+        Build the schedule.
+
+        Args:
+            distance: Code distance d
+            n_ancillas: Size of the ancilla pool (one ancilla per stabilizer
+                if None)
+        '''
+        self.distance = distance
+        self.types, self.support = surface_code_stabilizers(distance)
+        self.n_data = distance ** 2
+        self.n_stab = len(self.types)
+        self.n_ancillas = self.n_stab if n_ancillas is None else min(n_ancillas, self.n_stab)
+        if self.n_ancillas < 1:
+            raise ValueError("At least one ancilla is needed")
+        self.n_qubits = self.n_data + self.n_ancillas
+
+        indptr, indices = self.support.indptr, self.support.indices
+        corners = [_corners(distance, indices[indptr[s]:indptr[s + 1]]) for s in range(self.n_stab)]
+        used_steps = [tuple(k for k, corner in enumerate(HOOK_ORDERS[stype]) if corner in corners[s])
+                      for s, stype in enumerate(self.types)]
+
+        # Stabilizers using the same steps are batched together, so that the
+        # boundary stabilizers (two steps each) give shorter batches; without
+        # a pool stabilizer s keeps ancilla d**2+s
+        order = list(range(self.n_stab))
+        if self.n_ancillas < self.n_stab:
+            order.sort(key=lambda s: (-len(used_steps[s]), used_steps[s], s))
+        self.batches: List[List[int]] = [order[i:i + self.n_ancillas]
+                                         for i in range(0, self.n_stab, self.n_ancillas)]
+        self.ancilla = np.zeros(self.n_stab, dtype=int)
+        for batch in self.batches:
+            for k, s in enumerate(batch):
+                self.ancilla[s] = self.n_data + k
+
+        # steps[b][k]: CX gates (control, target) of step k of batch b
+        self.steps: List[List[List[Tuple[int, int]]]] = []
+        for batch in self.batches:
+            steps = [[] for _ in range(4)]
+            for s in batch:
+                ancilla = int(self.ancilla[s])
+                for step, corner in enumerate(HOOK_ORDERS[self.types[s]]):
+                    if corner in corners[s]:
+                        q = corners[s][corner]
+                        steps[step].append((ancilla, q) if self.types[s] == 'X' else (q, ancilla))
+            for step in steps:
+                used = [q for pair in step for q in pair]
+                if len(used) != len(set(used)):
+                    raise RuntimeError("Two CX gates of the same step share a qubit")
+            self.steps.append([step for step in steps if step])
+
+    def x_ancillas(self, batch: int = 0) -> List[int]:
+        return [int(self.ancilla[s]) for s in self.batches[batch] if self.types[s] == 'X']
+
+    def operations(self, reset: bool = True) -> List[tuple]:
+        '''
+        One round as tableau operations (see tableausimulator.py). For every
+        batch: Hadamards on the X ancillas, the CX steps, Hadamards, and the
+        measurement of the ancilla of stabilizer s into clbit s, followed by a
+        reset. The reset can only be left out when every stabilizer has its
+        own ancilla.
+        '''
+        if not reset and len(self.batches) > 1:
+            raise ValueError("Reused ancillas must be reset")
+        ops = []
+        for b, batch in enumerate(self.batches):
+            ops.extend(('h', q) for q in self.x_ancillas(b))
+            for step in self.steps[b]:
+                ops.extend(('cx', c, t) for c, t in step)
+            ops.extend(('h', q) for q in self.x_ancillas(b))
+            for s in batch:
+                ops.append(('measure', int(self.ancilla[s]), s))
+                if reset:
+                    ops.append(('reset', int(self.ancilla[s])))
+        return ops
+
+    def native_layers(self) -> List[tuple]:
+        '''
+        One round as parallel layers of the neutral-atom gate set.
+
+        Returns:
+            List of ('h', qubits), ('cz', ctrls, targets) and
+            ('measure', qubits, clbits) layers; the measured qubits are reset
+        '''
+        layers = []
+        for b, batch in enumerate(self.batches):
+            pending = set(self.x_ancillas(b))
+            for step in self.steps[b]:
+                ctrls = tuple(c for c, _ in step)
+                targets = tuple(t for _, t in step)
+                pending ^= set(targets)
+                # Only the Hadamards of the qubits used by this layer are applied,
+                # the others are kept and may cancel in a later step
+                due = pending & (set(ctrls) | set(targets))
+                if due:
+                    layers.append(('h', tuple(sorted(due))))
+                    pending -= due
+                layers.append(('cz', ctrls, targets))
+                pending ^= set(targets)
+
+            pending ^= set(self.x_ancillas(b))
+            if pending:
+                layers.append(('h', tuple(sorted(pending))))
+            layers.append(('measure', tuple(int(self.ancilla[s]) for s in batch), tuple(batch)))
+        return layers
+
+    def depth(self) -> Dict[str, int]:
+        '''
+        Size and depth of one round, compared with compile_syndrome_circuit.
+
+        Returns:
+            dict with qubits, batches, cx_depth (4 per batch when the bulk is
+            present), depth (CX layers plus one measurement and reset layer
+            per batch), native_layers (H, CZ and measurement layers) and
+            sequential_cx_depth, the CX depth of measuring the stabilizers one
+            after the other
+        '''
+        sequential = []
+        indptr, indices = self.support.indptr, self.support.indices
+        for s in range(self.n_stab):
+            sequential.extend((self.n_data + s, int(q)) for q in indices[indptr[s]:indptr[s + 1]])
+        cx_depth = sum(len(steps) for steps in self.steps)
+        return {
+            'qubits': self.n_qubits,
+            'batches': len(self.batches),
+            'cx_depth': cx_depth,
+            'depth': cx_depth + len(self.batches),
+            'native_layers': len(self.native_layers()),
+            'sequential_cx_depth': _asap_depth(sequential),
+        }
+
+    def kernel(self, rounds: int = 1) -> Callable:
+        '''
+        Bloqade kernel of several rounds, built from parallel.u and
+        parallel.cz layers. The ancilla of stabilizer s is measured into
+        creg[r*(d**2-1)+s] in round r and reset.
+
+        Returns:
+            Compiled kernel, ready for QASM2(allow_parallel=True).emit
+        '''
+        kernels = []
+        for layer in self.native_layers():
+            if layer[0] == 'h':
+                kernels.append(_make_parallel_u(layer[1], math.pi / 2, 0.0, math.pi))
+            elif layer[0] == 'cz':
+                kernels.append(_make_parallel_cz(layer[1], layer[2]))
+            else:
+                kernels.append(_make_measure_reset(layer[1], layer[2]))
+        step = _sequence_kernels(kernels)
+        n_qubits, n_stab = self.n_qubits, self.n_stab
+
+        @qasm2.extended(fold=False)
+        def syndrome_rounds():
+            qreg = qasm2.qreg(n_qubits)
+            creg = qasm2.creg(rounds * n_stab)
+            for r in range(rounds):
+                step(qreg, creg, r * n_stab)
+            return creg
+
+        compiled = syndrome_rounds.similar()
+        qasm2.extended.run_pass(compiled, fold=True, typeinfer=True)
+        QASM2Fold(qasm2.extended).fixpoint(compiled)
+        return compiled
+
+
+def schedule_depths(distances) -> List[dict]:
+    '''Depth of one round of syndrome extraction for every distance.'''
+    return [dict(distance=d, **SyndromeSchedule(d).depth()) for d in distances]
+
+
+def pareto_frontier(distance: int) -> List[dict]:
+    '''
+    Trade-off between qubit count and depth of one round of syndrome
+    extraction, over all ancilla pool sizes.
+
+    Returns:
+        The depth() of every pool size that no other pool size beats in both
+        qubits and depth, with its n_ancillas, by increasing qubit count
+    '''
+    points = []
+    for n_ancillas in range(1, distance ** 2):
+        point = dict(n_ancillas=n_ancillas, **SyndromeSchedule(distance, n_ancillas).depth())
+        # A larger pool is only worth it if it is strictly shallower
+        if not points or point['depth'] < points[-1]['depth']:
+            points.append(point)
+    return points
+
+
+# The layer kernels all take (qreg, creg, offset), offset being the first
+# clbit of the current round, so that they can be chained by _sequence_kernels
+
+def _make_parallel_u(qubits: Tuple[int, ...], theta: float, phi: float, lam: float):
+    targets = ilist.IList(list(qubits))
+
+    @qasm2.extended(fold=False)
+    def parallel_u(qreg: qasm2.QReg, creg: qasm2.CReg, offset: int):
+        def get_qubit(x: int):
+            return qreg[x]
+        qasm2.parallel.u(qargs=ilist.map(fn=get_qubit, collection=targets),
+                         theta=theta, phi=phi, lam=lam)
+
+    return parallel_u
+
+
+def _make_parallel_cz(ctrl_qubits: Tuple[int, ...], target_qubits: Tuple[int, ...]):
+    ctrl_list = ilist.IList(list(ctrl_qubits))
+    target_list = ilist.IList(list(target_qubits))
+
+    @qasm2.extended(fold=False)
+    def parallel_cz(qreg: qasm2.QReg, creg: qasm2.CReg, offset: int):
+        def get_qubit(x: int):
+            return qreg[x]
+        qasm2.parallel.cz(ctrls=ilist.map(fn=get_qubit, collection=ctrl_list),
+                          qargs=ilist.map(fn=get_qubit, collection=target_list))
+
+    return parallel_cz
+
+
+def _make_measure_reset(qubits: Tuple[int, ...], clbits: Tuple[int, ...]):
+    qubit_list = ilist.IList(list(qubits))
+    clbit_list = ilist.IList(list(clbits))
+
+    @qasm2.extended(fold=False)
+    def measure_reset(qreg: qasm2.QReg, creg: qasm2.CReg, offset: int):
+        for i in range(len(qubit_list)):
+            qasm2.measure(qreg[qubit_list[i]], creg[offset + clbit_list[i]])
+            qasm2.reset(qreg[qubit_list[i]])
+
+    return measure_reset
+
+
+def _make_sequence(first: Callable, second: Callable):
+    @qasm2.extended(fold=False)
+    def sequence(qreg: qasm2.QReg, creg: qasm2.CReg, offset: int):
+        first(qreg, creg, offset)
+        second(qreg, creg, offset)
+
+    return sequence
+
+
+def _sequence_kernels(kernels: List[Callable]):
+    '''Compose (qreg, creg, offset) kernels in order as a balanced tree of calls.'''
+    if len(kernels) == 1:
+        return kernels[0]
+    middle = len(kernels) // 2
+    return _make_sequence(_sequence_kernels(kernels[:middle]), _sequence_kernels(kernels[middle:]))
+
+
+if __name__ == '__main__':
+    for row in schedule_depths([3, 5, 7, 9, 11]):
+        print(f"d={row['distance']}: {row['cx_depth']} parallel CZ layers, {row['native_layers']} native layers "
+              f"(sequential CX depth {row['sequential_cx_depth']})")
+
+    from bloqade.qasm2.emit import QASM2
+    from bloqade.qasm2.parse import pprint
+    pprint(QASM2(allow_parallel=True).emit(SyndromeSchedule(3).kernel()))
+
+    for row in pareto_frontier(5):
+        print(f"d=5 with {row['n_ancillas']} ancillas: {row['qubits']} qubits, depth {row['depth']} "
+              f"({row['batches']} batches)")
+    pprint(QASM2(allow_parallel=True).emit(SyndromeSchedule(3, n_ancillas=3).kernel()))
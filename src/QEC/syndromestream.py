@@ -0,0 +1,261 @@
+'''
+Streaming syndrome decoding.
+
+surfaceCode.run_simulation returns get_counts() dictionaries, which merge the
+shots into bitstring keys, and the decoders then work after the fact. On
+hardware the syndromes arrive one QEC cycle after the other and the decoder
+has to keep up. This module streams per-shot syndrome arrays in chunks and
+decodes them in a worker pool:
+
+    circuit_chunks(circuit, ...)   measurement records of a qiskit circuit
+    error_chunks(distance, ...)    syndromes of sampled data qubit errors
+    memory_chunks(distance, ...)   detection events of a memory experiment
+    SyndromePipeline               decodes a stream of chunks in a pool of
+                                   worker processes and measures throughput
+                                   (syndromes/s) and latency percentiles
+
+Each chunk is a (shots, n_bits) uint8 array. With a cycle time the pipeline
+replays the stream in real time: chunk i is only submitted once its last
+shot would have been measured, at (i + 1) * chunk_shots * cycle_time, and its
+latency runs from then until its corrections are back. At most max_pending
+chunks are in flight; when the workers fall behind the producer waits on the
+oldest chunk and the growing latencies show the backlog.
+
+Decoders are built once per worker process from (build_decoder, args), as in
+benchmark.py, e.g. (memory_decoder, (5, 5, p, p, p, 'Z', 'parallel', 'uf')).
+'''
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from benchmark import sample_errors
+from decoder import DECODERS, MatchingGraph
+from memoryexperiment import memory_circuit
+from surfacecode import surfaceCode
+from tableausimulator import PauliFrameSimulator, circuit_operations
+
+
+def circuit_chunks(circuit, shots: int, chunk_shots: int = 1024,
+                   seed: Optional[int] = None) -> Iterator[np.ndarray]:
+    '''
+    Measurement records of a qiskit circuit, e.g. surfaceCode.get_circuit(),
+    one row per shot (clbit 0 first) instead of get_counts() keys.
+    '''
+    simulator = PauliFrameSimulator(circuit_operations(circuit), circuit.num_qubits, circuit.num_clbits, seed=seed)
+    for start in range(0, shots, chunk_shots):
+        yield simulator.sample(min(chunk_shots, shots - start))
+
+
+def error_chunks(distance: int, p: float, shots: int, chunk_shots: int = 1024, error_type: str = 'X',
+                 error_model: str = 'depolarizing', seed: Optional[int] = None) -> Iterator[np.ndarray]:
+    '''
+    Syndromes of the X (or Z) checks of surfaceCode(distance) for independent
+    data qubit errors, see benchmark.sample_errors; the input of
+    surface_code_decoder(distance, error_type).
+    '''
+    code = surfaceCode(distance)
+    _, rows = MatchingGraph.from_surface_code(code, error_type)
+    rng = np.random.default_rng(seed)
+    for start in range(0, shots, chunk_shots):
+        errors = sample_errors(distance ** 2, p, min(chunk_shots, shots - start), rng, error_model)
+        yield code.syndromes(errors)[:, rows]
+
+
+def memory_chunks(distance: int, rounds: int, p: float, shots: int, chunk_shots: int = 1024,
+                  basis: str = 'Z', schedule: str = 'parallel', seed: Optional[int] = None) -> Iterator[np.ndarray]:
+    '''
+    Detection events of the memory experiment of memoryexperiment.py with all
+    error rates p; the input of memory_decoder(distance, rounds, p, p, p, ...).
+    '''
+    circuit = memory_circuit(distance, rounds, p, p, p, basis, schedule)
+    simulator = PauliFrameSimulator(circuit.operations, circuit.n_qubits, circuit.n_clbits, seed=seed)
+    for start in range(0, shots, chunk_shots):
+        yield circuit.detection_events(simulator.sample(min(chunk_shots, shots - start)))
+
+
+def surface_code_decoder(distance: int, error_type: str = 'X', decoder: str = 'mwpm'):
+    '''Matching decoder of surfaceCode(distance) for X or Z errors.'''
+    graph, _ = MatchingGraph.from_surface_code(surfaceCode(distance), error_type)
+    return DECODERS[decoder](graph)
+
+
+# Decoders per (build_decoder, args), built lazily in every worker
+_WORKER_DECODERS: Dict[tuple, object] = {}
+
+
+def _worker_decoder(build_decoder: Callable, args: tuple):
+    key = (build_decoder, args)
+    if key not in _WORKER_DECODERS:
+        _WORKER_DECODERS[key] = build_decoder(*args)
+    return _WORKER_DECODERS[key]
+
+
+def _decode_chunk(build_decoder: Callable, args: tuple, syndromes: np.ndarray) -> Tuple[np.ndarray, float]:
+    decoder = _worker_decoder(build_decoder, args)
+    start = time.perf_counter()
+    corrections = decoder.decode_batch(syndromes)
+    return corrections, time.perf_counter() - start
+
+
+class SyndromePipeline:
+    '''
+    Decode a stream of syndrome chunks in a pool of workers.
+
+    The pool is started (and every worker builds its decoder) before the
+    first chunk, and is kept for later runs until close(); use the pipeline
+    as a context manager.
+    '''
+
+    def __init__(self, build_decoder: Callable, args: tuple = (), workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, executor: str = 'process'):
+        '''
+        Set up the pipeline; the pool is started by start() or run().
+
+        Args:
+            build_decoder: Module-level function returning an object with
+                decode_batch(syndromes), e.g. memory_decoder
+            args: Its (hashable, picklable) arguments
+            workers: Pool size (os.cpu_count() if None)
+            max_pending: Chunks in flight before the producer waits (twice
+                the pool size if None)
+            executor: 'process' or 'thread'; the matching decoders hold the
+                GIL, so only processes decode in parallel
+        '''
+        if executor not in ('process', 'thread'):
+            raise ValueError("executor must be 'process' or 'thread'")
+        self.build_decoder = build_decoder
+        self.args = args
+        self.max_pending = max_pending
+        self.executor = executor
+        self.records: List[dict] = []
+        self.seconds = 0.0
+        self.pool_size = workers or os.cpu_count()
+        self.cycle_time: Optional[float] = None
+        self._pool = None
+
+    def start(self) -> 'SyndromePipeline':
+        '''Start the pool and wait until every worker has built its decoder.'''
+        if self._pool is None:
+            pool_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+            self._pool = pool_class(max_workers=self.pool_size, initializer=_worker_decoder,
+                                    initargs=(self.build_decoder, self.args))
+            for future in [self._pool.submit(_worker_decoder, self.build_decoder, self.args)
+                           for _ in range(self.pool_size)]:
+                future.result()
+        return self
+
+    def close(self):
+        '''Shut the pool down.'''
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> 'SyndromePipeline':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, chunks: Iterable[np.ndarray], cycle_time: Optional[float] = None) -> Iterator[np.ndarray]:
+        '''
+        Decode the chunks, yielding their corrections in stream order.
+
+        Args:
+            chunks: Syndrome arrays (shots, n_bits)
+            cycle_time: Seconds per shot (QEC cycle, or the rounds of a memory
+                shot); chunks are released at this rate. As fast as the
+                source produces them if None
+
+        Yields:
+            Corrections of every chunk, as returned by decode_batch
+        '''
+        self.start()
+        self.records, self.cycle_time = [], cycle_time
+        pending: deque = deque()
+        start = time.perf_counter()
+        released = 0
+
+        def finished(future: Future, record: dict):
+            record['done'] = time.perf_counter()
+
+        max_pending = self.max_pending or 2 * self.pool_size
+        for syndromes in chunks:
+            released += len(syndromes)
+            if cycle_time is not None:
+                # The last shot of this chunk is measured at `ready`
+                delay = start + released * cycle_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            record = {'shots': len(syndromes), 'ready': time.perf_counter()}
+            future = self._pool.submit(_decode_chunk, self.build_decoder, self.args, syndromes)
+            future.add_done_callback(lambda f, record=record: finished(f, record))
+            pending.append((future, record))
+            while len(pending) >= max_pending or (pending and pending[0][0].done()):
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+        self.seconds = time.perf_counter() - start
+
+    def _collect(self, future: Future, record: dict) -> np.ndarray:
+        corrections, record['decode_seconds'] = future.result()
+        record.setdefault('done', time.perf_counter())
+        record['latency'] = record['done'] - record['ready']
+        self.records.append(record)
+        return corrections
+
+    def statistics(self) -> dict:
+        '''
+        Statistics of the last run.
+
+        Returns:
+            dict with chunks, syndromes, seconds, throughput (syndromes/s over
+            the whole run, at most the source rate when paced),
+            decode_us_per_shot (worker time), capacity (syndromes/s the pool
+            sustains: pool size / worker time per shot), latency_ms
+            percentiles p50, p90, p99 and max of the chunks, and with a cycle
+            time required_rate (1 / cycle_time) and keeps_up (capacity at
+            least the required rate)
+        '''
+        shots = sum(record['shots'] for record in self.records)
+        decode_seconds = sum(record['decode_seconds'] for record in self.records)
+        latencies = 1e3 * np.array([record['latency'] for record in self.records])
+        stats = {
+            'chunks': len(self.records),
+            'syndromes': shots,
+            'seconds': self.seconds,
+            'throughput': shots / self.seconds if self.seconds else 0.0,
+            'decode_us_per_shot': 1e6 * decode_seconds / max(shots, 1),
+            'capacity': self.pool_size * shots / decode_seconds if decode_seconds else float('inf'),
+            'latency_ms': {name: float(np.percentile(latencies, q)) if len(latencies) else 0.0
+                           for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        }
+        if self.cycle_time is not None:
+            stats['required_rate'] = 1 / self.cycle_time
+            stats['keeps_up'] = stats['capacity'] >= stats['required_rate']
+        return stats
+
+
+if __name__ == '__main__':
+    from memoryexperiment import memory_decoder
+
+    distance, rounds, p, shots = 5, 5, 0.002, 20000
+    chunks = list(memory_chunks(distance, rounds, p, shots, chunk_shots=500, seed=0))
+    with SyndromePipeline(memory_decoder, (distance, rounds, p, p, p, 'Z', 'parallel', 'uf'), workers=4) as pipeline:
+        corrections = np.vstack(list(pipeline.run(chunks)))
+        stats = pipeline.statistics()
+        print(f"d={distance}, {rounds} rounds, {len(corrections)} shots: {stats['throughput']:.0f} syndromes/s, "
+              f"{stats['decode_us_per_shot']:.1f} us/shot in the workers, latency p50 "
+              f"{stats['latency_ms']['p50']:.1f} ms, p99 {stats['latency_ms']['p99']:.1f} ms")
+
+        # Real time: a memory shot takes `rounds` QEC cycles
+        for cycle_time in (100e-6, 5e-6):
+            list(pipeline.run(chunks[:10], cycle_time=cycle_time * rounds))
+            stats = pipeline.statistics()
+            print(f"cycle {1e6 * cycle_time:.0f} us: keeps up {stats['keeps_up']}, capacity "
+                  f"{stats['capacity']:.0f} of {stats['required_rate']:.0f} syndromes/s, "
+                  f"latency p50 {stats['latency_ms']['p50']:.1f} ms, p99 {stats['latency_ms']['p99']:.1f} ms")
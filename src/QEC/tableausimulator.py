@@ -0,0 +1,397 @@
+'''
+Stabilizer simulation of Clifford circuits, for the surface code syndrome circuits.
+
+surfaceCode.run_simulation hands the whole 2d^2-1 qubit circuit to AerSimulator
+as a state-vector job, which stops working beyond d=3. The syndrome circuits
+only contain Clifford gates (H, CX, X/Y/Z) and measurements, so they can be
+simulated in polynomial time:
+
+    Tableau              CHP / Aaronson-Gottesman tableau. Rows (the n
+                         destabilizers and n stabilizers) are bit-packed over
+                         qubits into uint64 words, so row products are word
+                         XORs plus a popcount for the phase.
+    PauliFrameSimulator  Many shots at once. A single reference run on the
+                         tableau fixes one valid outcome of every measurement;
+                         each shot is then tracked as a Pauli frame relative
+                         to that reference, bit-packed over shots, so a gate
+                         costs a few XORs of shots/64 words.
+
+Random measurement outcomes are reproduced by giving every freshly prepared
+or measured qubit a random Z in its frame (a Z eigenstate is unchanged by Z,
+but the Z turns into an X, i.e. a flipped outcome, if the qubit is later
+rotated into the X basis). Pauli noise channels are supported as frame
+updates as well.
+
+Operations are tuples:
+    ('h', q) / ('s', q) / ('sdg', q) / ('x', q) / ('y', q) / ('z', q)
+    ('cx', control, target) / ('cz', a, b) / ('swap', a, b)
+    ('measure', q, clbit) / ('reset', q)
+    ('pauli', q, px, py, pz)   Pauli channel (ignored by the reference run)
+'''
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from shotresults import ShotResults
+
+
+SINGLE_QUBIT_CLIFFORDS = ('h', 's', 'sdg', 'x', 'y', 'z')
+TWO_QUBIT_CLIFFORDS = ('cx', 'cz', 'swap')
+
+
+def circuit_operations(circuit) -> List[tuple]:
+    '''
+    Convert a qiskit QuantumCircuit into tableau operations.
+
+    Barriers and identities are dropped; any non-Clifford instruction raises
+    a ValueError.
+    '''
+    operations = []
+    for instruction in circuit.data:
+        name = instruction.operation.name
+        qubits = [circuit.find_bit(q).index for q in instruction.qubits]
+        if name in ('barrier', 'id', 'delay'):
+            continue
+        if name in SINGLE_QUBIT_CLIFFORDS or name == 'reset':
+            operations.append((name, qubits[0]))
+        elif name in TWO_QUBIT_CLIFFORDS:
+            operations.append((name, qubits[0], qubits[1]))
+        elif name == 'measure':
+            operations.append(('measure', qubits[0], circuit.find_bit(instruction.clbits[0]).index))
+        else:
+            raise ValueError(f"Instruction '{name}' is not supported by the stabilizer simulator")
+    return operations
+
+
+def _words(n_bits: int) -> int:
+    return (n_bits + 63) // 64
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    '''Number of set bits along the last axis.'''
+    return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+
+
+def _product_phase(x1, z1, x2, z2) -> np.ndarray:
+    '''
+    Exponent of i (mod 4) picked up when multiplying Pauli rows P1 * P2,
+    the sum over qubits of the Aaronson-Gottesman g(x1, z1, x2, z2).
+    '''
+    y1, only_x1, only_z1 = x1 & z1, x1 & ~z1, z1 & ~x1
+    plus = (y1 & z2 & ~x2) | (only_x1 & x2 & z2) | (only_z1 & x2 & ~z2)
+    minus = (y1 & x2 & ~z2) | (only_x1 & z2 & ~x2) | (only_z1 & x2 & z2)
+    return _popcount(plus) - _popcount(minus)
+
+
+class Tableau:
+    '''
+    CHP stabilizer tableau of n qubits, initialized to |0...0>.
+
+    Rows 0..n-1 are the destabilizers and rows n..2n-1 the stabilizers; x and z
+    have shape (2n, words) with qubit q at bit q % 64 of word q // 64, and r
+    holds the sign bit of every row.
+    '''
+
+    def __init__(self, n_qubits: int, seed: Optional[int] = None):
+        self.n_qubits = n_qubits
+        self.rng = np.random.default_rng(seed)
+        words = _words(n_qubits)
+        self.x = np.zeros((2 * n_qubits, words), dtype=np.uint64)
+        self.z = np.zeros((2 * n_qubits, words), dtype=np.uint64)
+        self.r = np.zeros(2 * n_qubits, dtype=np.uint8)
+        for q in range(n_qubits):
+            word, bit = divmod(q, 64)
+            self.x[q, word] = np.uint64(1) << np.uint64(bit)
+            self.z[n_qubits + q, word] = np.uint64(1) << np.uint64(bit)
+
+    @staticmethod
+    def _column(q: int) -> Tuple[int, np.uint64]:
+        word, bit = divmod(q, 64)
+        return word, np.uint64(1) << np.uint64(bit)
+
+    def _bits(self, table: np.ndarray, q: int) -> np.ndarray:
+        word, mask = self._column(q)
+        return (table[:, word] & mask) != 0
+
+    def _set_bits(self, table: np.ndarray, q: int, values: np.ndarray):
+        word, mask = self._column(q)
+        table[:, word] = np.where(values, table[:, word] | mask, table[:, word] & ~mask)
+
+    # --- Gates ---
+
+    def h(self, q: int):
+        xq, zq = self._bits(self.x, q), self._bits(self.z, q)
+        self.r ^= (xq & zq).astype(np.uint8)
+        self._set_bits(self.x, q, zq)
+        self._set_bits(self.z, q, xq)
+
+    def s(self, q: int):
+        xq, zq = self._bits(self.x, q), self._bits(self.z, q)
+        self.r ^= (xq & zq).astype(np.uint8)
+        self._set_bits(self.z, q, zq ^ xq)
+
+    def sdg(self, q: int):
+        xq, zq = self._bits(self.x, q), self._bits(self.z, q)
+        self.r ^= (xq & ~zq).astype(np.uint8)
+        self._set_bits(self.z, q, zq ^ xq)
+
+    def x_gate(self, q: int):
+        self.r ^= self._bits(self.z, q).astype(np.uint8)
+
+    def y_gate(self, q: int):
+        self.r ^= (self._bits(self.x, q) ^ self._bits(self.z, q)).astype(np.uint8)
+
+    def z_gate(self, q: int):
+        self.r ^= self._bits(self.x, q).astype(np.uint8)
+
+    def cx(self, control: int, target: int):
+        xc, zc = self._bits(self.x, control), self._bits(self.z, control)
+        xt, zt = self._bits(self.x, target), self._bits(self.z, target)
+        self.r ^= (xc & zt & ~(xt ^ zc)).astype(np.uint8)
+        self._set_bits(self.x, target, xt ^ xc)
+        self._set_bits(self.z, control, zc ^ zt)
+
+    def cz(self, a: int, b: int):
+        self.h(b)
+        self.cx(a, b)
+        self.h(b)
+
+    def swap(self, a: int, b: int):
+        self.cx(a, b)
+        self.cx(b, a)
+        self.cx(a, b)
+
+    # --- Measurement ---
+
+    def _rowsum(self, targets: np.ndarray, source: int):
+        '''Replace every target row h by the product of rows h and `source` (AG rowsum, vectorized over h).'''
+        phase = (2 * self.r[targets].astype(np.int64) + 2 * int(self.r[source])
+                 + _product_phase(self.x[source], self.z[source], self.x[targets], self.z[targets]))
+        self.r[targets] = (phase % 4 == 2).astype(np.uint8)
+        self.x[targets] ^= self.x[source]
+        self.z[targets] ^= self.z[source]
+
+    def _product_sign(self, rows: np.ndarray) -> int:
+        '''Sign bit of the product of the given (mutually commuting) stabilizer rows, by pairwise reduction.'''
+        x, z = self.x[rows], self.z[rows]
+        phase = 2 * self.r[rows].astype(np.int64)
+        while len(phase) > 1:
+            if len(phase) % 2:
+                x = np.concatenate([x, np.zeros_like(x[:1])])
+                z = np.concatenate([z, np.zeros_like(z[:1])])
+                phase = np.concatenate([phase, [0]])
+            phase = phase[0::2] + phase[1::2] + _product_phase(x[0::2], z[0::2], x[1::2], z[1::2])
+            x, z = x[0::2] ^ x[1::2], z[0::2] ^ z[1::2]
+        return int(phase[0] % 4 == 2)
+
+    def measure(self, q: int, outcome: Optional[int] = None) -> int:
+        '''
+        Measure qubit q in the Z basis.
+
+        Args:
+            q: The qubit
+            outcome: Outcome to use if the result is random (a fresh random bit if None)
+
+        Returns:
+            The measured bit
+        '''
+        n = self.n_qubits
+        xq = self._bits(self.x, q)
+        anticommuting = np.flatnonzero(xq[n:]) + n
+
+        if len(anticommuting) == 0:
+            # Deterministic: Z_q is a product of the stabilizers whose destabilizers anticommute with it
+            return self._product_sign(np.flatnonzero(xq[:n]) + n)
+
+        p = anticommuting[0]
+        targets = np.flatnonzero(xq)
+        targets = targets[targets != p]
+        if len(targets):
+            self._rowsum(targets, p)
+
+        self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+        word, mask = self._column(q)
+        self.x[p] = 0
+        self.z[p] = 0
+        self.z[p, word] = mask
+        result = int(self.rng.integers(2)) if outcome is None else outcome
+        self.r[p] = result
+        return result
+
+    def reset(self, q: int, outcome: Optional[int] = None):
+        if self.measure(q, outcome):
+            self.x_gate(q)
+
+    def apply(self, operation: tuple, outcome: Optional[int] = None) -> Optional[int]:
+        '''Apply one operation; returns the bit of a measurement, None otherwise.'''
+        name = operation[0]
+        if name == 'measure':
+            return self.measure(operation[1], outcome)
+        if name == 'reset':
+            self.reset(operation[1], outcome)
+        elif name in ('x', 'y', 'z'):
+            getattr(self, name + '_gate')(operation[1])
+        elif name != 'pauli':
+            getattr(self, name)(*operation[1:])
+        return None
+
+
+def reference_sample(operations: List[tuple], n_qubits: int, n_clbits: int) -> np.ndarray:
+    '''
+    One noiseless run of the circuit on the tableau, with every random
+    measurement outcome chosen as 0.
+
+    Returns:
+        uint8 array of shape (n_clbits,)
+    '''
+    tableau = Tableau(n_qubits)
+    record = np.zeros(n_clbits, dtype=np.uint8)
+    for operation in operations:
+        bit = tableau.apply(operation, outcome=0)
+        if bit is not None:
+            record[operation[2]] = bit
+    return record
+
+
+def propagate_frame(operation: tuple, x: np.ndarray, z: np.ndarray) -> bool:
+    '''
+    Conjugate packed Pauli frames (x, z of shape (n_qubits, words)) by a
+    Clifford gate in place.
+
+    Returns:
+        True if the operation is a gate handled here; measurements, resets
+        and noise are left to the caller, and X / Y / Z gates do not change
+        frames (they only change the reference)
+    '''
+    name, q = operation[0], operation[1]
+    if name == 'h':
+        x[q], z[q] = z[q].copy(), x[q].copy()
+    elif name in ('s', 'sdg'):
+        z[q] ^= x[q]
+    elif name == 'cx':
+        t = operation[2]
+        x[t] ^= x[q]
+        z[q] ^= z[t]
+    elif name == 'cz':
+        b = operation[2]
+        z[q] ^= x[b]
+        z[b] ^= x[q]
+    elif name == 'swap':
+        b = operation[2]
+        x[[q, b]] = x[[b, q]]
+        z[[q, b]] = z[[b, q]]
+    elif name not in ('x', 'y', 'z'):
+        return False
+    return True
+
+
+class PauliFrameSimulator:
+    '''
+    Bit-packed Pauli frame simulation of many shots of a Clifford circuit.
+
+    The frame of shot k is the Pauli operator separating it from the
+    reference run; x[q] and z[q] hold its X and Z components on qubit q for
+    64 shots per uint64 word.
+    '''
+
+    def __init__(self, operations: List[tuple], n_qubits: int, n_clbits: int,
+                 seed: Optional[int] = None):
+        '''
+        Initialize the simulator and compute the reference sample.
+
+        Args:
+            operations: Tableau operations of the circuit
+            n_qubits: Number of qubits
+            n_clbits: Number of classical bits
+            seed: Seed of the frame random generator
+        '''
+        self.operations = operations
+        self.n_qubits = n_qubits
+        self.n_clbits = n_clbits
+        self.rng = np.random.default_rng(seed)
+        self.reference = reference_sample(operations, n_qubits, n_clbits)
+
+    def _random_words(self, shape) -> np.ndarray:
+        return self.rng.integers(0, np.iinfo(np.uint64).max, size=shape, dtype=np.uint64, endpoint=True)
+
+    def _sample_words(self, shots: int) -> np.ndarray:
+        '''Packed measurement record of `shots` shots, shape (n_clbits, words).'''
+        words = _words(shots)
+        x = np.zeros((self.n_qubits, words), dtype=np.uint64)
+        z = self._random_words((self.n_qubits, words))
+        record = np.zeros((self.n_clbits, words), dtype=np.uint64)
+
+        for operation in self.operations:
+            if propagate_frame(operation, x, z):
+                continue
+            name, q = operation[0], operation[1]
+            if name == 'measure':
+                record[operation[2]] = x[q]
+                z[q] = self._random_words(words)
+            elif name == 'reset':
+                x[q] = 0
+                z[q] = self._random_words(words)
+            elif name == 'pauli':
+                px, py, pz = operation[2:]
+                u = self.rng.random(words * 64)
+                u[shots:] = 1
+                flip_x = np.packbits(u < px + py, bitorder='little').view(np.uint64)
+                flip_z = np.packbits((u >= px) & (u < px + py + pz), bitorder='little').view(np.uint64)
+                x[q] ^= flip_x
+                z[q] ^= flip_z
+
+        # Flip the reference outcomes by the frames' X components
+        record ^= np.where(self.reference.astype(bool), ~np.uint64(0), np.uint64(0))[:, None]
+        return record
+
+    def sample_packed(self, shots: int, batch_size: int = 2**16) -> np.ndarray:
+        '''
+        Measurement records bit-packed over shots.
+
+        Args:
+            shots: Number of shots
+            batch_size: Shots simulated together (a multiple of 64 keeps
+                batches aligned to words)
+
+        Returns:
+            uint64 array of shape (n_clbits, ceil(shots / 64)); bit k % 64 of
+            word k // 64 is the outcome of shot k
+        '''
+        batch_size = max(64, batch_size - batch_size % 64)
+        chunks = [self._sample_words(min(batch_size, shots - start))
+                  for start in range(0, shots, batch_size)]
+        return np.concatenate(chunks, axis=1) if chunks else np.zeros((self.n_clbits, 0), dtype=np.uint64)
+
+    def sample(self, shots: int, batch_size: int = 2**16) -> np.ndarray:
+        '''Measurement records as a uint8 array of shape (shots, n_clbits).'''
+        packed = self.sample_packed(shots, batch_size)
+        bits = np.unpackbits(packed.view(np.uint8), axis=1, bitorder='little')[:, :shots]
+        return np.ascontiguousarray(bits.T)
+
+
+def counts_from_bits(bits: np.ndarray) -> Dict[str, int]:
+    '''
+    Count measurement records in qiskit's get_counts format (classical bit 0
+    is the rightmost character).
+    '''
+    return dict(ShotResults.from_bits(bits).counts(reverse=True))
+
+
+if __name__ == '__main__':
+    import time
+    from surfacecode import surfaceCode
+
+    for distance in (3, 9, 25):
+        code = surfaceCode(distance)
+        code.inject_error({distance + 2: 'X'})
+        code.compile_syndrome_circuit()
+        circuit = code.get_circuit()
+
+        start = time.perf_counter()
+        simulator = PauliFrameSimulator(circuit_operations(circuit), circuit.num_qubits, circuit.num_clbits, seed=0)
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        packed = simulator.sample_packed(2**20)
+        print(f"d={distance}: {circuit.num_qubits} qubits, reference {reference_time:.2f}s, "
+              f"2^20 shots in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,514 @@
+"""
+NumPy State-Vector Simulator for Emitted QASM2
+
+A lightweight simulator for the small circuits produced by our Trotter and
+QEC code. It consumes the QASM2 text emitted by Bloqade, including the
+`parallel.U` / `parallel.CZ` / `parallel.RZ` statements generated by
+UOpToParallel and `glob.U` global gates, as well as user `gate` definitions.
+
+Gates are applied to the state tensor through reshaped NumPy kernels,
+consecutive single-qubit gates on the same qubit are fused into one 2x2
+matrix before being applied, and all shots are sampled at once from the
+final probability vector.
+
+Only terminal measurements are supported; classically conditioned gates,
+resets and mid-circuit measurements raise a ValueError. Noise statements
+(`noise.PAULI1`) are parsed and kept on the circuit but ignored by the
+noiseless simulator.
+"""
+
+import ast
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+# --- Gate matrices (standard OpenQASM 2 conventions) ---
+
+def u3_matrix(theta: float, phi: float, lam: float) -> np.ndarray:
+    """Matrix of U(theta, phi, lambda)."""
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([[c, -np.exp(1j * lam) * s],
+                     [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]])
+
+
+def _rx(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]])
+
+
+def _ry(theta):
+    c, s = math.cos(theta / 2), math.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+
+def _rz(theta):
+    return np.diag([np.exp(-0.5j * theta), np.exp(0.5j * theta)])
+
+
+def _phase(lam):
+    return np.diag([1, np.exp(1j * lam)])
+
+
+_SQRT_HALF = 1 / math.sqrt(2)
+
+SINGLE_QUBIT_GATES = {
+    'U': u3_matrix, 'u': u3_matrix, 'u3': u3_matrix,
+    'u2': lambda phi, lam: u3_matrix(math.pi / 2, phi, lam),
+    'u1': _phase, 'p': _phase,
+    'rx': _rx, 'ry': _ry, 'rz': _rz,
+    'id': lambda: np.eye(2, dtype=complex),
+    'x': lambda: np.array([[0, 1], [1, 0]], dtype=complex),
+    'y': lambda: np.array([[0, -1j], [1j, 0]]),
+    'z': lambda: np.diag([1, -1]).astype(complex),
+    'h': lambda: np.array([[1, 1], [1, -1]], dtype=complex) * _SQRT_HALF,
+    's': lambda: _phase(math.pi / 2),
+    'sdg': lambda: _phase(-math.pi / 2),
+    't': lambda: _phase(math.pi / 4),
+    'tdg': lambda: _phase(-math.pi / 4),
+    'sx': lambda: np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]]) / 2,
+    'sxdg': lambda: np.array([[1 - 1j, 1 + 1j], [1 + 1j, 1 - 1j]]) / 2,
+}
+
+
+def _controlled(matrix: np.ndarray) -> np.ndarray:
+    """4x4 matrix of a controlled single-qubit gate (control is the first qubit)."""
+    full = np.eye(4, dtype=complex)
+    full[2:, 2:] = matrix
+    return full
+
+
+# Two-qubit gates other than cx/cz/swap, which have dedicated kernels
+TWO_QUBIT_GATES = {
+    'cy': lambda: _controlled(SINGLE_QUBIT_GATES['y']()),
+    'ch': lambda: _controlled(SINGLE_QUBIT_GATES['h']()),
+    'crx': lambda theta: _controlled(_rx(theta)),
+    'cry': lambda theta: _controlled(_ry(theta)),
+    'crz': lambda theta: _controlled(_rz(theta)),
+    'cu1': lambda lam: _controlled(_phase(lam)),
+    'cp': lambda lam: _controlled(_phase(lam)),
+    'cu3': lambda theta, phi, lam: _controlled(u3_matrix(theta, phi, lam)),
+    'rzz': lambda theta: np.diag(np.exp(-0.5j * theta * np.array([1, -1, -1, 1]))),
+}
+
+
+# --- Expression evaluation ---
+
+_FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+              'exp': math.exp, 'ln': math.log, 'sqrt': math.sqrt}
+_BINARY_OPS = {ast.Add: lambda a, b: a + b, ast.Sub: lambda a, b: a - b,
+               ast.Mult: lambda a, b: a * b, ast.Div: lambda a, b: a / b,
+               ast.Pow: lambda a, b: a ** b}
+
+
+def evaluate_expression(expression: str, variables: Optional[Dict[str, float]] = None) -> float:
+    """
+    Evaluate a QASM2 parameter expression such as `-pi/2` or `(theta * 0.5)`.
+
+    Args:
+        expression: The expression text
+        variables: Values of gate parameters referenced by name
+
+    Returns:
+        The value of the expression
+    """
+    variables = variables or {}
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            if node.id == 'pi':
+                return math.pi
+            if node.id in variables:
+                return variables[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return _BINARY_OPS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = visit(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _FUNCTIONS and len(node.args) == 1):
+            return _FUNCTIONS[node.func.id](visit(node.args[0]))
+        raise ValueError(f"Unsupported expression '{expression}'")
+
+    return visit(ast.parse(expression.replace('^', '**'), mode='eval'))
+
+
+# --- Parsing ---
+
+def _split_statements(text: str) -> List[str]:
+    """Split QASM text into statements, keeping brace blocks with their statement."""
+    statements, current, depth = [], [], 0
+    for char in text:
+        current.append(char)
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                statements.append(''.join(current).strip())
+                current = []
+        elif char == ';' and depth == 0:
+            statements.append(''.join(current)[:-1].strip())
+            current = []
+    statements.append(''.join(current).strip())
+    return [s for s in statements if s]
+
+
+def _split_top_level(text: str, delimiter: str = ',') -> List[str]:
+    """Split on delimiters that are not nested inside parentheses."""
+    parts, current, depth = [], [], 0
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == delimiter and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current).strip())
+    return [p for p in parts if p]
+
+
+def _parse_call(statement: str) -> Tuple[str, List[str], str]:
+    """Split `name(params) args` into its name, parameter expressions and argument text."""
+    match = re.match(r'([A-Za-z_][\w.]*)\s*', statement)
+    if match is None:
+        raise ValueError(f"Cannot parse statement '{statement}'")
+    name, rest = match.group(1), statement[match.end():]
+
+    params = []
+    if rest.startswith('('):
+        depth = 0
+        for end, char in enumerate(rest):
+            depth += {'(': 1, ')': -1}.get(char, 0)
+            if depth == 0:
+                break
+        params = _split_top_level(rest[1:end])
+        rest = rest[end + 1:]
+
+    return name, params, rest.strip()
+
+
+class QasmCircuit:
+    """
+    Flat list of operations parsed from a QASM2 program.
+
+    Operations are tuples:
+        ('1q', qubit, matrix)         single-qubit unitary
+        ('cz', a, b) / ('cx', a, b) / ('swap', a, b)
+        ('2q', a, b, matrix)          general two-qubit unitary (a is the first qubit)
+        ('measure', qubit, clbit)
+        ('noise', qubit, px, py, pz)  Pauli channel (ignored by the ideal simulator)
+    """
+
+    def __init__(self):
+        self.qregs: Dict[str, Tuple[int, int]] = {}
+        self.cregs: Dict[str, Tuple[int, int]] = {}
+        self.n_qubits = 0
+        self.n_clbits = 0
+        self.operations: List[tuple] = []
+        self._gates: Dict[str, Tuple[List[str], List[str], List[str]]] = {}
+
+    @classmethod
+    def from_qasm(cls, qasm_str: str) -> 'QasmCircuit':
+        """Parse a QASM2 program (with Bloqade's parallel/glob extensions)."""
+        circuit = cls()
+        text = re.sub(r'//[^\n]*', '', qasm_str)
+        for statement in _split_statements(text):
+            circuit._add_statement(statement)
+        return circuit
+
+    def _resolve(self, arg: str, registers: Dict[str, Tuple[int, int]],
+                 qubit_names: Optional[Dict[str, int]] = None) -> List[int]:
+        """Resolve `reg[i]`, `reg` or a gate argument name to absolute indices."""
+        arg = arg.strip()
+        if qubit_names is not None:
+            if arg not in qubit_names:
+                raise ValueError(f"Unknown gate argument '{arg}'")
+            return [qubit_names[arg]]
+
+        match = re.fullmatch(r'(\w+)\s*(?:\[\s*(\d+)\s*\])?', arg)
+        if match is None or match.group(1) not in registers:
+            raise ValueError(f"Unknown register '{arg}'")
+        offset, size = registers[match.group(1)]
+        if match.group(2) is None:
+            return list(range(offset, offset + size))
+        index = int(match.group(2))
+        if index >= size:
+            raise ValueError(f"Index out of range in '{arg}'")
+        return [offset + index]
+
+    def _add_statement(self, statement: str, variables: Optional[Dict[str, float]] = None,
+                       qubit_names: Optional[Dict[str, int]] = None):
+        keyword = statement.split(None, 1)[0]
+
+        if keyword in ('OPENQASM', 'include', 'KIRIN', 'barrier', 'opaque'):
+            return
+        if keyword in ('qreg', 'creg'):
+            match = re.fullmatch(r'(qreg|creg)\s+(\w+)\s*\[\s*(\d+)\s*\]', statement)
+            size = int(match.group(3))
+            if keyword == 'qreg':
+                self.qregs[match.group(2)] = (self.n_qubits, size)
+                self.n_qubits += size
+            else:
+                self.cregs[match.group(2)] = (self.n_clbits, size)
+                self.n_clbits += size
+            return
+        if keyword == 'gate':
+            self._define_gate(statement)
+            return
+        if keyword in ('if', 'reset'):
+            raise ValueError(f"'{keyword}' statements are not supported by the state-vector simulator")
+        if keyword == 'measure':
+            source, target = statement[len('measure'):].split('->')
+            qubits = self._resolve(source, self.qregs, qubit_names)
+            clbits = self._resolve(target, self.cregs)
+            if len(qubits) != len(clbits):
+                raise ValueError(f"Register size mismatch in '{statement}'")
+            self.operations.extend(('measure', q, c) for q, c in zip(qubits, clbits))
+            return
+
+        name, param_exprs, args = _parse_call(statement)
+        params = [evaluate_expression(p, variables) for p in param_exprs]
+
+        # Extension statements with a brace block of qubit groups
+        if name in ('parallel.U', 'parallel.RZ', 'parallel.CZ', 'glob.U'):
+            groups = [g for g in re.split(r'[;{}]', args) if g.strip()]
+            if name == 'parallel.CZ':
+                for group in groups:
+                    a, b = (self._resolve(x, self.qregs, qubit_names)[0] for x in _split_top_level(group))
+                    self.operations.append(('cz', a, b))
+                return
+
+            matrix = u3_matrix(*params) if name != 'parallel.RZ' else _rz(*params)
+            qubits = []
+            for group in groups:
+                for arg in _split_top_level(group):
+                    qubits.extend(self._resolve(arg, self.qregs, qubit_names))
+            self.operations.extend(('1q', q, matrix) for q in qubits)
+            return
+
+        if name == 'noise.PAULI1':
+            for q in self._resolve(args, self.qregs, qubit_names):
+                self.operations.append(('noise', q, *params))
+            return
+
+        qargs = [self._resolve(a, self.qregs, qubit_names) for a in _split_top_level(args)]
+        # Register arguments broadcast over the register (QASM2 semantics)
+        width = max(len(q) for q in qargs)
+        qargs = [q * width if len(q) == 1 else q for q in qargs]
+
+        for qubits in zip(*qargs):
+            self._apply_gate(name, params, list(qubits))
+
+    def _apply_gate(self, name: str, params: List[float], qubits: List[int]):
+        key = name if name in ('U', 'CX') else name.lower()
+        if key in SINGLE_QUBIT_GATES:
+            self.operations.append(('1q', qubits[0], SINGLE_QUBIT_GATES[key](*params)))
+        elif key in ('cx', 'CX', 'cz', 'swap'):
+            self.operations.append(('cx' if key == 'CX' else key, qubits[0], qubits[1]))
+        elif key in TWO_QUBIT_GATES:
+            self.operations.append(('2q', qubits[0], qubits[1], TWO_QUBIT_GATES[key](*params)))
+        elif name in self._gates:
+            cparams, qparams, body = self._gates[name]
+            variables = dict(zip(cparams, params))
+            qubit_names = dict(zip(qparams, qubits))
+            for statement in body:
+                self._add_statement(statement, variables, qubit_names)
+        else:
+            raise ValueError(f"Unsupported gate '{name}'")
+
+    def _define_gate(self, statement: str):
+        header, body = statement.split('{', 1)
+        name, cparams, qparams = _parse_call(header[len('gate'):].strip())
+        self._gates[name] = (cparams, _split_top_level(qparams),
+                             _split_statements(body.rsplit('}', 1)[0]))
+
+
+# --- Simulation ---
+
+class StateVectorSimulator:
+    """
+    Ideal state-vector simulator for QasmCircuit programs.
+
+    Qubit i is axis i of the state tensor, i.e. qubit 0 is the most
+    significant bit of the flat state index.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        Initialize the simulator.
+
+        Args:
+            seed: Seed of the shot sampling random generator
+        """
+        self.rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def _circuit(program: Union[str, QasmCircuit]) -> QasmCircuit:
+        return QasmCircuit.from_qasm(program) if isinstance(program, str) else program
+
+    @staticmethod
+    def apply_1q(state: np.ndarray, n_qubits: int, qubit: int, matrix: np.ndarray) -> np.ndarray:
+        view = state.reshape(2**qubit, 2, 2**(n_qubits - qubit - 1))
+        return np.einsum('ij,ajb->aib', matrix, view).reshape(-1)
+
+    @staticmethod
+    def _pair_view(state: np.ndarray, n_qubits: int, a: int, b: int) -> Tuple[np.ndarray, bool]:
+        """5D view of the state with the axes of qubits a and b exposed (low qubit first)."""
+        low, high = min(a, b), max(a, b)
+        view = state.reshape(2**low, 2, 2**(high - low - 1), 2, 2**(n_qubits - high - 1))
+        return view, a > b
+
+    def apply_cz(self, state, n_qubits, a, b):
+        view, _ = self._pair_view(state, n_qubits, a, b)
+        view[:, 1, :, 1, :] *= -1
+        return state
+
+    def apply_cx(self, state, n_qubits, control, target):
+        view, swapped = self._pair_view(state, n_qubits, control, target)
+        if swapped:
+            view[:, [0, 1], :, 1, :] = view[:, [1, 0], :, 1, :]
+        else:
+            view[:, 1, :, [0, 1], :] = view[:, 1, :, [1, 0], :]
+        return state
+
+    def apply_swap(self, state, n_qubits, a, b):
+        view, _ = self._pair_view(state, n_qubits, a, b)
+        view[:, 0, :, 1, :], view[:, 1, :, 0, :] = view[:, 1, :, 0, :].copy(), view[:, 0, :, 1, :].copy()
+        return state
+
+    def apply_2q(self, state, n_qubits, a, b, matrix):
+        view, swapped = self._pair_view(state, n_qubits, a, b)
+        gate = matrix.reshape(2, 2, 2, 2)
+        if swapped:
+            gate = gate.transpose(1, 0, 3, 2)
+        return np.einsum('ijkl,akblc->aibjc', gate, view).reshape(-1)
+
+    def _run(self, circuit: QasmCircuit) -> Tuple[np.ndarray, Dict[int, int]]:
+        """Evolve |0...0>, returning the final state and the qubit -> clbit measurement map."""
+        n = circuit.n_qubits
+        state = np.zeros(2**n, dtype=complex)
+        state[0] = 1
+        pending: Dict[int, np.ndarray] = {}
+        measured: Dict[int, int] = {}
+
+        def flush(qubits):
+            nonlocal state
+            for q in qubits:
+                if q in pending:
+                    state = self.apply_1q(state, n, q, pending.pop(q))
+
+        for op in circuit.operations:
+            kind = op[0]
+            if kind in ('measure', 'noise'):
+                if kind == 'measure':
+                    measured[op[1]] = op[2]
+                continue
+
+            qubits = op[1:2] if kind == '1q' else op[1:3]
+            if any(q in measured for q in qubits):
+                raise ValueError("Gates after measurement are not supported by the state-vector simulator")
+
+            if kind == '1q':
+                # Fuse consecutive single-qubit gates on the same qubit
+                pending[op[1]] = op[2] @ pending[op[1]] if op[1] in pending else op[2]
+                continue
+
+            flush(qubits)
+            if kind == 'cz':
+                state = self.apply_cz(state, n, op[1], op[2])
+            elif kind == 'cx':
+                state = self.apply_cx(state, n, op[1], op[2])
+            elif kind == 'swap':
+                state = self.apply_swap(state, n, op[1], op[2])
+            else:
+                state = self.apply_2q(state, n, op[1], op[2], op[3])
+
+        flush(list(pending))
+        return state, measured
+
+    def statevector(self, program: Union[str, QasmCircuit]) -> np.ndarray:
+        """Final state vector of the program, ignoring measurements."""
+        return self._run(self._circuit(program))[0]
+
+    def probabilities(self, program: Union[str, QasmCircuit]) -> np.ndarray:
+        """Probability of each computational basis state at the end of the program."""
+        return np.abs(self.statevector(program)) ** 2
+
+    def sample(self, program: Union[str, QasmCircuit], shots: int,
+               measure_all: bool = False) -> np.ndarray:
+        """
+        Sample the measurements of the program.
+
+        Args:
+            program: QASM2 text or parsed circuit
+            shots: Number of shots
+            measure_all: Return the bits of every qubit instead of the classical
+                registers written by `measure` statements
+
+        Returns:
+            uint8 array of shape (shots, n_clbits), or (shots, n_qubits) if
+            `measure_all`; unwritten classical bits are zero
+        """
+        circuit = self._circuit(program)
+        state, measured = self._run(circuit)
+        n = circuit.n_qubits
+
+        probabilities = np.abs(state) ** 2
+        outcomes = self.rng.choice(len(probabilities), size=shots, p=probabilities / probabilities.sum())
+        qubit_bits = ((outcomes[:, None] >> np.arange(n - 1, -1, -1)) & 1).astype(np.uint8)
+        if measure_all:
+            return qubit_bits
+
+        bits = np.zeros((shots, circuit.n_clbits), dtype=np.uint8)
+        for qubit, clbit in measured.items():
+            bits[:, clbit] = qubit_bits[:, qubit]
+        return bits
+
+    def counts(self, program: Union[str, QasmCircuit], shots: int) -> Counter:
+        """
+        Measurement counts as bit strings, classical bit 0 first (the format of
+        `to_bitstrings` on PyQrack results).
+        """
+        bits = self.sample(program, shots)
+        return Counter(''.join(map(str, row)) for row in bits)
+
+
+if __name__ == "__main__":
+    ghz = """
+    OPENQASM 2.0;
+    include "qelib1.inc";
+    qreg q[4];
+    creg c[4];
+    U(1.5707963267949, 0.0, 3.14159265358979) q[0];
+    parallel.U(1.5707963267949, 3.14159265358979, 3.14159265358979) {
+      q[1];
+      q[2];
+      q[3];
+    }
+    cz q[0], q[1];
+    parallel.U(1.5707963267949, 0.0, 0.0) {
+      q[1];
+    }
+    parallel.CZ {
+      q[0], q[2];
+      q[1], q[3];
+    }
+    parallel.U(1.5707963267949, 0.0, 0.0) {
+      q[2];
+      q[3];
+    }
+    measure q -> c;
+    """
+    simulator = StateVectorSimulator(seed=0)
+    print(simulator.counts(ghz, 1000))
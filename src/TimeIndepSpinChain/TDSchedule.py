@@ -0,0 +1,190 @@
+"""
+Time-Dependent Schedules for the Spin Chain
+
+SpinChainLieTrotterTD interpolates J and h inside the kernel loop and has to
+be rebuilt for every total time. Here the coupling and field schedules are
+plain Python callables evaluated on NumPy arrays, every per-step rotation
+angle is precomputed up front, and the angles are passed as arguments to a
+single parameterized kernel that is compiled once per (n, steps).
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Sequence, Tuple
+
+import numpy as np
+from bloqade import qasm2
+from bloqade.pyqrack import PyQrack
+from kirin.dialects import ilist
+
+from TimeIndepSpinChain import extended_opt
+
+# A schedule maps normalized times s in [0, 1] (as an array) to parameter values
+Schedule = Callable[[np.ndarray], np.ndarray]
+
+
+def constant_schedule(value: float) -> Schedule:
+    """Schedule that keeps the parameter fixed at `value`."""
+    return lambda s: np.full(np.shape(s), float(value))
+
+
+def linear_schedule(start: float, end: float) -> Schedule:
+    """Linear ramp from `start` at s=0 to `end` at s=1 (as in SpinChainLieTrotterTD)."""
+    return lambda s: start + (end - start) * np.asarray(s, dtype=float)
+
+
+def cosine_schedule(start: float, end: float) -> Schedule:
+    """Smooth ramp from `start` to `end` with zero slope at both ends."""
+    return lambda s: start + (end - start) * (1 - np.cos(np.pi * np.asarray(s, dtype=float))) / 2
+
+
+def piecewise_schedule(breakpoints: Sequence[float], values: Sequence[float],
+                       interpolate: bool = True) -> Schedule:
+    """
+    Schedule defined by values at given normalized times.
+
+    Args:
+        breakpoints: Increasing normalized times in [0, 1]
+        values: Parameter value at each breakpoint
+        interpolate: Linearly interpolate between breakpoints; otherwise hold
+            each value until the next breakpoint
+
+    Returns:
+        The schedule
+    """
+    breakpoints = np.asarray(breakpoints, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if breakpoints.shape != values.shape or breakpoints.ndim != 1 or len(breakpoints) == 0:
+        raise ValueError("breakpoints and values must be 1D arrays of the same nonzero length")
+    if np.any(np.diff(breakpoints) <= 0):
+        raise ValueError("breakpoints must be strictly increasing")
+
+    if interpolate:
+        return lambda s: np.interp(s, breakpoints, values)
+
+    def hold(s):
+        index = np.searchsorted(breakpoints, np.asarray(s, dtype=float), side='right') - 1
+        return values[np.clip(index, 0, len(values) - 1)]
+
+    return hold
+
+
+def array_schedule(samples: Sequence[float]) -> Schedule:
+    """Schedule from values sampled uniformly on [0, 1], linearly interpolated."""
+    samples = np.asarray(samples, dtype=float)
+    if len(samples) == 1:
+        return constant_schedule(samples[0])
+    return piecewise_schedule(np.linspace(0, 1, len(samples)), samples)
+
+
+def td_angle_tables(time: float, steps: int, J: Schedule,
+                    h: Schedule) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Precompute the rotation angles of every Trotter step.
+
+    Parameters are sampled at the start of each step, s = step / steps, which
+    matches the interpolation of SpinChainLieTrotterTD.
+
+    Args:
+        time: Total evolution time
+        steps: Number of Trotter steps
+        J: Coupling schedule
+        h: Transverse field schedule
+
+    Returns:
+        (ZZ angles, X angles), each of shape (steps,)
+    """
+    if steps < 1:
+        raise ValueError("steps must be at least 1")
+
+    s = np.arange(steps) / steps
+    timestep = time / steps
+    zz_angles = 2 * np.broadcast_to(J(s), (steps,)) * timestep
+    x_angles = 2 * np.broadcast_to(h(s), (steps,)) * timestep
+    return zz_angles, x_angles
+
+
+@lru_cache(maxsize=32)
+def SpinChainLieTrotterTDParam(n: int, steps: int):
+    """
+    Parameterized time-dependent Lie-Trotter program.
+
+    The returned kernel takes the ZZ and X angle tables (IList of length
+    `steps`) as arguments, so one compilation serves every schedule and
+    total time with the same number of steps. Like SpinChainLieTrotterTD it
+    is parallelized; the angle arguments then stay unresolved addresses for
+    PyQrack, so it has to be run with dynamic qubits (see run_schedule).
+
+    Args:
+        n: Chain has 2**n qubits
+        steps: Number of Trotter steps
+
+    Returns:
+        Compiled kernel `program(zz_angles, x_angles) -> creg`
+    """
+    n_qubits = int(2**n)
+
+    @extended_opt(parallelize=True)
+    def SpinChainLieTrotterTDParam_program(zz_angles: ilist.IList[float, Any],
+                                           x_angles: ilist.IList[float, Any]):
+        qreg = qasm2.qreg(n_qubits)
+        creg = qasm2.creg(n_qubits)
+
+        for step in range(steps):
+            # Interaction terms (ZZ)
+            for i in range(n_qubits):
+                qasm2.cx(qreg[i], qreg[(i+1)%n_qubits])
+                qasm2.rz(qreg[(i+1)%n_qubits], zz_angles[step])
+                qasm2.cx(qreg[i], qreg[(i+1)%n_qubits])
+            # Field terms (X)
+            for i in range(n_qubits):
+                qasm2.rx(qreg[i], x_angles[step])
+
+        for i in range(n_qubits):
+            qasm2.measure(qreg[i], creg[i])
+
+        return creg
+
+    return SpinChainLieTrotterTDParam_program
+
+
+def _default_device() -> PyQrack:
+    return PyQrack(dynamic_qubits=True, pyqrack_options={"isBinaryDecisionTree": False})
+
+
+def run_schedule(n: int, time: float, steps: int, J: Schedule, h: Schedule,
+                 shots: int = 100, device=None):
+    """
+    Sample the time-dependent spin chain for the given schedules.
+
+    Args:
+        n: Chain has 2**n qubits
+        time: Total evolution time
+        steps: Number of Trotter steps
+        J: Coupling schedule
+        h: Transverse field schedule
+        shots: Number of shots
+        device: PyQrack device with dynamic_qubits=True (a default one is
+            created if None)
+
+    Returns:
+        List of measured cregs, one per shot
+    """
+    program = SpinChainLieTrotterTDParam(n, steps)
+    zz_angles, x_angles = td_angle_tables(time, steps, J, h)
+    device = device if device is not None else _default_device()
+    return device.multi_run(program, shots,
+                            ilist.IList(zz_angles.tolist()), ilist.IList(x_angles.tolist()))
+
+
+if __name__ == "__main__":
+    import time as timer
+
+    J = cosine_schedule(0.2, 1.0)
+    h = piecewise_schedule([0.0, 0.5, 1.0], [1.2, 0.6, 0.0])
+    device = _default_device()
+
+    for total_time in (0.5, 1.0, 2.0):
+        start = timer.time()
+        results = run_schedule(2, total_time, 10, J, h, shots=20, device=device)
+        magnetization = np.mean([[1 - 2 * int(bit) for bit in shot] for shot in results])
+        print(f"t={total_time}: <Z>={magnetization:+.3f} ({timer.time() - start:.2f}s)")
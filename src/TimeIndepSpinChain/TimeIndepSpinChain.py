@@ -1,5 +1,10 @@
+import re
 from bloqade import qasm2
 import numpy as np
+from functools import lru_cache
+from typing import Tuple
+from bloqade.qasm2.emit import QASM2
+from bloqade.qasm2.parse import spprint
 from bloqade.pyqrack import PyQrack
 from collections import Counter
 from bloqade.qasm2.rewrite.native_gates import RydbergGateSetRewriteRule
@@ -248,4 +253,107 @@ def SpinChainSuzukiTrotter(n: int, time: int, steps: int, parallelize: bool = Tr
 
         return creg
 
-    return SpinChainSuzukiTrotter_program
\ No newline at end of file
+    return SpinChainSuzukiTrotter_program
+
+
+
+STEP_BUILDERS = {
+    "lie": SpinChainLieTrotter,
+    "parallel": SpinChainLieTrotterParallel,
+    "suzuki": SpinChainSuzukiTrotter,
+}
+
+
+def _emit(program, parallelize: bool) -> str:
+    return spprint(QASM2(allow_parallel=parallelize).emit(program))
+
+
+@lru_cache(maxsize=64)
+def trotter_step_qasm(kind: str, n: int, timestep: float,
+                      parallelize: bool = True) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Compile, optimize and emit a single Trotter step.
+
+    The step is built as a one-step program of the chosen kernel family, so
+    it goes through exactly the same native rewrite and parallelization as
+    the unrolled programs, but folding only ever sees one step.
+
+    Args:
+        kind: Kernel family, one of STEP_BUILDERS ("lie", "parallel", "suzuki")
+        n: Chain has 2**n qubits
+        timestep: Duration of the step
+        parallelize: Whether to apply the parallelization passes
+
+    Returns:
+        (header lines, step body lines, measurement lines) of the emitted QASM2
+    """
+    if kind not in STEP_BUILDERS:
+        raise ValueError(f"Unknown Trotter kernel '{kind}', expected one of {sorted(STEP_BUILDERS)}")
+
+    program = STEP_BUILDERS[kind](n, timestep, 1, parallelize=parallelize)
+    lines = _emit(program, parallelize).strip().splitlines()
+
+    creg_end = max(i for i, line in enumerate(lines) if line.startswith("creg")) + 1
+    measure_start = min(i for i, line in enumerate(lines) if line.startswith("measure"))
+    return tuple(lines[:creg_end]), tuple(lines[creg_end:measure_start]), tuple(lines[measure_start:])
+
+
+def SpinChainTrotterRepeated(n: int, time: float, steps: int, kind: str = "parallel",
+                             parallelize: bool = True, as_gate: bool = False) -> str:
+    """
+    Emit a Trotter evolution whose step is compiled once and replicated.
+
+    Unlike the SpinChain*Trotter programs, which fold `for i in range(steps)`
+    and therefore compile in time linear in `steps`, only one step is
+    optimized here (and cached across calls); the program is assembled by
+    repeating the emitted step block, or by calling it as a QASM2 `gate`.
+
+    Args:
+        n: Chain has 2**n qubits
+        time: Total evolution time
+        steps: Number of Trotter steps
+        kind: Kernel family, one of STEP_BUILDERS ("lie", "parallel", "suzuki")
+        parallelize: Whether to apply the parallelization passes to the step
+        as_gate: Define the step as `gate trotter_step` and call it `steps`
+            times instead of repeating its body. Requires parallelize=False,
+            since parallel statements are not allowed inside a gate body.
+
+    Returns:
+        The QASM2 program as a string
+    """
+    if steps < 1:
+        raise ValueError("steps must be at least 1")
+    if as_gate and parallelize:
+        raise ValueError("parallel statements cannot appear inside a QASM2 gate, use parallelize=False")
+
+    if time == 0:
+        return _emit(STEP_BUILDERS[kind](n, time, steps, parallelize=parallelize), parallelize)
+
+    header, body, measures = trotter_step_qasm(kind, n, time / steps, parallelize)
+
+    if not as_gate:
+        return "\n".join(header + body * steps + measures) + "\n"
+
+    n_qubits = int(2**n)
+    args = ", ".join(f"q{i}" for i in range(n_qubits))
+    call = "trotter_step " + ", ".join(f"qreg[{i}]" for i in range(n_qubits)) + ";"
+    gate = [f"gate trotter_step {args} {{"]
+    gate += ["  " + re.sub(r"qreg\[(\d+)\]", r"q\1", line) for line in body]
+    gate += ["}"]
+
+    # The gate must be defined after the includes but before its first use
+    declarations = [line for line in header if line.startswith(("qreg", "creg"))]
+    preamble = [line for line in header if not line.startswith(("qreg", "creg"))]
+    return "\n".join(preamble + gate + declarations + [call] * steps + list(measures)) + "\n"
+
+
+if __name__ == "__main__":
+    import time as timer
+
+    for n_steps in (1, 10, 100):
+        start = timer.time()
+        qasm_str = SpinChainTrotterRepeated(2, 1.0, n_steps, kind="parallel")
+        print(f"{n_steps:4d} steps: {len(qasm_str.splitlines()):6d} lines, "
+              f"{timer.time() - start:.2f}s")
+
+    print(SpinChainTrotterRepeated(1, 1.0, 3, kind="lie", parallelize=False, as_gate=True))
@@ -0,0 +1,219 @@
+"""
+Trotter Circuit Compilation Cache
+
+This module provides a two-level cache for compiled Trotter circuits:
+an in-memory LRU of compiled Bloqade kernels and an on-disk LRU store of
+the emitted QASM2 programs, so repeated runs of the same experiment skip
+lowering, native-gate rewriting and parallelization entirely.
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from PauliHamiltonian import PauliHamiltonian
+
+# Part of every cache key; bump it whenever the compiled circuits change, so
+# programs written by an older compiler are not read back from disk.
+# 2: templates inlined before the native rewrite and parallelization
+CACHE_VERSION = 2
+
+
+def hamiltonian_fingerprint(hamiltonian: PauliHamiltonian) -> str:
+    """
+    Compute a stable fingerprint of a Hamiltonian's structure and coefficients.
+
+    Two Hamiltonians with the same terms in the same order produce the same
+    fingerprint. Term order is part of the fingerprint because it determines
+    the gate order of the Trotterized circuit.
+
+    Args:
+        hamiltonian: The Hamiltonian to fingerprint
+
+    Returns:
+        Hex digest identifying the Hamiltonian
+    """
+    digest = hashlib.sha256()
+    for term in hamiltonian.terms:
+        ops = ",".join(f"{term.operators[q].name}{q}" for q in sorted(term.operators.keys()))
+        coefficient = complex(term.coefficient)
+        digest.update(f"{coefficient.real!r}:{coefficient.imag!r}:{ops};".encode())
+    return digest.hexdigest()
+
+
+def make_cache_key(hamiltonian: PauliHamiltonian, time: float, n_steps: int,
+                   order: int, optimize: bool, parallelize: bool) -> str:
+    """
+    Build the cache key of a Trotter circuit.
+
+    The evolution time is part of the key since it fixes every rotation
+    angle in the emitted circuit.
+
+    Args:
+        hamiltonian: The Hamiltonian being simulated
+        time: Total evolution time
+        n_steps: Number of Trotter steps
+        order: Trotter order
+        optimize: Whether commuting groups are used
+        parallelize: Whether the parallelization passes are applied
+
+    Returns:
+        Cache key usable as a file name
+    """
+    raw = (f"v={CACHE_VERSION}|{hamiltonian_fingerprint(hamiltonian)}|t={float(time)!r}|steps={n_steps}"
+           f"|order={order}|optimize={bool(optimize)}|parallelize={bool(parallelize)}")
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class TrotterCircuitCache:
+    """
+    LRU cache of compiled Trotter circuits.
+
+    Compiled kernels are kept in memory only, since Kirin IR cannot be
+    serialized. The emitted QASM2 text is additionally written to
+    `cache_dir` (if given), where the least recently used files are evicted
+    once more than `max_disk_entries` programs are stored.
+    """
+
+    QASM_SUFFIX = ".qasm"
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_memory_entries: int = 32, max_disk_entries: int = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory of the on-disk QASM store (None disables it)
+            max_memory_entries: Maximum number of kernels kept in memory
+            max_disk_entries: Maximum number of QASM files kept on disk
+        """
+        if max_memory_entries < 1 or max_disk_entries < 1:
+            raise ValueError("Cache sizes must be positive")
+
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._kernels = OrderedDict()
+        self._qasm = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _qasm_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.QASM_SUFFIX)
+
+    @staticmethod
+    def _remember(store: OrderedDict, key: str, value, max_entries: int):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > max_entries:
+            store.popitem(last=False)
+
+    def get_kernel(self, key: str, count_miss: bool = True):
+        """
+        Return the compiled kernel stored under `key`, or None.
+
+        Args:
+            key: Cache key, see make_cache_key
+            count_miss: Count a miss in `stats`; False when the caller has
+                already counted one for the same request (a QASM lookup)
+        """
+        if key in self._kernels:
+            self._kernels.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._kernels[key]
+
+        if count_miss:
+            self.stats['misses'] += 1
+        return None
+
+    def put_kernel(self, key: str, kernel):
+        """Store a compiled kernel under `key`."""
+        self._remember(self._kernels, key, kernel, self.max_memory_entries)
+
+    def get_qasm(self, key: str) -> Optional[str]:
+        """
+        Return the QASM2 program stored under `key`, or None.
+
+        Memory is checked first, then the on-disk store. A disk hit refreshes
+        the file's modification time, which is what LRU eviction is based on.
+        """
+        if key in self._qasm:
+            self._qasm.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._qasm[key]
+
+        if self.cache_dir is not None:
+            path = self._qasm_path(key)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    qasm_str = f.read()
+                os.utime(path)
+                self._remember(self._qasm, key, qasm_str, self.max_memory_entries)
+                self.stats['disk_hits'] += 1
+                return qasm_str
+
+        self.stats['misses'] += 1
+        return None
+
+    def put_qasm(self, key: str, qasm_str: str):
+        """Store a QASM2 program under `key` in memory and on disk."""
+        self._remember(self._qasm, key, qasm_str, self.max_memory_entries)
+
+        if self.cache_dir is None:
+            return
+
+        # Write to a temporary file first so concurrent readers never see
+        # a partially written program
+        path = self._qasm_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(qasm_str)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove the least recently used QASM files beyond `max_disk_entries`."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.QASM_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                entries.append((os.path.getmtime(path), path))
+
+        if len(entries) <= self.max_disk_entries:
+            return
+
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+                self.stats['evictions'] += 1
+            except FileNotFoundError:
+                # Already evicted by another process sharing the directory
+                pass
+
+    def clear(self, disk: bool = False):
+        """
+        Drop all cached entries.
+
+        Args:
+            disk: Also delete the QASM files of the on-disk store
+        """
+        self._kernels.clear()
+        self._qasm.clear()
+
+        if disk and self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(self.QASM_SUFFIX):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def __len__(self):
+        return len(self._kernels)
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._kernels or key in self._qasm:
+            return True
+        return self.cache_dir is not None and os.path.exists(self._qasm_path(key))
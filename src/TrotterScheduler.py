@@ -0,0 +1,418 @@
+"""
+Parallelism-aware Trotter Layer Scheduler
+
+This module packs the terms of each commuting group of a PauliHamiltonian
+into maximally parallel layers for neutral-atom hardware:
+
+- two-qubit terms are split into matchings by edge-coloring the interaction
+  graph, and each matching becomes a pair of parallel CZ pulses;
+- all single-qubit rotations between two CZ pulses (basis changes,
+  single-qubit terms, CX decompositions) are fused per qubit and the
+  resulting rotations with identical angles are merged into one parallel U.
+"""
+
+import math
+from collections import defaultdict
+from typing import List, Tuple, Dict, Optional, Callable
+
+import numpy as np
+from bloqade import qasm2
+from kirin.dialects import ilist
+
+from PauliHamiltonian import PauliOp, PauliTerm, PauliHamiltonian
+from U3Decomposition import u3_params
+from temp_TrotterCircuit import (
+    SuzukiTrotter, extended_opt, make_template_block, term_pattern, suzuki_weights,
+)
+
+
+# ===== Single-qubit unitaries =====
+
+_I2 = np.eye(2, dtype=complex)
+_H = np.array([[1, 1], [1, -1]], dtype=complex) / math.sqrt(2)
+
+
+def _rotation(op: PauliOp, theta: float) -> np.ndarray:
+    """Return exp(-i * theta/2 * op) as a 2x2 matrix."""
+    return math.cos(theta / 2) * _I2 - 1j * math.sin(theta / 2) * op.matrix
+
+
+# Basis change mapping each Pauli operator to Z, using the same gates as
+# SuzukiTrotter (H for X, rx(pi/2) for Y), and its inverse
+_TO_Z = {
+    PauliOp.X: _H,
+    PauliOp.Y: _rotation(PauliOp.X, math.pi / 2),
+    PauliOp.Z: _I2,
+}
+_FROM_Z = {op: matrix.conj().T for op, matrix in _TO_Z.items()}
+
+
+# ===== Interaction graph coloring =====
+
+def edge_coloring(edges: List[Tuple[int, int]]) -> List[int]:
+    """
+    Color the edges of an interaction (multi)graph so that edges sharing a
+    qubit get different colors.
+
+    Each edge is colored with a color free at both endpoints; if there is
+    none, the two candidate colors are swapped along an alternating (Kempe)
+    path. This uses the minimal max-degree colors on bipartite graphs such
+    as chains, even rings and square lattices, and falls back to a new
+    color when the swap is impossible (e.g. odd rings).
+
+    Args:
+        edges: List of (qubit, qubit) pairs
+
+    Returns:
+        Color index of each edge
+    """
+    colors: List[Optional[int]] = [None] * len(edges)
+    # vertex -> {color: edge index}
+    incident: Dict[int, Dict[int, int]] = defaultdict(dict)
+    n_colors = 0
+
+    def free_color(vertex: int) -> Optional[int]:
+        for c in range(n_colors):
+            if c not in incident[vertex]:
+                return c
+        return None
+
+    def other_end(edge: int, vertex: int) -> int:
+        u, v = edges[edge]
+        return v if u == vertex else u
+
+    for e, (u, v) in enumerate(edges):
+        a = free_color(u)
+        b = free_color(v)
+
+        if a is not None and a not in incident[v]:
+            color = a
+        elif b is not None and b not in incident[u]:
+            color = b
+        elif a is not None and b is not None:
+            # a is free at u but used at v; walk the a/b path starting at v
+            path = []
+            vertex, current, following = v, a, b
+            while current in incident[vertex]:
+                edge = incident[vertex][current]
+                path.append(edge)
+                vertex = other_end(edge, vertex)
+                current, following = following, current
+
+            if vertex == u:
+                # The path closes an odd cycle through u, swapping can't help
+                color = n_colors
+                n_colors += 1
+            else:
+                for edge in path:
+                    x, y = edges[edge]
+                    del incident[x][colors[edge]]
+                    del incident[y][colors[edge]]
+                for edge in path:
+                    colors[edge] = b if colors[edge] == a else a
+                    x, y = edges[edge]
+                    incident[x][colors[edge]] = edge
+                    incident[y][colors[edge]] = edge
+                color = a
+        else:
+            color = n_colors
+            n_colors += 1
+
+        colors[e] = color
+        incident[u][color] = e
+        incident[v][color] = e
+
+    return colors
+
+
+# ===== Kernels of scheduled operations =====
+
+def _make_parallel_u(qubits: Tuple[int, ...], theta: float, phi: float, lam: float):
+    targets = ilist.IList(list(qubits))
+
+    @qasm2.extended(fold=False)
+    def parallel_u(qreg: qasm2.QReg):
+        def get_qubit(x: int):
+            return qreg[x]
+        qasm2.parallel.u(qargs=ilist.map(fn=get_qubit, collection=targets),
+                         theta=theta, phi=phi, lam=lam)
+
+    return parallel_u
+
+
+def _make_parallel_cz(ctrl_qubits: Tuple[int, ...], target_qubits: Tuple[int, ...]):
+    ctrl_list = ilist.IList(list(ctrl_qubits))
+    target_list = ilist.IList(list(target_qubits))
+
+    @qasm2.extended(fold=False)
+    def parallel_cz(qreg: qasm2.QReg):
+        def get_qubit(x: int):
+            return qreg[x]
+        qasm2.parallel.cz(ctrls=ilist.map(fn=get_qubit, collection=ctrl_list),
+                          qargs=ilist.map(fn=get_qubit, collection=target_list))
+
+    return parallel_cz
+
+
+def _make_sequence(first: Callable, second: Callable):
+    @qasm2.extended(fold=False)
+    def sequence(qreg: qasm2.QReg):
+        first(qreg)
+        second(qreg)
+
+    return sequence
+
+
+def _sequence_kernels(kernels: List[Callable]):
+    """Compose (qreg) kernels in order as a balanced tree of calls."""
+    if len(kernels) == 1:
+        return kernels[0]
+    middle = len(kernels) // 2
+    return _make_sequence(_sequence_kernels(kernels[:middle]), _sequence_kernels(kernels[middle:]))
+
+
+class TrotterLayerScheduler:
+    """
+    Schedule the Trotter steps of a Pauli Hamiltonian into parallel layers.
+
+    Terms within a commuting group may be applied in any order, so each
+    group is split into:
+      - one layer per Pauli type of single-qubit terms,
+      - one layer per color of the two-qubit interaction graph,
+      - one layer per term of weight three or more.
+
+    The generated circuits use the same angle convention as SuzukiTrotter.
+    """
+
+    def __init__(self, hamiltonian: PauliHamiltonian):
+        """
+        Initialize the scheduler.
+
+        Args:
+            hamiltonian: The Hamiltonian to schedule
+        """
+        self.hamiltonian = hamiltonian
+        self.n_qubits = hamiltonian.get_n_qubits()
+        self.commuting_groups = hamiltonian.commuting_groups()
+        self._layers = [self._schedule_group(group) for group in self.commuting_groups]
+
+    @staticmethod
+    def _schedule_group(group: PauliHamiltonian) -> List[List[PauliTerm]]:
+        """
+        Pack the terms of a commuting group into layers of terms acting on
+        disjoint qubits (except for single-qubit layers, which are fused).
+        """
+        single = defaultdict(list)
+        pairs = []
+        wide = []
+
+        for term in group.terms:
+            qubits, _, _ = term_pattern(term)
+            if len(qubits) == 1:
+                single[term.operators[qubits[0]]].append(term)
+            elif len(qubits) == 2:
+                pairs.append(term)
+            elif len(qubits) > 2:
+                wide.append(term)
+
+        layers = [single[op] for op in (PauliOp.X, PauliOp.Y, PauliOp.Z) if single[op]]
+
+        colors = edge_coloring([term_pattern(term)[0] for term in pairs])
+        for color in range(max(colors, default=-1) + 1):
+            layers.append([term for term, c in zip(pairs, colors) if c == color])
+
+        layers.extend([term] for term in wide)
+        return layers
+
+    def layers(self) -> List[List[List[PauliTerm]]]:
+        """
+        Get the schedule.
+
+        Returns:
+            For each commuting group, its list of layers of terms
+        """
+        return self._layers
+
+    def depth(self) -> int:
+        """Number of layers in one first-order Trotter step."""
+        return sum(len(group_layers) for group_layers in self._layers)
+
+    def _step_operations(self, group_times: List[Tuple[int, float]]) -> List[tuple]:
+        """
+        Lower a sequence of (commuting group index, time) evolutions to
+        native parallel operations.
+
+        Returns:
+            Operations ('u', qubits, theta, phi, lam), ('cz', ctrls, targets)
+            or ('block', table) for terms of weight three or more
+        """
+        operations = []
+        pending = {}
+
+        def push(qubit: int, matrix: np.ndarray):
+            pending[qubit] = matrix @ pending.get(qubit, _I2)
+
+        def flush(qubits=None):
+            # Merge the pending rotations of equal angles into parallel gates
+            by_params = defaultdict(list)
+            for qubit in sorted(pending if qubits is None else qubits):
+                if qubit not in pending:
+                    continue
+                params = u3_params(pending.pop(qubit))
+                if params is not None:
+                    by_params[params].append(qubit)
+            for params, qubits_with_params in by_params.items():
+                operations.append(('u', tuple(qubits_with_params)) + params)
+
+        for group_index, time in group_times:
+            for layer in self._layers[group_index]:
+                qubits, _, _ = term_pattern(layer[0])
+                angles = [-2 * float(np.real(term.coefficient)) * time for term in layer]
+
+                if len(qubits) == 1:
+                    for term, theta in zip(layer, angles):
+                        qubit, = term_pattern(term)[0]
+                        push(qubit, _rotation(term.operators[qubit], theta))
+
+                elif len(qubits) == 2:
+                    # cx(c, t) rz(t) cx(c, t) = H_t cz rx_t(theta) cz H_t
+                    ctrls, targets = [], []
+                    for term in layer:
+                        (c, t), _, _ = term_pattern(term)
+                        ctrls.append(c)
+                        targets.append(t)
+                        push(c, _TO_Z[term.operators[c]])
+                        push(t, _H @ _TO_Z[term.operators[t]])
+
+                    flush(ctrls + targets)
+                    operations.append(('cz', tuple(ctrls), tuple(targets)))
+                    for t, theta in zip(targets, angles):
+                        push(t, _rotation(PauliOp.X, theta))
+                    flush(targets)
+                    operations.append(('cz', tuple(ctrls), tuple(targets)))
+
+                    for term in layer:
+                        (c, t), _, _ = term_pattern(term)
+                        push(c, _FROM_Z[term.operators[c]])
+                        push(t, _FROM_Z[term.operators[t]] @ _H)
+
+                else:
+                    term = layer[0]
+                    flush(term_pattern(term)[0])
+                    operations.append(('block', SuzukiTrotter._evolution_table([term], time)))
+
+        flush()
+        return operations
+
+    def step_operations(self, dt: float, order: int = 1) -> List[tuple]:
+        """
+        Schedule one Trotter step into native parallel operations.
+
+        Args:
+            dt: Step time
+            order: Trotter order (1, 2, or higher even number)
+
+        Returns:
+            List of ('u', qubits, theta, phi, lam), ('cz', ctrls, targets)
+            and ('block', table) operations
+        """
+        n_groups = len(self.commuting_groups)
+
+        if order == 1:
+            group_times = [(g, dt) for g in range(n_groups)]
+        else:
+            group_times = []
+            for weight in suzuki_weights(order):
+                forward = [(g, weight * dt / 2) for g in range(n_groups)]
+                group_times.extend(forward + forward[::-1])
+
+        # Consecutive evolutions of the same commuting group (e.g. the middle
+        # of a second-order step) are merged into a single one
+        merged = []
+        for g, t in group_times:
+            if merged and merged[-1][0] == g:
+                merged[-1] = (g, merged[-1][1] + t)
+            else:
+                merged.append((g, t))
+
+        return self._step_operations(merged)
+
+    def scheduled_trotter(self, time: float, n_steps: int = 1, order: int = 1,
+                          measure: bool = False) -> Callable:
+        """
+        Generate a compiled Trotter circuit from the parallel schedule.
+
+        Args:
+            time: Total evolution time
+            n_steps: Number of Trotter steps
+            order: Trotter order (1, 2, or higher even number)
+            measure: Measure all qubits at the end and return the classical
+                register instead of the quantum register
+
+        Returns:
+            Compiled circuit kernel
+        """
+        dt = time / n_steps
+        n_qubits = self.n_qubits
+
+        kernels = []
+        for operation in self.step_operations(dt, order):
+            if operation[0] == 'u':
+                kernels.append(_make_parallel_u(*operation[1:]))
+            elif operation[0] == 'cz':
+                kernels.append(_make_parallel_cz(*operation[1:]))
+            else:
+                kernels.append(make_template_block(operation[1]))
+        step = _sequence_kernels(kernels) if kernels else None
+
+        @qasm2.extended(fold=False)
+        def circuit_gen():
+            qreg = qasm2.qreg(n_qubits)
+            creg = qasm2.creg(n_qubits)
+
+            if step is not None:
+                for _ in range(n_steps):
+                    step(qreg)
+
+            if measure:
+                for i in range(n_qubits):
+                    qasm2.measure(qreg[i], creg[i])
+                return creg
+            return qreg
+
+        compiled = circuit_gen.similar()
+        extended_opt.run_pass(compiled, parallelize=True)
+        return compiled
+
+    def cost(self, time: float, n_steps: int = 1, order: int = 1) -> float:
+        """
+        Score the scheduled circuit with `score.score`.
+
+        Args:
+            time: Total evolution time
+            n_steps: Number of Trotter steps
+            order: Trotter order
+
+        Returns:
+            Cost of the emitted QASM2 program (lower is better)
+        """
+        from bloqade.qasm2.emit import QASM2
+        from bloqade.qasm2.parse import spprint
+        from score import score
+
+        kernel = self.scheduled_trotter(time, n_steps, order)
+        return score(spprint(QASM2(allow_parallel=True).emit(kernel)))
+
+
+# Example usage
+if __name__ == "__main__":
+    from PauliHamiltonian import create_transverse_field_ising_model, create_heisenberg_xyz_model
+
+    for name, ham in [("TFIM", create_transverse_field_ising_model(4, 1.0, 0.5)),
+                      ("XYZ", create_heisenberg_xyz_model(4, 1.0, 0.5, 0.25))]:
+        scheduler = TrotterLayerScheduler(ham)
+        print(f"{name}: {scheduler.depth()} layers per step")
+        for i, group_layers in enumerate(scheduler.layers()):
+            for layer in group_layers:
+                print(f"  group {i}: {layer}")
+        print(f"  cost (order 2, 2 steps): {scheduler.cost(1.0, 2, 2):.2f}")
@@ -0,0 +1,50 @@
+"""
+Single-Qubit U3 Decomposition
+
+Shared by the Trotter layer scheduler, which merges fused rotations with
+identical angles into parallel U gates, and by the VQE stages, which fuse
+the ansatz rotations of each qubit and layer into one U gate. Kept apart
+from both so that importing it does not build any Bloqade dialect group.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def u3_params(matrix: np.ndarray, decimals: int = 12) -> Optional[Tuple[float, float, float]]:
+    """
+    Decompose a single-qubit unitary into U(theta, phi, lam) angles.
+
+    U(theta, phi, lam) = Rz(phi) Ry(theta) Rz(lam) up to a global phase.
+
+    Args:
+        matrix: 2x2 unitary
+        decimals: Rounding applied to the angles so that equal rotations
+            compare equal
+
+    Returns:
+        (theta, phi, lam), or None if the unitary is the identity up to phase
+    """
+    theta = 2 * math.atan2(abs(matrix[1, 0]), abs(matrix[0, 0]))
+
+    if abs(matrix[1, 0]) < 1e-12:
+        # Diagonal: a pure Z rotation
+        phi = 0.0
+        lam = float(np.angle(matrix[1, 1]) - np.angle(matrix[0, 0]))
+    elif abs(matrix[0, 0]) < 1e-12:
+        # Anti-diagonal: only phi - lam is defined
+        lam = 0.0
+        phi = float(np.angle(matrix[1, 0]) - np.angle(-matrix[0, 1]))
+    else:
+        phi = float(np.angle(matrix[1, 0]) - np.angle(matrix[0, 0]))
+        lam = float(np.angle(-matrix[0, 1]) - np.angle(matrix[0, 0]))
+
+    # Normalize to (-pi, pi] so equal rotations get equal parameters
+    phi = math.remainder(phi, 2 * math.pi)
+    lam = math.remainder(lam, 2 * math.pi)
+    if abs(theta) < 1e-12 and abs(math.remainder(phi + lam, 2 * math.pi)) < 1e-12:
+        return None
+
+    return (round(theta, decimals), round(phi, decimals), round(lam, decimals))
@@ -0,0 +1,228 @@
+"""
+Batched Simulation of the Hardware-Efficient VQE Ansatz
+
+The Variational notebook builds and lowers a new Bloqade kernel for every
+parameter vector of `ansatz_no_ham` and estimates energies from shots. This
+module evaluates the same ansatz directly on NumPy state vectors with a
+leading batch axis, so a whole population of parameter vectors (for
+population-based optimizers or finite-difference stencils) is simulated in
+one vectorized pass and exact energies of a PauliHamiltonian are returned.
+
+The ansatz, for params of shape (reps + 1, n_qubits, 3):
+    for r in range(reps):
+        rx(params[r, i, 0]), ry(params[r, i, 1]), rz(params[r, i, 2]) on every qubit i
+        cx(j, k) followed by cz(j, k) for every pair j < k
+    rx, ry, rz with params[-1] on every qubit (unless skip_final_rotation_layer)
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from PauliHamiltonian import PauliHamiltonian, PauliOp
+
+
+def basis_bits(n_qubits: int) -> np.ndarray:
+    """bits[x, i] is the value of qubit i in basis state x (qubit 0 is the most significant bit)."""
+    basis = np.arange(2**n_qubits)
+    return (basis[:, None] >> np.arange(n_qubits - 1, -1, -1)) & 1
+
+
+class PauliExpectation:
+    """
+    Batched application and expectation values of a PauliHamiltonian.
+
+    A Pauli string P maps |x> to phase_P(x) |x XOR flip_P>, where flip_P marks
+    the qubits acted on by X or Y. Terms are grouped by flip mask, and for each
+    mask the coefficients and phases of all its terms are summed into a single
+    diagonal vector, so H|psi> costs one gather per distinct mask.
+    """
+
+    def __init__(self, hamiltonian: PauliHamiltonian, n_qubits: int):
+        """
+        Precompute the flip masks and diagonals of the Hamiltonian.
+
+        Args:
+            hamiltonian: The Hamiltonian
+            n_qubits: Number of qubits of the states it will be applied to
+        """
+        if hamiltonian.terms and hamiltonian.get_n_qubits() > n_qubits:
+            raise ValueError("Hamiltonian acts on more qubits than the state")
+
+        self.n_qubits = n_qubits
+        bits = basis_bits(n_qubits)
+        index = np.arange(2**n_qubits)
+
+        diagonals: Dict[int, np.ndarray] = {}
+        for term in hamiltonian.terms:
+            flip = 0
+            phase = np.full(2**n_qubits, complex(term.coefficient))
+            for qubit, op in term.operators.items():
+                if op == PauliOp.I:
+                    continue
+                if op in (PauliOp.X, PauliOp.Y):
+                    flip |= 1 << (n_qubits - 1 - qubit)
+                if op == PauliOp.Y:
+                    phase = phase * 1j * (1 - 2 * bits[:, qubit])
+                elif op == PauliOp.Z:
+                    phase = phase * (1 - 2 * bits[:, qubit])
+            diagonals[flip] = diagonals.get(flip, 0) + phase
+
+        # (H psi)[y] = sum_m D_m(y ^ m) psi[y ^ m]
+        self._terms = [(index ^ flip, diagonal[index ^ flip]) for flip, diagonal in diagonals.items()]
+
+    def apply(self, states: np.ndarray) -> np.ndarray:
+        """
+        Apply the Hamiltonian to a batch of states.
+
+        Args:
+            states: Array of shape (..., 2**n_qubits)
+
+        Returns:
+            H|psi> for every state, same shape
+        """
+        result = np.zeros_like(states, dtype=complex)
+        for source, diagonal in self._terms:
+            result += diagonal * states[..., source]
+        return result
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        """Real expectation values <psi|H|psi> of a batch of states, shape (...)."""
+        return np.real(np.sum(np.conj(states) * self.apply(states), axis=-1))
+
+
+def rotation_matrices(params: np.ndarray) -> np.ndarray:
+    """
+    Batched matrices of rz(c) ry(b) rx(a), i.e. rx applied first.
+
+    Args:
+        params: Array of shape (..., 3) holding (a, b, c)
+
+    Returns:
+        Array of shape (..., 2, 2)
+    """
+    a, b, c = (params[..., k] / 2 for k in range(3))
+    rx = np.stack([np.stack([np.cos(a), -1j * np.sin(a)], -1),
+                   np.stack([-1j * np.sin(a), np.cos(a)], -1)], -2)
+    ry = np.stack([np.stack([np.cos(b), -np.sin(b)], -1),
+                   np.stack([np.sin(b), np.cos(b)], -1)], -2).astype(complex)
+    rz = np.zeros(params.shape[:-1] + (2, 2), dtype=complex)
+    rz[..., 0, 0] = np.exp(-1j * c)
+    rz[..., 1, 1] = np.exp(1j * c)
+    return rz @ ry @ rx
+
+
+class HardwareEfficientAnsatz:
+    """
+    Batched state-vector simulator of the notebook's `ansatz_no_ham`.
+
+    States are arrays of shape (batch, 2**n_qubits) with qubit 0 as the most
+    significant bit, matching PauliHamiltonian.to_matrix.
+    """
+
+    def __init__(self, n_qubits: int, reps: int, skip_final_rotation_layer: bool = False):
+        """
+        Initialize the ansatz.
+
+        Args:
+            n_qubits: Number of qubits
+            reps: Number of rotation + entangling repetitions
+            skip_final_rotation_layer: Omit the final rotation layer (params[-1]
+                is then unused, as in the notebook)
+        """
+        self.n_qubits = n_qubits
+        self.reps = reps
+        self.skip_final_rotation_layer = skip_final_rotation_layer
+        self.param_shape = (reps + 1, n_qubits, 3)
+
+        # The entangling block (cx then cz on every pair j < k) is a signed
+        # permutation of basis states; track where each basis state goes
+        bits = basis_bits(n_qubits).copy()
+        sign = np.ones(2**n_qubits)
+        for j in range(n_qubits):
+            for k in range(j + 1, n_qubits):
+                bits[:, k] ^= bits[:, j]
+                sign *= 1 - 2 * (bits[:, j] & bits[:, k])
+        destination = bits @ (1 << np.arange(n_qubits - 1, -1, -1))
+        self._entangler_source = np.argsort(destination)
+        self._entangler_sign = sign[self._entangler_source]
+
+    def batch_params(self, params: np.ndarray) -> np.ndarray:
+        """Reshape params (single or batched, structured or flat) to (batch, reps+1, n, 3)."""
+        params = np.asarray(params, dtype=float)
+        size = int(np.prod(self.param_shape))
+        if params.size % size != 0:
+            raise ValueError(f"Parameter array of size {params.size} does not match shape {self.param_shape}")
+        return params.reshape((-1,) + self.param_shape)
+
+    def apply_rotation_layer(self, states: np.ndarray, layer_params: np.ndarray) -> np.ndarray:
+        """
+        Apply rx, ry, rz on every qubit.
+
+        Args:
+            states: Array of shape (batch, 2**n_qubits)
+            layer_params: Array of shape (batch, n_qubits, 3)
+
+        Returns:
+            The rotated states
+        """
+        n, batch = self.n_qubits, states.shape[0]
+        matrices = rotation_matrices(layer_params)
+        for qubit in range(n):
+            view = states.reshape(batch, 2**qubit, 2, 2**(n - qubit - 1))
+            states = np.einsum('bij,bajc->baic', matrices[:, qubit], view).reshape(batch, -1)
+        return states
+
+    def apply_entangler(self, states: np.ndarray) -> np.ndarray:
+        """Apply cx(j, k) followed by cz(j, k) for every pair j < k."""
+        return states[:, self._entangler_source] * self._entangler_sign
+
+    def statevectors(self, params: np.ndarray) -> np.ndarray:
+        """
+        Final states of the ansatz for a batch of parameter vectors.
+
+        Args:
+            params: Array of shape (reps+1, n, 3), (batch, reps+1, n, 3) or a
+                flattened version of either
+
+        Returns:
+            Array of shape (batch, 2**n_qubits)
+        """
+        params = self.batch_params(params)
+        states = np.zeros((params.shape[0], 2**self.n_qubits), dtype=complex)
+        states[:, 0] = 1
+
+        for r in range(self.reps):
+            states = self.apply_rotation_layer(states, params[:, r])
+            states = self.apply_entangler(states)
+        if not self.skip_final_rotation_layer:
+            states = self.apply_rotation_layer(states, params[:, -1])
+        return states
+
+    def energies(self, params: np.ndarray, hamiltonian: PauliHamiltonian) -> np.ndarray:
+        """
+        Exact energies <psi(params)|H|psi(params)> for a batch of parameter vectors.
+
+        Args:
+            params: Parameters, see `statevectors`
+            hamiltonian: The Hamiltonian
+
+        Returns:
+            Array of shape (batch,)
+        """
+        return PauliExpectation(hamiltonian, self.n_qubits)(self.statevectors(params))
+
+
+if __name__ == "__main__":
+    from PauliHamiltonian import create_heisenberg_xyz_model
+
+    n_qubits, reps = 4, 1
+    hamiltonian = create_heisenberg_xyz_model(n_qubits, 1.0, 0.5, 0.25)
+    ansatz = HardwareEfficientAnsatz(n_qubits, reps)
+
+    rng = np.random.default_rng(42)
+    population = rng.random((64,) + ansatz.param_shape) * 2 * np.pi
+    energies = ansatz.energies(population, hamiltonian)
+
+    print(f"Ground state energy: {np.linalg.eigvalsh(hamiltonian.to_matrix(n_qubits)).min():.4f}")
+    print(f"Best of {len(population)} random parameter vectors: {energies.min():.4f}")
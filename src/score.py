@@ -150,7 +150,7 @@ def score(qasm_str):
 
 if __name__ == "__main__":
     # Example usage:
-    qasm_file_path = "C:\Users\73747\Documents\GitHub\2025YaleQHack\qasm.txt"  # Replace with your QASM file path
+    qasm_file_path = r"C:\Users\73747\Documents\GitHub\2025YaleQHack\qasm.txt"  # Replace with your QASM file path
     score_value = score_file(qasm_file_path)
     print(f"Score for {qasm_file_path}: {score_value:.2f}")
 
@@ -9,8 +9,163 @@ from bloqade.qasm2.rewrite.native_gates import RydbergGateSetRewriteRule
 from kirin import ir
 from kirin.rewrite import Walk
 from bloqade.qasm2.passes import UOpToParallel, QASM2Fold
+from bloqade.analysis import address, schedule
 
 from PauliHamiltonian import PauliOp, PauliTerm, PauliHamiltonian
+from TrotterCache import TrotterCircuitCache, make_cache_key
+
+
+# Dialect group with the neutral-atom rewrite and parallelization passes.
+# Created once at import time so compiling a circuit doesn't rebuild it.
+@ir.dialect_group(qasm2.extended)
+def extended_opt(self):
+    native_rewrite = Walk(RydbergGateSetRewriteRule(self))
+    parallelize_pass = UOpToParallel(self)
+    agg_fold = QASM2Fold(self)
+
+    def run_pass(
+        kernel: ir.Method,
+        *,
+        fold: bool = True,
+        typeinfer: bool = True,
+        parallelize: bool = False,
+    ):
+        assert qasm2.extended.run_pass is not None
+        qasm2.extended.run_pass(kernel, fold=fold, typeinfer=typeinfer)
+        # Inline the step and pauli_evolution template calls and unroll their
+        # loops first: the rewrite and the parallelization only see the gates
+        # of the kernel itself, and would reorder gates hidden in calls
+        agg_fold.fixpoint(kernel)
+        native_rewrite.rewrite(kernel.code)
+
+        # Apply parallelization if requested
+        if parallelize:
+            agg_fold.fixpoint(kernel)
+            order_gates_by_layer(kernel)
+            parallelize_pass(kernel)
+
+    return run_pass
+
+
+def order_gates_by_layer(kernel: ir.Method):
+    """
+    Reorder the gates of a flat kernel layer by layer, keeping their order on
+    every qubit.
+
+    UOpToParallel puts each merged gate at the position of its first member,
+    so a member whose predecessors on its qubits come later in the program
+    (e.g. a cz of the next Trotter step) would move ahead of them. With the
+    gates of every dependency layer contiguous, the first member of a group
+    already comes after all their predecessors.
+
+    Args:
+        kernel: Inlined kernel, e.g. after QASM2Fold
+    """
+    frame, _ = address.AddressAnalysis(kernel.dialects).run_analysis(kernel)
+    dags = schedule.DagScheduleAnalysis(kernel.dialects, address_analysis=frame.entries).get_dags(kernel)
+    for block, dag in dags.items():
+        terminator = block.last_stmt
+        for group in dag.topological_groups():
+            for stmt in sorted(map(dag.stmts.__getitem__, group), key=dag.stmt_index.__getitem__):
+                stmt.detach()
+                stmt.insert_before(terminator)
+
+
+# ===== Parameterized term template =====
+#
+# A Pauli term exp(-i * c * P * t) is fully described by the qubits it acts
+# on, the positions of its X and Y operators (its Pauli pattern) and the
+# rotation angle. The template below takes all of these as arguments, so it
+# is lowered once at import time and every term of every circuit is a call
+# of it, instead of a freshly decorated kernel per (term, time) pair.
+
+@qasm2.extended
+def pauli_evolution(qreg: qasm2.QReg, qubits: tuple[int, ...], x_pos: tuple[int, ...],
+                    y_pos: tuple[int, ...], theta: float):
+    # Transform each qubit to the computational basis
+    for i in range(len(x_pos)):
+        qasm2.h(qreg[qubits[x_pos[i]]])
+    for i in range(len(y_pos)):
+        qasm2.rx(qreg[qubits[y_pos[i]]], math.pi/2)
+    
+    # CNOT ladder, rotation on the last qubit, and the ladder undone
+    for i in range(len(qubits) - 1):
+        qasm2.cx(qreg[qubits[i]], qreg[qubits[i+1]])
+    qasm2.rz(qreg[qubits[len(qubits) - 1]], theta)
+    for i in range(len(qubits) - 1, 0, -1):
+        qasm2.cx(qreg[qubits[i-1]], qreg[qubits[i]])
+    
+    # Transform back from the computational basis
+    for i in range(len(x_pos)):
+        qasm2.h(qreg[qubits[x_pos[i]]])
+    for i in range(len(y_pos)):
+        qasm2.rx(qreg[qubits[y_pos[i]]], -math.pi/2)
+
+
+def term_pattern(term: PauliTerm) -> Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Split a term into the arguments of the `pauli_evolution` template.
+    
+    Identity operators are dropped since they contribute no gates.
+    
+    Returns:
+        (qubits, x_pos, y_pos): the qubits in sorted order and the positions
+        within `qubits` of the X and Y operators
+    """
+    qubits = tuple(q for q in sorted(term.operators.keys()) if term.operators[q] != PauliOp.I)
+    x_pos = tuple(i for i, q in enumerate(qubits) if term.operators[q] == PauliOp.X)
+    y_pos = tuple(i for i, q in enumerate(qubits) if term.operators[q] == PauliOp.Y)
+    return qubits, x_pos, y_pos
+
+
+def make_template_block(table: Tuple[tuple, ...]) -> ir.Method:
+    """
+    Build a kernel applying `pauli_evolution` once per row of `table`.
+    
+    Constant folding is left to compilation/emission, which unroll the loop
+    anyway, so building the block costs a single lowering.
+    
+    Args:
+        table: Rows of (qubits, x_pos, y_pos, theta), applied in order
+        
+    Returns:
+        Kernel with signature (qreg)
+    """
+    @qasm2.extended(fold=False)
+    def block(qreg: qasm2.QReg):
+        for k in range(len(table)):
+            pauli_evolution(qreg, table[k][0], table[k][1], table[k][2], table[k][3])
+    
+    return block
+
+
+def suzuki_weights(order: int) -> List[float]:
+    """
+    Time fractions of the second-order steps making up one Suzuki step.
+    
+    For k > 1, S_2k(λ) = [S_2k-2(p_k λ)]^2 [S_2k-2((1-4p_k)λ)] [S_2k-2(p_k λ)]^2
+    with p_k = 1/(4-4^(1/(2k-1))), which unrolls into a product of S_2 factors.
+    
+    Args:
+        order: The order of the formula (must be a positive even integer)
+        
+    Returns:
+        List of fractions of the step time, one per S_2 application
+    """
+    if order % 2 != 0 or order < 2:
+        raise ValueError("Order must be a positive even integer")
+    
+    if order == 2:
+        return [1.0]
+    
+    k = order // 2
+    p_k = 1.0 / (4.0 - 4.0**(1.0/(2.0*k-1.0)))
+    lower = suzuki_weights(order - 2)
+    
+    weights = []
+    for scale in (p_k, p_k, 1 - 4*p_k, p_k, p_k):
+        weights.extend(scale * w for w in lower)
+    return weights
 
 
 class SuzukiTrotter:
@@ -21,14 +176,17 @@ class SuzukiTrotter:
     the time evolution operator e^(-iHt) for a Hamiltonian H.
     """
     
-    def __init__(self, hamiltonian: PauliHamiltonian):
+    def __init__(self, hamiltonian: PauliHamiltonian,
+                 cache: Optional[TrotterCircuitCache] = None):
         """
         Initialize a SuzukiTrotter simulator with a Pauli Hamiltonian.
         
         Args:
             hamiltonian: The Hamiltonian to simulate.
+            cache: Optional compilation cache shared between simulators
         """
         self.hamiltonian = hamiltonian
+        self.cache = cache
         self.terms = hamiltonian.terms
         self.n_qubits = hamiltonian.get_n_qubits()
         
@@ -38,6 +196,9 @@ class SuzukiTrotter:
         # Create commuting groups for more efficient evolution
         self.commuting_groups = hamiltonian.commuting_groups()
         
+        # Per-term evolution kernels, keyed by (id(term), time)
+        self._term_circuits: Dict[Tuple[int, float], Callable] = {}
+        
     @staticmethod
     def _compile_trotter_circuit(circuit_kernel, parallelize: bool = True):
         """
@@ -50,31 +211,6 @@ class SuzukiTrotter:
         Returns:
             Compiled circuit kernel
         """
-        # Create extended dialect for compiler optimization
-        @ir.dialect_group(qasm2.extended)
-        def extended_opt(self):
-            native_rewrite = Walk(RydbergGateSetRewriteRule(self))
-            parallelize_pass = UOpToParallel(self)
-            agg_fold = QASM2Fold(self)
-
-            def run_pass(
-                kernel: ir.Method,
-                *,
-                fold: bool = True,
-                typeinfer: bool = True,
-                parallelize: bool = False,
-            ):
-                assert qasm2.extended.run_pass is not None
-                qasm2.extended.run_pass(kernel, fold=fold, typeinfer=typeinfer)
-                native_rewrite.rewrite(kernel.code)
-
-                # Apply parallelization if requested
-                if parallelize:
-                    agg_fold.fixpoint(kernel)
-                    parallelize_pass(kernel)
-
-            return run_pass
-            
         # Create a new version of the circuit with our optimization passes
         compiled_kernel = circuit_kernel.similar()
         extended_opt.run_pass(compiled_kernel, parallelize=parallelize)
@@ -92,157 +228,83 @@ class SuzukiTrotter:
         Returns:
             Circuit generator function
         """
-        coefficient = term.coefficient
-        operators = term.operators
+        # Terms are identified by object, they live as long as self.hamiltonian
+        memo_key = (id(term), float(time))
+        if memo_key not in self._term_circuits:
+            self._term_circuits[memo_key] = make_template_block(self._evolution_table([term], time))
+        
+        return self._term_circuits[memo_key]
+    
+    @staticmethod
+    def _evolution_table(terms: List[PauliTerm], time: float) -> Tuple[tuple, ...]:
+        """
+        Compute the `pauli_evolution` arguments of e^(-i * term * time) for each term.
         
-        @qasm2.extended
-        def circuit_gen(qreg: qasm2.QReg):
-            # Handle different types of Pauli terms
+        Args:
+            terms: Terms to evolve, in application order
+            time: Evolution time
+            
+        Returns:
+            Rows of (qubits, x_pos, y_pos, theta)
+        """
+        table = []
+        for term in terms:
+            qubits, x_pos, y_pos = term_pattern(term)
+            # Identity term - global phase, no circuit needed
+            if not qubits:
+                continue
+            angle = -float(np.real(term.coefficient)) * time
+            table.append((qubits, x_pos, y_pos, 2 * angle))
+        return tuple(table)
+    
+    def _second_order_table(self, dt: float, grouped: bool = False) -> Tuple[tuple, ...]:
+        """
+        Compute the table of one symmetric second-order step: the terms (or
+        commuting groups) with dt/2 in forward order, then in reverse order.
+        """
+        if grouped:
+            forward = [term for group in self.commuting_groups for term in group.terms]
+            backward = [term for group in reversed(self.commuting_groups) for term in group.terms]
+        else:
+            forward = self.terms
+            backward = list(reversed(self.terms))
+        
+        return self._evolution_table(forward, dt/2) + self._evolution_table(backward, dt/2)
+    
+    def _suzuki_table(self, dt: float, order: int, grouped: bool = False) -> Tuple[tuple, ...]:
+        """Compute the table of one step of the recursive Suzuki formula."""
+        table = ()
+        for weight in suzuki_weights(order):
+            table += self._second_order_table(weight * dt, grouped)
+        return table
+    
+    def _make_program(self, table: Tuple[tuple, ...], n_steps: int) -> Callable:
+        """
+        Build a program applying the step described by `table` n_steps times.
+        
+        Only the step block and the program are lowered; every term in the
+        step is a call of the shared `pauli_evolution` template.
+        
+        Args:
+            table: Rows of (qubits, x_pos, y_pos, theta) of one Trotter step
+            n_steps: Number of Trotter steps
             
-            # Case 1: Identity term - global phase, no circuit needed
-            if not operators:
-                # Just a global phase, no operation needed
-                pass
-                
-            # Case 2: Single Pauli operator
-            elif len(operators) == 1:
-                qubit_idx, op = list(operators.items())[0]
-                angle = -coefficient * time
-                
-                if op == PauliOp.X:
-                    # Implement e^(-i * X * angle)
-                    qasm2.h(qreg[qubit_idx])
-                    qasm2.rz(qreg[qubit_idx], 2 * angle)
-                    qasm2.h(qreg[qubit_idx])
-                    
-                elif op == PauliOp.Y:
-                    # Implement e^(-i * Y * angle)
-                    qasm2.rx(qreg[qubit_idx], np.pi/2)
-                    qasm2.rz(qreg[qubit_idx], 2 * angle)
-                    qasm2.rx(qreg[qubit_idx], -np.pi/2)
-                    
-                elif op == PauliOp.Z:
-                    # Implement e^(-i * Z * angle)
-                    qasm2.rz(qreg[qubit_idx], 2 * angle)
-                    
-                # Identity operator requires no gates
+        Returns:
+            Circuit generator function allocating and returning the register
+        """
+        n_qubits = self.n_qubits
+        step = make_template_block(table)
+        
+        @qasm2.extended(fold=False)
+        def circuit_gen():
+            qreg = qasm2.qreg(n_qubits)
             
-            # Case 3: Two-qubit Pauli operator
-            elif len(operators) == 2:
-                qubits = sorted(operators.keys())
-                angle = -coefficient * time
-                
-                # Get the two Pauli operators
-                op1 = operators[qubits[0]]
-                op2 = operators[qubits[1]]
-                
-                # Implementation strategy depends on the Pauli types
-                
-                # ZZ two-qubit interaction
-                if op1 == PauliOp.Z and op2 == PauliOp.Z:
-                    # Implement e^(-i * Z⊗Z * angle)
-                    # Using CNOT-RZ-CNOT decomposition
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    qasm2.rz(qreg[qubits[1]], 2 * angle)
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                
-                # XX two-qubit interaction
-                elif op1 == PauliOp.X and op2 == PauliOp.X:
-                    # Implement e^(-i * X⊗X * angle)
-                    # Transform to ZZ using Hadamards
-                    qasm2.h(qreg[qubits[0]])
-                    qasm2.h(qreg[qubits[1]])
-                    
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    qasm2.rz(qreg[qubits[1]], 2 * angle)
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    
-                    qasm2.h(qreg[qubits[0]])
-                    qasm2.h(qreg[qubits[1]])
-                
-                # YY two-qubit interaction
-                elif op1 == PauliOp.Y and op2 == PauliOp.Y:
-                    # Implement e^(-i * Y⊗Y * angle)
-                    # Transform to ZZ using rotations
-                    qasm2.rx(qreg[qubits[0]], np.pi/2)
-                    qasm2.rx(qreg[qubits[1]], np.pi/2)
-                    
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    qasm2.rz(qreg[qubits[1]], 2 * angle)
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    
-                    qasm2.rx(qreg[qubits[0]], -np.pi/2)
-                    qasm2.rx(qreg[qubits[1]], -np.pi/2)
-                
-                # XY interaction
-                elif op1 == PauliOp.X and op2 == PauliOp.Y:
-                    # Implement e^(-i * X⊗Y * angle)
-                    qasm2.h(qreg[qubits[0]])
-                    qasm2.rx(qreg[qubits[1]], np.pi/2)
-                    
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    qasm2.rz(qreg[qubits[1]], 2 * angle)
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    
-                    qasm2.h(qreg[qubits[0]])
-                    qasm2.rx(qreg[qubits[1]], -np.pi/2)
-                
-                # Other combinations - use a similar approach with appropriate basis transformations
-                # XZ, YX, YZ, ZX, ZY interactions would be handled here in a complete implementation
-                # For brevity, not all combinations are shown
-                else:
-                    # General approach for any two-qubit Pauli term
-                    # First, transform to computational basis
-                    for i, q in enumerate(qubits):
-                        if operators[q] == PauliOp.X:
-                            qasm2.h(qreg[q])
-                        elif operators[q] == PauliOp.Y:
-                            qasm2.rx(qreg[q], np.pi/2)
-                    
-                    # Apply controlled-Z rotation
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    qasm2.rz(qreg[qubits[1]], 2 * angle)
-                    qasm2.cx(qreg[qubits[0]], qreg[qubits[1]])
-                    
-                    # Transform back from computational basis
-                    for i, q in enumerate(qubits):
-                        if operators[q] == PauliOp.X:
-                            qasm2.h(qreg[q])
-                        elif operators[q] == PauliOp.Y:
-                            qasm2.rx(qreg[q], -np.pi/2)
+            # For each Trotter step
+            for _ in range(n_steps):
+                step(qreg)
             
-            # Case 4: Multi-qubit Pauli operator (3+ qubits)
-            else:
-                qubits = sorted(operators.keys())
-                angle = -coefficient * time
-                
-                # For multi-qubit Pauli strings, we first transform each qubit
-                # to the appropriate basis (X, Y, or Z)
-                for q in qubits:
-                    if operators[q] == PauliOp.X:
-                        qasm2.h(qreg[q])
-                    elif operators[q] == PauliOp.Y:
-                        qasm2.rx(qreg[q], np.pi/2)
-                
-                # Then implement a multi-controlled Z rotation
-                # We use a ladder of CNOT gates
-                for i in range(len(qubits) - 1):
-                    qasm2.cx(qreg[qubits[i]], qreg[qubits[i+1]])
-                
-                # Apply the rotation on the last qubit
-                qasm2.rz(qreg[qubits[-1]], 2 * angle)
-                
-                # Undo the CNOT ladder
-                for i in range(len(qubits) - 1, 0, -1):
-                    qasm2.cx(qreg[qubits[i-1]], qreg[qubits[i]])
-                
-                # Transform back from computational basis
-                for q in qubits:
-                    if operators[q] == PauliOp.X:
-                        qasm2.h(qreg[q])
-                    elif operators[q] == PauliOp.Y:
-                        qasm2.rx(qreg[q], -np.pi/2)
-                        
+            return qreg
+        
         return circuit_gen
     
     def first_order_trotter(self, time: float, n_steps: int = 1) -> Callable:
@@ -258,28 +320,8 @@ class SuzukiTrotter:
         """
         dt = time / n_steps
         
-        @qasm2.extended
-        def circuit_gen(qreg: qasm2.QReg = None):
-            if qreg is None:
-                qreg = qasm2.qreg(self.n_qubits)
-                
-            # For each Trotter step
-            for _ in range(n_steps):
-                # Apply each term in sequence
-                for term in self.terms:
-                    # Get circuit for this term and apply it
-                    term_circuit = self._get_pauli_evolution_circuit(term, dt)
-                    term_circuit(qreg)
-                    
-                    # Add a barrier to maintain correct ordering
-                    if len(term.operators) > 0:
-                        qubits_used = [qreg[i] for i in term.get_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-            
-            return qreg
-            
-        return circuit_gen
+        # Apply each term in sequence
+        return self._make_program(self._evolution_table(self.terms, dt), n_steps)
     
     def second_order_trotter(self, time: float, n_steps: int = 1) -> Callable:
         """
@@ -295,41 +337,8 @@ class SuzukiTrotter:
         """
         dt = time / n_steps
         
-        @qasm2.extended
-        def circuit_gen(qreg: qasm2.QReg = None):
-            if qreg is None:
-                qreg = qasm2.qreg(self.n_qubits)
-                
-            # For each Trotter step
-            for _ in range(n_steps):
-                # First half of terms in forward order
-                for i, term in enumerate(self.terms):
-                    # Apply half-step for first part
-                    term_circuit = self._get_pauli_evolution_circuit(term, dt/2)
-                    term_circuit(qreg)
-                    
-                    # Add barrier
-                    if len(term.operators) > 0:
-                        qubits_used = [qreg[i] for i in term.get_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-                
-                # Second half of terms in reverse order
-                for i in range(len(self.terms)-1, -1, -1):
-                    term = self.terms[i]
-                    # Apply half-step for second part
-                    term_circuit = self._get_pauli_evolution_circuit(term, dt/2)
-                    term_circuit(qreg)
-                    
-                    # Add barrier
-                    if len(term.operators) > 0:
-                        qubits_used = [qreg[i] for i in term.get_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-            
-            return qreg
-            
-        return circuit_gen
+        # First half of terms in forward order, second half in reverse order
+        return self._make_program(self._second_order_table(dt), n_steps)
     
     def trotter_suzuki_recursive(self, time: float, n_steps: int = 1, order: int = 2) -> Callable:
         """
@@ -352,42 +361,7 @@ class SuzukiTrotter:
             
         dt = time / n_steps
         
-        # Base case: second-order formula
-        if order == 2:
-            return self.second_order_trotter(time, n_steps)
-        
-        # Recursive case
-        # Calculate the p_k coefficient for the recursive formula
-        k = order // 2
-        p_k = 1.0 / (4.0 - 4.0**(1.0/(2.0*k-1.0)))
-        
-        # Get the circuit for the lower order
-        lower_order_circuit = self.trotter_suzuki_recursive(time, n_steps, order-2)
-        
-        @qasm2.extended
-        def circuit_gen(qreg: qasm2.QReg = None):
-            if qreg is None:
-                qreg = qasm2.qreg(self.n_qubits)
-                
-            # For each Trotter step
-            for _ in range(n_steps):
-                # Implement the recursive formula:
-                # S_2k(λ) = [S_2k-2(p_k λ)]^2 [S_2k-2((1-4p_k)λ)] [S_2k-2(p_k λ)]^2
-                
-                # First [S_2k-2(p_k λ)]^2 term
-                for _ in range(2):
-                    lower_order_circuit(qreg, time=p_k*dt, n_steps=1)
-                
-                # Middle [S_2k-2((1-4p_k)λ)] term
-                lower_order_circuit(qreg, time=(1-4*p_k)*dt, n_steps=1)
-                
-                # Last [S_2k-2(p_k λ)]^2 term
-                for _ in range(2):
-                    lower_order_circuit(qreg, time=p_k*dt, n_steps=1)
-            
-            return qreg
-            
-        return circuit_gen
+        return self._make_program(self._suzuki_table(dt, order), n_steps)
     
     def optimized_trotter(self, time: float, n_steps: int = 1, order: int = 1, 
                         parallelize: bool = True) -> Callable:
@@ -406,62 +380,19 @@ class SuzukiTrotter:
         """
         dt = time / n_steps
         
-        @qasm2.extended
-        def circuit_gen(qreg: qasm2.QReg = None):
-            if qreg is None:
-                qreg = qasm2.qreg(self.n_qubits)
-                
-            # For each Trotter step
-            for _ in range(n_steps):
-                if order == 1:
-                    # First-order Trotter formula
-                    # Apply each commuting group as a block
-                    for group in self.commuting_groups:
-                        # Process all terms in this commuting group
-                        for term in group.terms:
-                            term_circuit = self._get_pauli_evolution_circuit(term, dt)
-                            term_circuit(qreg)
-                        
-                        # Add barrier between commuting groups
-                        qubits_used = [qreg[i] for i in group.get_all_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-                
-                elif order == 2:
-                    # Second-order Trotter formula
-                    # First half of commuting groups in forward order
-                    for group in self.commuting_groups:
-                        # Process all terms in this commuting group
-                        for term in group.terms:
-                            term_circuit = self._get_pauli_evolution_circuit(term, dt/2)
-                            term_circuit(qreg)
-                        
-                        # Add barrier between commuting groups
-                        qubits_used = [qreg[i] for i in group.get_all_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-                    
-                    # Second half of commuting groups in reverse order
-                    for group in reversed(self.commuting_groups):
-                        # Process all terms in this commuting group
-                        for term in group.terms:
-                            term_circuit = self._get_pauli_evolution_circuit(term, dt/2)
-                            term_circuit(qreg)
-                        
-                        # Add barrier between commuting groups
-                        qubits_used = [qreg[i] for i in group.get_all_qubits()]
-                        if qubits_used:
-                            qasm2.barrier(qubits_used)
-                
-                else:
-                    # Higher-order Trotter using recursive formula
-                    # This is a simplified implementation that doesn't fully leverage
-                    # the commutation relationships for higher orders
-                    high_order_circuit = self.trotter_suzuki_recursive(dt, 1, order)
-                    high_order_circuit(qreg)
-            
-            return qreg
-            
+        if order == 1:
+            # Apply each commuting group as a block
+            table = self._evolution_table(
+                [term for group in self.commuting_groups for term in group.terms], dt)
+        elif order == 2:
+            table = self._second_order_table(dt, grouped=True)
+        else:
+            # Higher-order Trotter using the recursive formula over grouped
+            # second-order steps
+            table = self._suzuki_table(dt, order, grouped=True)
+        
+        circuit_gen = self._make_program(table, n_steps)
+        
         # Compile the circuit with optimizations if requested
         if parallelize:
             return self._compile_trotter_circuit(circuit_gen, parallelize=True)
@@ -483,15 +414,68 @@ class SuzukiTrotter:
         Returns:
             A circuit generator function that can be used with Bloqade
         """
-        if optimize:
-            return self.optimized_trotter(time, n_steps, order, parallelize)
+        return self._trotterize(time, n_steps, order, optimize, parallelize)
+
+    def _trotterize(self, time: float, n_steps: int, order: int, optimize: bool,
+                    parallelize: bool, count_miss: bool = True) -> Callable:
+        """
+        trotterize, counting a cache miss only if count_miss, as
+        trotterize_qasm has already counted its own.
+        """
+        if self.cache is not None:
+            key = make_cache_key(self.hamiltonian, time, n_steps, order, optimize, parallelize)
+            kernel = self.cache.get_kernel(key, count_miss=count_miss)
+            if kernel is not None:
+                return kernel
         
-        if order == 1:
-            return self.first_order_trotter(time, n_steps)
+        if optimize:
+            kernel = self.optimized_trotter(time, n_steps, order, parallelize)
+        elif order == 1:
+            kernel = self.first_order_trotter(time, n_steps)
         elif order == 2:
-            return self.second_order_trotter(time, n_steps)
+            kernel = self.second_order_trotter(time, n_steps)
         else:
-            return self.trotter_suzuki_recursive(time, n_steps, order)
+            kernel = self.trotter_suzuki_recursive(time, n_steps, order)
+        
+        if self.cache is not None:
+            self.cache.put_kernel(key, kernel)
+        
+        return kernel
+    
+    def trotterize_qasm(self, time: float, n_steps: int = 1, order: int = 1,
+                        optimize: bool = True, parallelize: bool = True) -> str:
+        """
+        Generate the QASM2 program of a trotterized circuit.
+        
+        With a cache attached, the emitted program is looked up in memory and
+        on disk first, so a repeated experiment doesn't compile anything.
+        
+        Args:
+            time: Total evolution time
+            n_steps: Number of Trotter steps
+            order: Trotter order (1, 2, or higher even number)
+            optimize: Whether to use commutation relationships for optimization
+            parallelize: Whether to apply circuit parallelization
+            
+        Returns:
+            The QASM2 program as a string
+        """
+        from bloqade.qasm2.emit import QASM2
+        from bloqade.qasm2.parse import spprint
+        
+        if self.cache is not None:
+            key = make_cache_key(self.hamiltonian, time, n_steps, order, optimize, parallelize)
+            qasm_str = self.cache.get_qasm(key)
+            if qasm_str is not None:
+                return qasm_str
+        
+        kernel = self._trotterize(time, n_steps, order, optimize, parallelize, count_miss=False)
+        qasm_str = spprint(QASM2(allow_parallel=parallelize).emit(kernel))
+        
+        if self.cache is not None:
+            self.cache.put_qasm(key, qasm_str)
+        
+        return qasm_str
 
 
 # Example usage
@@ -527,4 +511,17 @@ if __name__ == "__main__":
     # Print the QASM2 representation of the circuit
     target = QASM2(allow_parallel=True)
     ast = target.emit(circuit)
-    pprint(ast)
\ No newline at end of file
+    pprint(ast)
+
+    # The rewritten and parallelized circuit must prepare the same state as
+    # the plain one
+    from StateVectorSimulator import StateVectorSimulator
+
+    simulator = StateVectorSimulator()
+    parallel_state = simulator.statevector(trotter.trotterize_qasm(evolution_time, trotter_steps, trotter_order,
+                                                                   parallelize=True))
+    plain_state = simulator.statevector(trotter.trotterize_qasm(evolution_time, trotter_steps, trotter_order,
+                                                                parallelize=False))
+    overlap = abs(np.vdot(parallel_state, plain_state))
+    assert abs(overlap - 1) < 1e-9, overlap
+    print(f"Overlap of the parallelized and plain circuits: {overlap:.12f}")
\ No newline at end of file